@@ -1,13 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import pandas as pd
 import os
+import csv
+import json
+import shutil
+import tempfile
 import joblib
-from family_assistance_model import predict_family_status
+from family_assistance_model import predict_family_status, predict_family_records, predict_family_records_lenient
+from model_registry import get_model_bundle
+from retrain_jobs import submit_retrain_job, get_job, list_jobs
 from flask_cors import CORS
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Number of records scored per model call by the streaming endpoint
+STREAM_CHUNK_SIZE = 1000
+
+# Upper bound on the synthetic records a retrain request may ask for
+MAX_DUMMY_SAMPLES = 1_000_000
+
 @app.route('/api/assess-eligibility', methods=['POST'])
 def assess_eligibility():
     """
@@ -101,31 +113,11 @@ def batch_assess_eligibility():
         if not data or 'records' not in data or not isinstance(data['records'], list):
             return jsonify({"error": "Invalid data format. Expected 'records' array"}), 400
         
-        # Validate and convert each record
-        for record in data['records']:
-            # Validate required fields
-            required_fields = [
-                "monthly_income", 
-                "family_members", 
-                "has_stable_housing", 
-                "access_to_clean_water", 
-                "access_to_electricity", 
-                "has_significant_health_issues"
-            ]
-            
-            for field in required_fields:
-                if field not in record:
-                    return jsonify({"error": f"Missing required field: {field} in one of the records"}), 400
-            
-            # Convert numeric fields to appropriate types
-            for field in ["monthly_income", "family_members"]:
-                record[field] = float(record[field])
-            
-            for field in ["has_stable_housing", "access_to_clean_water", "access_to_electricity", "has_significant_health_issues"]:
-                record[field] = int(record[field])
-            
-        # Make predictions for all records
-        prediction_results = predict_family_status(data['records'])
+        # Validate, convert and score all records column-wise in one pass
+        try:
+            prediction_results = predict_family_records(data['records'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         if not prediction_results:
             return jsonify({"error": "Error making predictions"}), 500
@@ -139,6 +131,127 @@ def batch_assess_eligibility():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _iter_ndjson_records(lines):
+    """Yield (row_number, record, error) for each non-empty NDJSON line."""
+    row_number = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+
+def _iter_csv_records(lines):
+    """
+    Yield (row_number, record, error) for each CSV data row (header row required).
+    Missing cells (a short row) and empty cells are left out of the record, so they
+    are reported as missing fields just like a key missing from an NDJSON record.
+    """
+    text_lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    for row_number, row in enumerate(csv.DictReader(text_lines), start=1):
+        record = {
+            key: value for key, value in row.items()
+            if key is not None and value is not None and value.strip() != ''
+        }
+        yield row_number, record, None
+
+def _score_stream_chunk(chunk):
+    """
+    Score a chunk of (row_number, record, error) triples, returning one output dict
+    per row in row order. Rows that already failed to parse keep their error; the
+    rest are validated one by one and scored with a single model call.
+    """
+    parsed = [record for _, record, error in chunk if error is None]
+    results = predict_family_records_lenient(parsed) if parsed else []
+    if results is None:
+        # The model went away mid-stream: report it on each row rather than ending the response
+        results = [{"error": "Model not available"}] * len(parsed)
+    
+    results = iter(results)
+    outputs = []
+    for row_number, _, error in chunk:
+        result = {"error": error} if error is not None else next(results)
+        outputs.append(dict(row=row_number, **result))
+    return outputs
+
+@app.route('/api/batch-assess-stream', methods=['POST'])
+def batch_assess_stream():
+    """
+    Streaming bulk assessment for very large batches.
+    
+    Accepts either a raw request body or a multipart upload in a 'file' field, as
+    NDJSON (one record object per line) or CSV (header row with the feature names).
+    The format is taken from ?format=ndjson|csv, else from the content type or the
+    uploaded file name. Records are scored STREAM_CHUNK_SIZE at a time and results
+    are streamed back as NDJSON, one line per input row:
+    
+        {"row": 1, "prediction": "...", "probability_deserves_help": "...", "input_data": {...}}
+        {"row": 2, "error": "Missing required field: family_members in one of the records"}
+        ...
+        {"summary": {"rows": 2, "errors": 1}}
+    """
+    if get_model_bundle() is None:
+        return jsonify({"error": "Model not available"}), 500
+    
+    upload = request.files.get('file')
+    
+    data_format = request.args.get('format')
+    if not data_format:
+        content_type = (upload.mimetype if upload is not None else request.mimetype) or ''
+        filename = (upload.filename or '') if upload is not None else ''
+        data_format = 'csv' if 'csv' in content_type or filename.lower().endswith('.csv') else 'ndjson'
+    
+    if data_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "Unsupported format. Expected 'ndjson' or 'csv'"}), 400
+    
+    if upload is not None:
+        # Werkzeug closes uploaded files when the request ends, before the response body
+        # has been generated: copy the upload to a temporary file the generator owns
+        source = tempfile.TemporaryFile()
+        shutil.copyfileobj(upload.stream, source)
+        source.seek(0)
+    else:
+        source = request.stream
+    
+    records = _iter_csv_records(source) if data_format == 'csv' else _iter_ndjson_records(source)
+    
+    def generate():
+        rows = 0
+        errors = 0
+        chunk = []
+        
+        def flush():
+            nonlocal errors
+            lines = []
+            for output in _score_stream_chunk(chunk):
+                if 'error' in output:
+                    errors += 1
+                lines.append(json.dumps(output) + '\n')
+            chunk.clear()
+            return ''.join(lines)
+        
+        try:
+            for row_number, record, error in records:
+                rows += 1
+                # Parse errors stay in the chunk, so output lines keep the input's row order
+                chunk.append((row_number, record, error))
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield flush()
+        
+            if chunk:
+                yield flush()
+            yield json.dumps({"summary": {"rows": rows, "errors": errors}}) + '\n'
+        finally:
+            if upload is not None:
+                source.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/model-info', methods=['GET'])
 def get_model_info():
     """
@@ -210,40 +323,83 @@ def save_verified_data_endpoint():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _is_integer(value):
+    """True for JSON integers (bools are not accepted as numbers)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
 @app.route('/api/retrain-model', methods=['POST'])
 def retrain_model_endpoint():
     """
     API endpoint to retrain the model with all available data.
+    Retraining runs as a background job; poll /api/retrain-jobs/<job_id> for its status.
+    If a retrain is already queued or running, that job is returned instead of a new one.
     
     Expected JSON input:
     {
-        "n_dummy_samples": 5000
+        "n_dummy_samples": 5000,
+        "incremental": false,
+        "seed": 42
     }
+    
+    With "incremental": true, only verified records saved since the last build are
+    added to the current model (extra trees are grown on them); the trainer still
+    falls back to a full rebuild periodically or when the source data changed.
+    "seed" (optional) fixes the synthetic data, so the prepared dataset snapshot is
+    reused as long as the verified and asnaf data have not changed.
     """
     try:
         # Get data from request
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         
         # Get number of dummy samples to use (default to 5000)
         n_dummy_samples = data.get('n_dummy_samples', 5000)
+        if not _is_integer(n_dummy_samples) or not 0 <= n_dummy_samples <= MAX_DUMMY_SAMPLES:
+            return jsonify({"error": f"'n_dummy_samples' must be an integer between 0 and {MAX_DUMMY_SAMPLES}"}), 400
+        incremental = data.get('incremental', False)
+        if not isinstance(incremental, bool):
+            return jsonify({"error": "'incremental' must be true or false"}), 400
+        seed = data.get('seed')
+        if seed is not None and (not _is_integer(seed) or seed < 0):
+            return jsonify({"error": "'seed' must be a non-negative integer"}), 400
         
-        # Import the retrain_model_with_new_data function from family_assistance_model
-        from family_assistance_model import retrain_model_with_new_data
+        # Queue the retraining in a worker process
+        job, created = submit_retrain_job(n_dummy_samples=n_dummy_samples, incremental=incremental, seed=seed)
         
-        # Retrain the model
-        success = retrain_model_with_new_data(n_dummy_samples=n_dummy_samples)
-        
-        if not success:
-            return jsonify({"error": "Error retraining model"}), 500
-            
-        # Return success response
+        # Return the job so the client can follow its progress
         return jsonify({
             "success": True,
-            "message": "Model retrained successfully"
-        }), 200
+            "message": "Model retraining started" if created else "Model retraining already in progress",
+            "job": job
+        }), 202
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/retrain-jobs', methods=['GET'])
+def list_retrain_jobs():
+    """
+    API endpoint to list recent retraining jobs and their status.
+    """
+    return jsonify({
+        "success": True,
+        "jobs": list_jobs()
+    }), 200
+
+@app.route('/api/retrain-jobs/<job_id>', methods=['GET'])
+def get_retrain_job(job_id):
+    """
+    API endpoint to get the status and progress of a retraining job.
+    Status is one of 'queued', 'running', 'succeeded' or 'failed'; 'stage' and
+    'progress' (0.0 - 1.0) report how far training has got.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Retraining job not found"}), 404
+    
+    return jsonify({
+        "success": True,
+        "job": job
+    }), 200
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001) 
\ No newline at end of file
@@ -6,38 +6,549 @@ using the pre-trained rural_classifier.h5 model.
 """
 
 import os
-import io
+import time
+import queue
+import threading
 import numpy as np
-import tensorflow as tf
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from PIL import Image
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import img_to_array
-import requests # Add requests library for fetching URL
+from PIL import UnidentifiedImageError
+from house_image_fetcher import ImageFetcher, ImageFetchError, ImageRejectedError
+from house_image_preprocessing import preprocess_image, new_batch, decode_into
+from house_inference_batcher import MicroBatcher, DEFAULT_MAX_BATCH_SIZE
+from house_result_cache import ResultCache, image_key, model_version
+from house_similarity_index import SimilarityIndex
+import house_submission_store
+
+# TensorFlow is only imported when the model is loaded (house_model_serving imports
+# it lazily), so the server can bind and answer /health while the model loads
+PROCESS_STARTED = time.time()
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests
 
-# Load the pre-trained model
 MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rural_classifier.h5')
-print(f"Loading model from: {MODEL_PATH}")
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Rural House Dataset')
+
+# Batch sizes run through the model during warm-up, so each is traced/allocated before real traffic
+WARMUP_BATCH_SIZES = sorted({
+    int(size) for size in os.environ.get('HOUSE_WARMUP_BATCH_SIZES', f"1,4,{DEFAULT_MAX_BATCH_SIZE}").split(',')
+    if size.strip()
+})
+
+# Set by serve_housing_api.py in shared mode: the model lives in one inference
+# process (house_inference_server.py) and this process sends it its batches
+INFERENCE_SOCKET = os.environ.get('HOUSE_INFERENCE_SOCKET') or None
+
+# Set by load_house_model(); model endpoints answer 503 until warm-up has finished
+serving_model = None
+# Version tag of the model files serving_model was loaded from (see current_model_version)
+serving_model_version = None
+model_ready = threading.Event()
+_model_lock = threading.Lock()
+
+# Startup lifecycle and timings, reported by /health
+startup_state = {
+    'status': 'starting',
+    'model_load_seconds': None,
+    'warmup_seconds': None,
+    'warmup_batch_sizes': WARMUP_BATCH_SIZES,
+    'seconds_to_ready': None,
+    'serving_backend': None,
+    'error': None
+}
+
+def load_house_model():
+    """Load the serving model (importing TensorFlow on first use). Safe to call more than once."""
+    global serving_model, serving_model_version
+    with _model_lock:
+        if serving_model is not None:
+            return serving_model
+        startup_state['status'] = 'loading_model'
+        start = time.time()
+        if INFERENCE_SOCKET:
+            # Shared mode: no TensorFlow in this process, the inference process runs the model
+            from house_inference_server import RemoteServingModel
+            print(f"Connecting to the shared inference process at {INFERENCE_SOCKET}")
+            model = RemoteServingModel(INFERENCE_SOCKET)
+            serving_model_version = model.model_version
+            serving_model = model
+        else:
+            # Imported here so TensorFlow's import cost is paid in the background, not before binding
+            from house_model_serving import load_serving_model, configure_tf_threads
+            
+            # Size TensorFlow's thread pools before it runs anything
+            # (HOUSE_TF_INTRA_OP_THREADS / HOUSE_TF_INTER_OP_THREADS; serve_housing_api.py sets them)
+            configure_tf_threads()
+            
+            # Served through a traced SavedModel function, with the .h5 model as fallback
+            print(f"Loading model from: {MODEL_PATH}")
+            model = load_serving_model(MODEL_PATH)
+            # Versioned from the files as they are now, so a later rewrite of the file on
+            # disk can't relabel results of this in-memory model
+            serving_model_version = _model_files_version(model.backend)
+            serving_model = model
+        startup_state['model_load_seconds'] = round(time.time() - start, 3)
+        startup_state['serving_backend'] = serving_model.backend
+        startup_state['status'] = 'model_loaded'
+        print(f"Model loaded successfully in {startup_state['model_load_seconds']}s (serving backend: {serving_model.backend})")
+        return serving_model
+
+def warm_up_model():
+    """
+    Load the model if needed, run a dummy batch of each WARMUP_BATCH_SIZES size
+    through it so real requests don't pay for tracing and allocation, then open
+    the model endpoints.
+    """
+    try:
+        model = load_house_model()
+        startup_state['status'] = 'warming_up'
+        start = time.time()
+        for batch_size in WARMUP_BATCH_SIZES:
+            model.predict_batch(np.zeros_like(new_batch(batch_size)))
+        startup_state['warmup_seconds'] = round(time.time() - start, 3)
+        startup_state['seconds_to_ready'] = round(time.time() - PROCESS_STARTED, 3)
+        startup_state['status'] = 'ready'
+        model_ready.set()
+        print(f"Model warm-up finished in {startup_state['warmup_seconds']}s for batch sizes {WARMUP_BATCH_SIZES}; "
+              f"ready {startup_state['seconds_to_ready']}s after start (pid {os.getpid()})")
+    except Exception as e:
+        startup_state['status'] = 'failed'
+        startup_state['error'] = str(e)
+        print(f"Error loading the house model: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def _startup():
+    warm_up_model()
+    if model_ready.is_set():
+        load_similarity_index()
 
-model = load_model(MODEL_PATH)
-print("Model loaded successfully")
+_startup_started = False
+
+def start_background_startup():
+    """
+    Load and warm up the model on a background thread, so the server can bind right
+    away; then load (or build) the similar-house index. Every serving process calls
+    this once it is running (serve_housing_api.py from each gunicorn worker); later
+    calls in the same process do nothing.
+    """
+    global _startup_started
+    with _model_lock:
+        if _startup_started:
+            return
+        _startup_started = True
+    threading.Thread(target=_startup, name='house-model-startup', daemon=True).start()
+
+def _predict_batch(images):
+    """(probabilities, embeddings); embeddings has zero columns if the backend can't produce them."""
+    if serving_model.predict_with_embeddings is not None:
+        return serving_model.predict_with_embeddings(images)
+    return serving_model.predict_batch(images), np.zeros((len(images), 0), dtype=np.float32)
+
+def _model_files_version(backend, model_path=MODEL_PATH):
+    """Version tag of the model files the given serving backend reads for model_path."""
+    paths = [model_path]
+    if backend == 'tflite-int8':
+        from house_model_serving import quantized_model_path
+        paths.append(quantized_model_path(model_path))
+    return f"{backend}-{model_version(*paths)}"
+
+def current_model_version():
+    """
+    Version tag of the model being served, for the result cache and the similarity
+    index. Fixed when the model is loaded: the model is not reloaded when its file
+    changes, so neither is the version (restart the server to serve a new model).
+    """
+    return serving_model_version
+
+# Concurrent requests are coalesced into batched model calls
+# (tune with HOUSE_MAX_BATCH_SIZE / HOUSE_MAX_WAIT_MS)
+batcher = MicroBatcher(_predict_batch)
+
+# Pooled, bounded downloads for image URLs
+# (tune with HOUSE_FETCH_* environment variables, see house_image_fetcher.py)
+fetcher = ImageFetcher()
+
+# Results are cached per model version, so they are dropped when a different model is loaded
+# (tune with HOUSE_CACHE_MAX_ENTRIES; set HOUSE_CACHE_DIR to add an on-disk tier)
+result_cache = ResultCache(current_model_version)
+
+# Images accepted by /analyze-house-batch in one request
+MAX_BATCH_IMAGES = int(os.environ.get('HOUSE_MAX_BATCH_IMAGES', '20'))
+
+# Threads decoding the images of a batch request
+decode_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('HOUSE_DECODE_WORKERS', '4')),
+                                 thread_name_prefix='house-image-decode')
 
 # Define class mapping - must match the original training classes
 CLASS_NAMES = ['baik', 'dhoif', 'sederhana']  # Ensure this matches your model's classes
 
-def preprocess_image(image_bytes):
-    """Helper function to preprocess image bytes."""
-    image = Image.open(io.BytesIO(image_bytes))
-    image = image.resize((224, 224))
-    image_array = img_to_array(image)
-    image_array = image_array / 255.0
-    image_array = np.expand_dims(image_array, axis=0)
-    return image_array
+# Similar-house index over the training dataset and past submissions.
+# The dataset part is saved to SIMILARITY_INDEX_PATH per model version; submissions
+# are kept in the shared house_submission_store and merged in on load
+SIMILARITY_INDEX_PATH = os.environ.get(
+    'HOUSE_SIMILARITY_INDEX', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'house_similarity_index.npz')
+)
+# Matches at least this similar (cosine) are reported as near-duplicates
+DUPLICATE_SIMILARITY = float(os.environ.get('HOUSE_DUPLICATE_SIMILARITY', '0.97'))
+# Submissions recorded by other workers are pulled in at most this often (seconds)
+SIMILARITY_SYNC_INTERVAL = float(os.environ.get('HOUSE_SIMILARITY_SYNC_INTERVAL', '5'))
+MAX_SIMILAR_RESULTS = 50
+DATASET_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+# Submissions waiting for the recorder thread; beyond this, new ones are dropped rather than delay requests
+SUBMISSION_QUEUE_SIZE = int(os.environ.get('HOUSE_SUBMISSION_QUEUE_SIZE', '256'))
+# Queued submissions written to the store in one transaction
+SUBMISSION_WRITE_BATCH = 64
+
+similarity_index = None
+similarity_state = {
+    'status': 'not_loaded',
+    'dataset_size': 0,
+    'submissions_synced_to': 0,
+    'last_synced': None,
+    'submissions_dropped': 0
+}
+_similarity_lock = threading.Lock()
+# Held while the index is reloaded to drop submissions past the retention limit
+_reload_lock = threading.Lock()
+
+# Submissions are recorded off the request path: requests queue them, and a
+# recorder thread writes them to the submission store and adds them to the index
+_submission_queue = queue.Queue(maxsize=SUBMISSION_QUEUE_SIZE)
+_recorder_started = False
+
+def _dataset_images():
+    """(path, split, label) for every image in the Rural House Dataset."""
+    for split in sorted(os.listdir(DATASET_PATH)) if os.path.isdir(DATASET_PATH) else []:
+        split_dir = os.path.join(DATASET_PATH, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for label in sorted(os.listdir(split_dir)):
+            label_dir = os.path.join(split_dir, label)
+            if not os.path.isdir(label_dir):
+                continue
+            for file_name in sorted(os.listdir(label_dir)):
+                if file_name.lower().endswith(DATASET_IMAGE_EXTENSIONS):
+                    yield os.path.join(label_dir, file_name), split, label
+
+def _build_similarity_index(version):
+    """Embed every dataset image into a fresh index."""
+    index = SimilarityIndex()
+    index.info = {'model_version': version}
+    images = list(_dataset_images())
+    start = time.time()
+    for batch_start in range(0, len(images), DEFAULT_MAX_BATCH_SIZE):
+        chunk = images[batch_start:batch_start + DEFAULT_MAX_BATCH_SIZE]
+        batch = new_batch(len(chunk))
+        keys, metadata, rows = [], [], []
+        for row, (path, split, label) in enumerate(chunk):
+            try:
+                with open(path, 'rb') as f:
+                    image_bytes = f.read()
+                decode_into(batch, row, image_bytes)
+            except Exception as e:
+                print(f"Warning: skipping {path} for the similarity index ({str(e)})")
+                continue
+            rows.append(row)
+            keys.append(image_key(image_bytes))
+            metadata.append({
+                'kind': 'dataset',
+                'split': split,
+                'label': label,
+                'source': os.path.relpath(path, DATASET_PATH)
+            })
+        if rows:
+            _, embeddings = batcher.predict(batch[rows])
+            index.add(embeddings, keys, metadata)
+    print(f"Indexed {len(index)} dataset images for similarity search in {time.time() - start:.2f}s")
+    return index
+
+def _embed_missing_submissions(version):
+    """Embed stored submissions that have no embedding for this model version yet (e.g. after a model change)."""
+    total = 0
+    while True:
+        ids, pixels = house_submission_store.submissions_without_embedding(version, limit=DEFAULT_MAX_BATCH_SIZE)
+        if not ids:
+            break
+        _, embeddings = batcher.predict(np.stack(pixels))
+        house_submission_store.save_embeddings(version, ids, embeddings)
+        total += len(ids)
+    if total:
+        print(f"Re-embedded {total} past submissions for model version {version}")
+
+def sync_submissions(force=False):
+    """Add submissions recorded since the last sync (by any worker) to this process's index."""
+    if similarity_index is None:
+        return
+    with _similarity_lock:
+        last_synced = similarity_state['last_synced'] or 0
+        if not force and time.time() - last_synced < SIMILARITY_SYNC_INTERVAL:
+            return
+        similarity_state['last_synced'] = time.time()
+        after_id = similarity_state['submissions_synced_to']
+        try:
+            up_to_id = house_submission_store.max_submission_id()
+            if up_to_id <= after_id:
+                return
+            keys, embeddings, metadata = house_submission_store.load_embeddings(
+                current_model_version(), after_id=after_id, up_to_id=up_to_id
+            )
+        except Exception as e:
+            print(f"Warning: could not read house submissions ({str(e)})")
+            return
+        if keys:
+            similarity_index.add(embeddings, keys, metadata)
+        # Submissions embedded only by workers on another model version are picked
+        # up (re-embedded) the next time this worker loads the index
+        similarity_state['submissions_synced_to'] = up_to_id
+    _enforce_index_retention()
+
+def _enforce_index_retention():
+    """
+    The index can't drop vectors, so once it holds twice the retained number of
+    submissions, reload it (in the background) with only the ones the store still keeps.
+    """
+    index = similarity_index
+    retention = house_submission_store.DEFAULT_RETENTION
+    if index is None or len(index) - similarity_state['dataset_size'] <= 2 * retention:
+        return
+    if not _reload_lock.acquire(blocking=False):
+        return  # Already reloading
+    
+    def reload():
+        try:
+            print(f"Similarity index holds over {2 * retention} submissions, reloading the newest {retention}")
+            load_similarity_index()
+        finally:
+            _reload_lock.release()
+    
+    threading.Thread(target=reload, name='similarity-index-reload', daemon=True).start()
+
+def load_similarity_index():
+    """
+    Load the saved dataset index, or rebuild it if it is missing or from another model
+    version, then merge in every stored submission (re-embedding any that were made
+    under another model version).
+    """
+    global similarity_index
+    if serving_model.predict_with_embeddings is None:
+        similarity_state['status'] = 'unavailable'
+        print(f"Similarity search is unavailable with the {serving_model.backend} backend")
+        return
+    
+    similarity_state['status'] = 'loading'
+    version = current_model_version()
+    index = None
+    if os.path.exists(SIMILARITY_INDEX_PATH):
+        try:
+            index = SimilarityIndex.load(SIMILARITY_INDEX_PATH)
+            if index.info.get('model_version') != version:
+                print("Similarity index was built with another model version, rebuilding")
+                index = None
+        except Exception as e:
+            print(f"Warning: could not load the similarity index ({str(e)}), rebuilding")
+            index = None
+    
+    if index is None:
+        similarity_state['status'] = 'building'
+        index = _build_similarity_index(version)
+        # Only the dataset images are saved here; submissions live in the submission store
+        index.wait_for_training()
+        index.save(SIMILARITY_INDEX_PATH)
+    
+    try:
+        # Apply the retention limit first, so submissions about to be dropped aren't re-embedded
+        house_submission_store.prune_submissions()
+        _embed_missing_submissions(version)
+    except Exception as e:
+        print(f"Warning: could not re-embed past submissions ({str(e)})")
+    
+    similarity_state['dataset_size'] = len(index)
+    similarity_index = index
+    similarity_state['submissions_synced_to'] = 0
+    sync_submissions(force=True)
+    similarity_state['status'] = 'ready'
+    print(f"Similarity index ready with {len(index)} images")
+
+def record_submissions(keys, pixels, embeddings, metadata):
+    """
+    Queue submitted images (with their preprocessed pixels) for the recorder thread,
+    which adds them to the shared submission store and to this process's similarity
+    index. Never blocks the request: if the queue is full, the submissions are dropped.
+    Submissions made before the index has loaded are still stored, and the index
+    picks them up from the store when it loads.
+    """
+    if embeddings.shape[1] == 0:
+        return  # This backend can't embed images, so there is no similarity index to feed
+    submitted_at = time.strftime('%Y-%m-%d %H:%M:%S')
+    for item in metadata:
+        item.setdefault('kind', 'submission')
+        item.setdefault('submitted_at', submitted_at)
+    _start_recorder()
+    try:
+        _submission_queue.put_nowait((keys, pixels, embeddings, metadata))
+    except queue.Full:
+        similarity_state['submissions_dropped'] += len(keys)
+        print(f"Warning: submission queue is full, dropped {len(keys)} house submissions")
+
+def _start_recorder():
+    """Start the recorder thread on first use, in the process that serves requests (after any fork)."""
+    global _recorder_started
+    if _recorder_started:
+        return
+    with _model_lock:
+        if _recorder_started:
+            return
+        _recorder_started = True
+    threading.Thread(target=_record_queued_submissions, name='house-submission-recorder', daemon=True).start()
+
+def _record_queued_submissions():
+    """Recorder thread: write queued submissions to the store in batches, then add them to the index."""
+    while True:
+        entries = [_submission_queue.get()]
+        while len(entries) < SUBMISSION_WRITE_BATCH:
+            try:
+                entries.append(_submission_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            keys = [key for entry in entries for key in entry[0]]
+            pixels = np.concatenate([entry[1] for entry in entries])
+            embeddings = np.concatenate([entry[2] for entry in entries])
+            metadata = [item for entry in entries for item in entry[3]]
+            try:
+                house_submission_store.append_submissions(keys, pixels, embeddings, metadata, current_model_version())
+                house_submission_store.prune_submissions()
+            except Exception as e:
+                print(f"Warning: could not record house submissions ({str(e)})")
+            index = similarity_index
+            if index is not None:
+                index.add(embeddings, keys, metadata)
+                _enforce_index_retention()
+        except Exception as e:
+            print(f"Warning: could not add house submissions to the similarity index ({str(e)})")
+        finally:
+            for _ in entries:
+                _submission_queue.task_done()
+
+def flush_submissions():
+    """Block until every queued submission has been recorded."""
+    _submission_queue.join()
+
+# Endpoints that answer before the model is ready
+UNGATED_ENDPOINTS = {'health'}
+
+@app.before_request
+def require_model_ready():
+    """Hold model traffic back (503) until the model has been loaded and warmed up."""
+    if request.endpoint in UNGATED_ENDPOINTS or request.method == 'OPTIONS' or model_ready.is_set():
+        return None
+    return jsonify({'error': 'Model is still loading, try again shortly', 'status': startup_state['status']}), 503
+
+def prediction_to_result(prediction):
+    """Classification result for one row of model output."""
+    # Get the class with highest probability
+    predicted_class_index = np.argmax(prediction)
+    predicted_class = CLASS_NAMES[predicted_class_index]
+    
+    # Create a dictionary of class probabilities
+    probabilities = {class_name: float(prediction[i]) for i, class_name in enumerate(CLASS_NAMES)}
+    
+    return {
+        'classification': predicted_class,
+        'probabilities': probabilities
+    }
+
+def classify_image_bytes(image_bytes, source=None):
+    """Classify one image, answering from the result cache when these bytes were seen before."""
+    cache_key = image_key(image_bytes)
+    result = result_cache.get(cache_key)
+    if result is not None:
+        return result
+    
+    image_array = preprocess_image(image_bytes)
+    predictions, embeddings = batcher.predict(image_array)
+    
+    result = prediction_to_result(predictions[0])
+    result_cache.put(cache_key, result)
+    record_submissions([cache_key], image_array, embeddings, [{'source': source, 'classification': result['classification']}])
+    return result
+
+def classify_image_batch(images_bytes, sources=None):
+    """
+    Classify several images with one batched model call.
+    Cached images are answered from the cache, the rest are decoded in parallel.
+    Returns one entry per image, in order: a result dict, or the exception raised
+    while decoding that image.
+    """
+    results = [None] * len(images_bytes)
+    pending = []  # (index, cache_key, image_bytes) still to be run through the model
+    for index, image_bytes in enumerate(images_bytes):
+        cache_key = image_key(image_bytes)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.append((index, cache_key, image_bytes))
+    
+    if pending:
+        # Every image is decoded straight into its row of one uint8 batch buffer
+        batch = new_batch(len(pending))
+        
+        def decode(row):
+            try:
+                decode_into(batch, row, pending[row][2])
+                return None
+            except Exception as e:
+                return e
+        
+        # PIL releases the GIL while decoding and resizing, so threads decode in parallel
+        decode_errors = list(decode_pool.map(decode, range(len(pending))))
+        decoded_rows = []
+        for row, error in enumerate(decode_errors):
+            if error is not None:
+                results[pending[row][0]] = error
+            else:
+                decoded_rows.append(row)
+        
+        if decoded_rows:
+            inputs = batch if len(decoded_rows) == len(pending) else batch[decoded_rows]
+            predictions, embeddings = batcher.predict(inputs)
+            for row, prediction in zip(decoded_rows, predictions):
+                index, cache_key, _ = pending[row]
+                results[index] = prediction_to_result(prediction)
+                result_cache.put(cache_key, results[index])
+            record_submissions(
+                [pending[row][1] for row in decoded_rows],
+                inputs,
+                embeddings,
+                [{
+                    'source': sources[pending[row][0]] if sources else None,
+                    'classification': results[pending[row][0]]['classification']
+                } for row in decoded_rows]
+            )
+    
+    return results
+
+def aggregate_household_condition(results):
+    """Household-level condition from the per-image results: the class with the highest mean probability."""
+    mean_probabilities = {
+        class_name: float(np.mean([result['probabilities'][class_name] for result in results]))
+        for class_name in CLASS_NAMES
+    }
+    class_counts = {class_name: 0 for class_name in CLASS_NAMES}
+    for result in results:
+        class_counts[result['classification']] += 1
+    
+    return {
+        'classification': max(mean_probabilities, key=mean_probabilities.get),
+        'probabilities': mean_probabilities,
+        'class_counts': class_counts,
+        'images_assessed': len(results)
+    }
 
 @app.route('/analyze-house', methods=['POST'])
 def analyze_house():
@@ -54,25 +565,9 @@ def analyze_house():
     file = request.files['image']
     
     try:
-        # Read and preprocess the image
+        # Read the image and classify it
         image_bytes = file.read()
-        image_array = preprocess_image(image_bytes)
-        
-        # Get prediction
-        predictions = model.predict(image_array)
-        
-        # Get the class with highest probability
-        predicted_class_index = np.argmax(predictions[0])
-        predicted_class = CLASS_NAMES[predicted_class_index]
-        
-        # Create a dictionary of class probabilities
-        probabilities = {class_name: float(predictions[0][i]) for i, class_name in enumerate(CLASS_NAMES)}
-        
-        # Return the result
-        return jsonify({
-            'classification': predicted_class,
-            'probabilities': probabilities
-        })
+        return jsonify(classify_image_bytes(image_bytes, source=file.filename))
         
     except Exception as e:
         print(f"Error processing uploaded image: {str(e)}")
@@ -84,7 +579,8 @@ def analyze_house_url():
     API endpoint to analyze a house image from a URL.
     
     Expects: JSON payload with an 'image_url' field
-    Returns: JSON with classification result and probabilities
+    Returns: JSON with classification result and probabilities; 400 if the URL or
+             what it returns is not a usable image, 502 if the download fails
     """
     if not request.is_json:
         return jsonify({'error': 'Request must be JSON'}), 400
@@ -96,41 +592,37 @@ def analyze_house_url():
         return jsonify({'error': 'No image_url provided'}), 400
         
     try:
-        # Fetch the image from the URL
+        # A conditional request lets an unchanged image be answered from the cache
+        cached_etag = result_cache.get_url_etag(image_url)
         print(f"Fetching image from URL: {image_url}")
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status() # Raise an exception for bad status codes
+        fetched = fetcher.fetch(image_url, if_none_match=cached_etag)
+        if fetched.not_modified:
+            result = result_cache.get_url_result(image_url, cached_etag)
+            if result is not None:
+                print("Image not modified, returning cached result")
+                return jsonify(result)
+            # The result itself was evicted; download the image after all
+            fetched = fetcher.fetch(image_url)
         
-        # Read image bytes
-        image_bytes = response.content
+        image_bytes = fetched.content
         print(f"Image fetched successfully, size: {len(image_bytes)} bytes")
 
-        # Preprocess the image using the helper function
-        image_array = preprocess_image(image_bytes)
-        print("Image preprocessed successfully")
-        
-        # Get prediction
-        predictions = model.predict(image_array)
-        print(f"Prediction raw output: {predictions}")
-        
-        # Get the class with highest probability
-        predicted_class_index = np.argmax(predictions[0])
-        predicted_class = CLASS_NAMES[predicted_class_index]
-        print(f"Predicted class: {predicted_class} (Index: {predicted_class_index})")
-        
-        # Create a dictionary of class probabilities
-        probabilities = {class_name: float(predictions[0][i]) for i, class_name in enumerate(CLASS_NAMES)}
-        print(f"Probabilities: {probabilities}")
+        result = classify_image_bytes(image_bytes, source=image_url)
+        print(f"Predicted class: {result['classification']}")
+        print(f"Probabilities: {result['probabilities']}")
+        result_cache.put_url_result(image_url, fetched.etag, result)
         
         # Return the result
-        return jsonify({
-            'classification': predicted_class,
-            'probabilities': probabilities
-        })
+        return jsonify(result)
         
-    except requests.exceptions.RequestException as e:
+    except (ImageRejectedError, UnidentifiedImageError) as e:
+        # Bad URL, or it returned something that is not a usable image: the client's mistake
+        print(f"Rejected image from URL {image_url}: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except ImageFetchError as e:
+        # The image host failed (unreachable, timed out, error status)
         print(f"Error fetching image from URL {image_url}: {str(e)}")
-        return jsonify({'error': f'Failed to fetch image from URL: {str(e)}'}), 500
+        return jsonify({'error': str(e)}), 502
     except Exception as e:
         print(f"Error processing image from URL: {str(e)}")
         # Add more detailed logging for unexpected errors
@@ -138,5 +630,175 @@ def analyze_house_url():
         traceback.print_exc()
         return jsonify({'error': f'An internal error occurred: {str(e)}'}), 500
 
+@app.route('/analyze-house-batch', methods=['POST'])
+def analyze_house_batch():
+    """
+    API endpoint to analyze several images of one house (exterior, roof, kitchen...)
+    in a single request and model call.
+    
+    Expects: multipart/form-data with one or more 'images' fields,
+             or a JSON payload with an 'image_urls' list
+    Returns: JSON with a result (or error) per image, in order, and an aggregated
+             household-level classification
+    """
+    sources = []
+    images_bytes = []
+    errors = {}  # index -> error message for images that could not be fetched
+    
+    if request.is_json:
+        image_urls = (request.get_json() or {}).get('image_urls')
+        if not isinstance(image_urls, list) or not image_urls:
+            return jsonify({'error': 'image_urls must be a non-empty list'}), 400
+        if len(image_urls) > MAX_BATCH_IMAGES:
+            return jsonify({'error': f'At most {MAX_BATCH_IMAGES} images per request'}), 400
+        if not all(isinstance(url, str) for url in image_urls):
+            return jsonify({'error': 'image_urls must contain only URL strings'}), 400
+        
+        # Download all images concurrently
+        for index, fetched in enumerate(fetcher.fetch_many(image_urls)):
+            sources.append(image_urls[index])
+            if isinstance(fetched, ImageFetchError):
+                print(f"Error fetching image from URL {image_urls[index]}: {str(fetched)}")
+                errors[index] = str(fetched)
+                images_bytes.append(None)
+            else:
+                images_bytes.append(fetched.content)
+    else:
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({'error': 'No images uploaded'}), 400
+        if len(files) > MAX_BATCH_IMAGES:
+            return jsonify({'error': f'At most {MAX_BATCH_IMAGES} images per request'}), 400
+        for file in files:
+            sources.append(file.filename)
+            images_bytes.append(file.read())
+    
+    try:
+        fetched_indices = [index for index, image_bytes in enumerate(images_bytes) if image_bytes is not None]
+        batch_results = classify_image_batch(
+            [images_bytes[index] for index in fetched_indices],
+            sources=[sources[index] for index in fetched_indices]
+        )
+    except Exception as e:
+        print(f"Error processing image batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    results_by_index = dict(zip(fetched_indices, batch_results))
+    images = []
+    assessed = []
+    for index, source in enumerate(sources):
+        result = results_by_index.get(index)
+        if isinstance(result, Exception):
+            errors[index] = f'Could not decode image: {str(result)}'
+        if index in errors:
+            images.append({'index': index, 'source': source, 'error': errors[index]})
+        else:
+            images.append({'index': index, 'source': source, **result})
+            assessed.append(result)
+    
+    return jsonify({
+        'images': images,
+        'household': aggregate_household_condition(assessed) if assessed else None
+    })
+
+@app.route('/similar-houses', methods=['POST'])
+def similar_houses():
+    """
+    API endpoint to find the most similar indexed house images (training images and
+    past submissions) and flag near-duplicates of the submitted image.
+    
+    Expects: multipart/form-data with an 'image' field, or a JSON payload with an
+             'image_url' field; optional 'k' (number of matches, default 5),
+             'application_id' (stored with the submission) and 'record'
+             (add the image to the index, default true)
+    Returns: JSON with the classification, the k most similar images and any duplicates
+    """
+    if request.is_json:
+        params = request.get_json() or {}
+        image_url = params.get('image_url')
+        if not image_url:
+            return jsonify({'error': 'No image_url provided'}), 400
+        source = image_url
+    else:
+        params = request.form
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image uploaded'}), 400
+        source = request.files['image'].filename
+    
+    try:
+        k = int(params.get('k', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k must be an integer'}), 400
+    k = max(1, min(k, MAX_SIMILAR_RESULTS))
+    record = str(params.get('record', 'true')).lower() not in ('false', '0', 'no')
+    
+    if similarity_index is None:
+        status_code = 501 if similarity_state['status'] == 'unavailable' else 503
+        return jsonify({'error': 'Similarity index is not available', 'status': similarity_state['status']}), status_code
+    
+    try:
+        if request.is_json:
+            image_bytes = fetcher.fetch(image_url).content
+        else:
+            image_bytes = request.files['image'].read()
+        
+        cache_key = image_key(image_bytes)
+        image_array = preprocess_image(image_bytes)
+        predictions, embeddings = batcher.predict(image_array)
+        result = prediction_to_result(predictions[0])
+        
+        # Search before recording, so the image doesn't match itself
+        sync_submissions()
+        start = time.time()
+        matches = similarity_index.search(embeddings[0], k=k)
+        search_ms = (time.time() - start) * 1000
+        for match in matches:
+            match['exact_duplicate'] = match['id'] == cache_key
+            match['near_duplicate'] = match['exact_duplicate'] or match['similarity'] >= DUPLICATE_SIMILARITY
+        
+        if record:
+            record_submissions([cache_key], image_array, embeddings, [{
+                'source': source,
+                'classification': result['classification'],
+                'application_id': params.get('application_id')
+            }])
+        
+        return jsonify({
+            **result,
+            'matches': matches,
+            'duplicates': [match for match in matches if match['near_duplicate']],
+            'index_size': len(similarity_index),
+            'search_ms': round(search_ms, 3)
+        })
+    
+    except (ImageRejectedError, UnidentifiedImageError) as e:
+        return jsonify({'error': str(e)}), 400
+    except ImageFetchError as e:
+        print(f"Error fetching image from URL {source}: {str(e)}")
+        return jsonify({'error': str(e)}), 502
+    except Exception as e:
+        print(f"Error searching for similar houses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Health and readiness probe with startup metrics: 200 once this process's model is
+    warmed up, 503 before (or if loading failed).
+    """
+    return jsonify({
+        'pid': os.getpid(),
+        **startup_state,
+        'similarity_index': {
+            **similarity_state,
+            'size': len(similarity_index) if similarity_index is not None else 0,
+            'submissions_queued': _submission_queue.qsize()
+        }
+    }), 200 if model_ready.is_set() else 503
+
 if __name__ == '__main__':
+    # Development server; use serve_housing_api.py for multi-worker production serving.
+    # The reloader's parent process only watches files, so only the serving child loads the model.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_startup()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,434 @@
+"""
+API Performance Benchmark
+
+Runs the eligibility and housing Flask apps in-process on local werkzeug servers
+(plus a local HTTP server that serves test images for /analyze-house-url), drives
+each endpoint with a thread-pool load generator over a matrix of concurrency
+levels and batch sizes, and records p50/p95/p99 latency, throughput and process
+RSS. The report is a JSON file meant to be kept per commit and diffed:
+
+    python benchmark_apis.py --output bench/$(git rev-parse --short HEAD).json
+    python benchmark_apis.py --output new.json --compare bench/baseline.json
+
+--compare prints the change against an earlier report for every scenario and
+exits with status 1 when p95 latency or throughput regressed by more than
+--tolerance.
+
+Every house image request carries unique trailing bytes (ignored by the JPEG
+decoder), so the result cache never answers and the full decode + model path is
+measured; pass --warm-cache to measure cache hits instead.
+
+As in production, the housing API loads its similar-house index, so every new
+image is also recorded as a submission (into a throwaway submission store).
+Recording runs on the API's background recorder thread; after each housing
+scenario the benchmark waits for it to catch up and reports that wait as
+submission_flush_ms, so the deferred cost shows up in the report too. Pass
+--no-similarity-index to measure without it.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_ELIGIBILITY_BATCH_SIZES = [1, 100, 1000]
+DEFAULT_HOUSE_BATCH_SIZES = [1, 4, 16]
+DEFAULT_REQUESTS = 200
+DEFAULT_TOLERANCE = 0.10
+# Typical phone photo size used for the synthetic test images
+DEFAULT_IMAGE_SIZE = (1600, 1200)
+N_TEST_IMAGES = 8
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Peak rather than current RSS; ru_maxrss is KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_test_images(image_size, count=N_TEST_IMAGES, seed=0):
+    """JPEG test images: real dataset photos resized to image_size if available, else synthetic ones."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    dataset_dir = os.path.join(BACKEND_DIR, 'Rural House Dataset', 'test')
+    sources = []
+    for root, _, files in os.walk(dataset_dir):
+        sources.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(('.jpg', '.jpeg')))
+    sources = sorted(sources)[:count]
+
+    images = []
+    for i in range(count):
+        if i < len(sources):
+            image = Image.open(sources[i]).convert('RGB').resize(image_size)
+        else:
+            # Smooth gradients plus noise, so the JPEG is about as costly to decode as a photo
+            width, height = image_size
+            gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+            noise = rng.normal(0, 25, size=(height, width, 3)).astype(np.float32)
+            image = Image.fromarray(np.clip(gradient + noise + rng.uniform(0, 80, size=3), 0, 255).astype(np.uint8))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def family_record(rng):
+    return {
+        'monthly_income': float(rng.uniform(300, 5000)),
+        'family_members': int(rng.integers(1, 10)),
+        'has_stable_housing': int(rng.integers(0, 2)),
+        'access_to_clean_water': int(rng.integers(0, 2)),
+        'access_to_electricity': int(rng.integers(0, 2)),
+        'has_significant_health_issues': int(rng.integers(0, 2))
+    }
+
+
+class ImageServer:
+    """Serves the test images at /image/<n>.jpg; a ?nonce=... query adds unique trailing bytes."""
+
+    def __init__(self, images, unique):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                try:
+                    body = outer.images[int(os.path.basename(parsed.path).split('.')[0])]
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                nonce = parse_qs(parsed.query).get('nonce')
+                if outer.unique and nonce:
+                    body = body + nonce[0].encode('ascii')
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.images = images
+        self.unique = unique
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def image_url(self, index):
+        return f"{self.url}/image/{index % len(self.images)}.jpg?nonce={uuid.uuid4().hex}"
+
+    def close(self):
+        self.server.shutdown()
+
+
+class AppServer:
+    """A Flask app on a local threaded werkzeug server."""
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(name, make_request, concurrency, n_requests, items_per_request=1):
+    """
+    Send n_requests requests from concurrency threads. make_request(session, i)
+    sends request i and returns the response. Returns a result dict.
+    """
+    local = threading.local()
+    latencies = []
+    errors = []  # (kind, message); kind is 'client' for 4xx answers, 'server' for 5xx and transport errors
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = make_request(session, i)
+            ok = response.status_code < 400
+            error = None if ok else ('client' if response.status_code < 500 else 'server', f"HTTP {response.status_code}")
+        except requests.RequestException as e:
+            error = ('server', str(e))
+        elapsed = time.perf_counter() - start
+        with lock:
+            if error is None:
+                latencies.append(elapsed)
+            else:
+                errors.append(error)
+
+    # A few untimed requests first, so connection setup and lazy initialisation don't count
+    for i in range(min(concurrency, 4)):
+        one(i)
+    latencies.clear()
+    errors.clear()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    completed = len(latencies)
+    result = {
+        'scenario': name,
+        'concurrency': concurrency,
+        'batch_size': items_per_request,
+        'requests': n_requests,
+        'errors': len(errors),
+        'client_errors': sum(1 for kind, _ in errors if kind == 'client'),
+        'server_errors': sum(1 for kind, _ in errors if kind == 'server'),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3) if completed else None,
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3) if completed else None,
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3) if completed else None,
+        'mean_ms': round(float(latencies_ms.mean()), 3) if completed else None,
+        'throughput_rps': round(completed / wall, 3),
+        'items_per_sec': round(completed * items_per_request / wall, 3),
+        'rss_mb': round(rss_mb(), 1)
+    }
+    if errors:
+        result['first_error'] = errors[0][1]
+    print(f"{name:<28} c={concurrency:<3} batch={items_per_request:<5} "
+          f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+          f"{result['throughput_rps']} req/s errors={len(errors)}")
+    return result
+
+
+def eligibility_scenarios(server, args):
+    rng = np.random.default_rng(args.seed)
+    records = [family_record(rng) for _ in range(max(args.eligibility_batch_sizes + [1]))]
+    results = []
+    for concurrency in args.concurrency:
+        results.append(run_scenario(
+            '/api/assess-eligibility',
+            lambda session, i: session.post(f"{server.url}/api/assess-eligibility", json=records[i % len(records)]),
+            concurrency, args.requests
+        ))
+        for batch_size in args.eligibility_batch_sizes:
+            payload = {'records': records[:batch_size]}
+            results.append(run_scenario(
+                '/api/batch-assess',
+                lambda session, i, payload=payload: session.post(f"{server.url}/api/batch-assess", json=payload),
+                concurrency, args.requests, items_per_request=batch_size
+            ))
+    return results
+
+
+def housing_scenarios(server, image_server, images, args, flush_submissions, similarity_index=True):
+    unique = not args.warm_cache
+
+    def image_body(i):
+        body = images[i % len(images)]
+        return body + uuid.uuid4().bytes if unique else body
+
+    def run_and_flush(*scenario_args, **scenario_kwargs):
+        # Submissions queued by this scenario are recorded before the next one starts
+        result = run_scenario(*scenario_args, **scenario_kwargs)
+        start = time.perf_counter()
+        flush_submissions()
+        result['submission_flush_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    results = []
+    for concurrency in args.concurrency:
+        if similarity_index:
+            results.append(run_and_flush(
+                '/similar-houses',
+                lambda session, i: session.post(
+                    f"{server.url}/similar-houses", files={'image': (f"{i}.jpg", image_body(i), 'image/jpeg')}
+                ),
+                concurrency, args.requests
+            ))
+        results.append(run_and_flush(
+            '/analyze-house',
+            lambda session, i: session.post(
+                f"{server.url}/analyze-house", files={'image': (f"{i}.jpg", image_body(i), 'image/jpeg')}
+            ),
+            concurrency, args.requests
+        ))
+        results.append(run_and_flush(
+            '/analyze-house-url',
+            lambda session, i: session.post(
+                f"{server.url}/analyze-house-url",
+                json={'image_url': image_server.image_url(i) if unique else f"{image_server.url}/image/{i % len(images)}.jpg"}
+            ),
+            concurrency, args.requests
+        ))
+        for batch_size in args.house_batch_sizes:
+            results.append(run_and_flush(
+                '/analyze-house-batch',
+                lambda session, i, batch_size=batch_size: session.post(
+                    f"{server.url}/analyze-house-batch",
+                    files=[('images', (f"{i}_{j}.jpg", image_body(i * batch_size + j), 'image/jpeg')) for j in range(batch_size)]
+                ),
+                concurrency, max(1, args.requests // batch_size), items_per_request=batch_size
+            ))
+    return results
+
+
+def compare_reports(current, baseline, tolerance):
+    """Print per-scenario changes against baseline; returns the list of regressions."""
+    def key(result):
+        return (result['scenario'], result['concurrency'], result['batch_size'])
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    regressions = []
+    print(f"\nComparison with {baseline['meta'].get('git_commit') or 'baseline'} (tolerance {tolerance:.0%}):")
+    for result in current['results']:
+        before = baseline_results.get(key(result))
+        if before is None or not before.get('p95_ms') or not result.get('p95_ms'):
+            continue
+        p95_change = result['p95_ms'] / before['p95_ms'] - 1
+        throughput_change = result['throughput_rps'] / before['throughput_rps'] - 1 if before['throughput_rps'] else 0.0
+        regressed = p95_change > tolerance or throughput_change < -tolerance
+        if regressed:
+            regressions.append(key(result))
+        print(f"{'REGRESSION ' if regressed else '           '}{result['scenario']:<28} c={result['concurrency']:<3} "
+              f"batch={result['batch_size']:<5} p95 {before['p95_ms']} -> {result['p95_ms']}ms ({p95_change:+.1%}), "
+              f"throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s ({throughput_change:+.1%})")
+    return regressions
+
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the eligibility and housing APIs')
+    parser.add_argument('--apis', default='eligibility,housing', help='Comma-separated: eligibility, housing')
+    parser.add_argument('--concurrency', type=parse_int_list, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--eligibility-batch-sizes', type=parse_int_list, default=DEFAULT_ELIGIBILITY_BATCH_SIZES)
+    parser.add_argument('--house-batch-sizes', type=parse_int_list, default=DEFAULT_HOUSE_BATCH_SIZES)
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Requests per scenario')
+    parser.add_argument('--image-size', type=parse_int_list, default=list(DEFAULT_IMAGE_SIZE), help='WIDTH,HEIGHT of test images')
+    parser.add_argument('--warm-cache', action='store_true', help='Repeat identical images so the result cache answers')
+    parser.add_argument('--no-similarity-index', action='store_true',
+                        help='Do not load the similar-house index (and so do not record submissions)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--compare', help='Earlier report to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative p95/throughput change counted as a regression')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.output = os.path.abspath(args.output)
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    # The apps load their model files by relative path
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    apis = {api.strip() for api in args.apis.split(',')}
+
+    report = {
+        'meta': {
+            'git_commit': git_commit(),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')}
+        },
+        'results': []
+    }
+
+    if 'eligibility' in apis:
+        import asnaf_eligibility_api
+        server = AppServer(asnaf_eligibility_api.app)
+        try:
+            report['results'].extend(eligibility_scenarios(server, args))
+        finally:
+            server.close()
+
+    if 'housing' in apis:
+        import asnaf_housing_api
+        import house_submission_store
+        start = time.time()
+        asnaf_housing_api.warm_up_model()
+        report['meta']['housing_startup_seconds'] = round(time.time() - start, 3)
+        report['meta']['housing_serving_backend'] = asnaf_housing_api.serving_model.backend
+
+        # Benchmark submissions go to a throwaway store, not the real one
+        store_dir = tempfile.mkdtemp(prefix='benchmark-submissions-')
+        house_submission_store.DEFAULT_STORE_PATH = os.path.join(store_dir, 'house_submissions.db')
+        if not args.no_similarity_index:
+            start = time.time()
+            asnaf_housing_api.load_similarity_index()
+            report['meta']['housing_similarity_index_seconds'] = round(time.time() - start, 3)
+        similarity_index = asnaf_housing_api.similarity_index is not None
+        report['meta']['housing_similarity_index_size'] = len(asnaf_housing_api.similarity_index) if similarity_index else 0
+
+        images = make_test_images(tuple(args.image_size[:2]), seed=args.seed)
+        image_server = ImageServer(images, unique=not args.warm_cache)
+        server = AppServer(asnaf_housing_api.app)
+        try:
+            report['results'].extend(housing_scenarios(
+                server, image_server, images, args, asnaf_housing_api.flush_submissions, similarity_index
+            ))
+            report['meta']['housing_submissions_dropped'] = asnaf_housing_api.similarity_state['submissions_dropped']
+        finally:
+            server.close()
+            image_server.close()
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare_reports(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
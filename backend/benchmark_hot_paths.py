@@ -0,0 +1,314 @@
+"""
+Micro-benchmarks for the ML Hot Paths
+
+Times the core functions behind both APIs directly, without HTTP, so a slowdown
+can be pinned on data generation (pandas/NumPy), model scoring (sklearn), the
+verified-data store (SQLite) or image decoding (PIL):
+- generate_family_data at 1k / 100k / 1M rows
+- define_assistance_need and prepare_family_data
+- predict_family_status for 1 / 100 / 10k rows
+- save_verified_data into stores that already hold 1k / 10k / 100k records
+- preprocess_image on typical phone-photo resolutions
+
+Timing works like pytest-benchmark: a warm-up call, then several rounds; calls
+faster than MIN_ROUND_SECONDS are repeated within a round and averaged. Results
+are compared by median.
+
+Usage:
+    python benchmark_hot_paths.py                    # run and print a table
+    python benchmark_hot_paths.py --save-baseline    # write hot_paths_baseline.json
+    python benchmark_hot_paths.py --compare          # flag regressions against it
+    python benchmark_hot_paths.py --filter predict   # only matching benchmarks
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'hot_paths_baseline.json')
+DEFAULT_ROUNDS = 7
+DEFAULT_TOLERANCE = 0.20  # micro-benchmarks are noisy; flag medians more than 20% slower
+MIN_ROUND_SECONDS = 0.01
+MAX_ITERATIONS = 10000
+
+# (group, name, setup, rounds): setup() returns (the zero-argument function to time, a cleanup function or None)
+BENCHMARKS = []
+
+
+def benchmark(group, name, rounds=DEFAULT_ROUNDS):
+    """Register a setup function as a benchmark."""
+    def register(setup):
+        BENCHMARKS.append((group, name, setup, rounds))
+        return setup
+    return register
+
+
+def _quiet(fn):
+    """The functions under test print progress; keep it out of the timings' output."""
+    def quiet():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return quiet
+
+
+def time_function(fn, rounds):
+    """Timing statistics (seconds per call) for fn over rounds rounds."""
+    # Warm-up, which also measures roughly how long one call takes
+    start = time.perf_counter()
+    fn()
+    single = time.perf_counter() - start
+    iterations = int(min(MAX_ITERATIONS, max(1, MIN_ROUND_SECONDS / max(single, 1e-9))))
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings.append((time.perf_counter() - start) / iterations)
+
+    quartiles = np.percentile(timings, [25, 75])
+    mean = statistics.mean(timings)
+    return {
+        'min': min(timings),
+        'max': max(timings),
+        'mean': mean,
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'median': statistics.median(timings),
+        'iqr': float(quartiles[1] - quartiles[0]),
+        'ops': 1.0 / mean if mean else None,
+        'rounds': rounds,
+        'iterations': iterations
+    }
+
+
+# ---------------------------------------------------------------------------
+# Family assistance model
+# ---------------------------------------------------------------------------
+
+def _generate_setup(n_rows):
+    def setup():
+        from family_assistance_model import generate_family_data
+        return _quiet(lambda: generate_family_data(n_rows)), None
+    return setup
+
+
+for _rows, _rounds in ((1000, DEFAULT_ROUNDS), (100000, DEFAULT_ROUNDS), (1000000, 3)):
+    benchmark('generate_family_data', f"generate_family_data[{_rows}]", rounds=_rounds)(_generate_setup(_rows))
+
+
+@benchmark('define_assistance_need', 'define_assistance_need[100000]')
+def _define_assistance_need_setup():
+    from family_assistance_model import generate_family_data, define_assistance_need
+    df = _quiet(lambda: generate_family_data(100000))()
+    return _quiet(lambda: define_assistance_need(df.copy())), None
+
+
+@benchmark('prepare_family_data', 'prepare_family_data[5000]', rounds=5)
+def _prepare_family_data_setup():
+    """
+    prepare_family_data reads and writes files relative to the working directory
+    (the verified data store, data_generation_history.json). It runs in a scratch
+    copy of that layout, so the benchmark never touches the repository's data.
+    """
+    from family_assistance_model import prepare_family_data
+    from verified_data_store import connect
+
+    scratch_dir = tempfile.mkdtemp(prefix='bench_prepare_')
+    work_dir = os.path.join(scratch_dir, 'backend')
+    asnaf_dir = os.path.join(scratch_dir, 'client', 'src', 'data')
+    os.makedirs(work_dir)
+    os.makedirs(asnaf_dir)
+    asnaf_path = os.path.join(BACKEND_DIR, '..', 'client', 'src', 'data', 'asnafRecipients.json')
+    if os.path.exists(asnaf_path):
+        shutil.copy(asnaf_path, asnaf_dir)
+    legacy_csv = os.path.join(BACKEND_DIR, 'saved_family_data.csv')
+    # Same verified records as the real store is seeded with
+    _quiet(lambda: connect(os.path.join(work_dir, 'saved_family_data.db'),
+                           legacy_csv_path=legacy_csv if os.path.exists(legacy_csv) else None).close())()
+
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+
+    def cleanup():
+        os.chdir(previous_dir)
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return _quiet(lambda: prepare_family_data(n_dummy_samples=5000)), cleanup
+
+
+def _predict_setup(n_rows):
+    def setup():
+        from family_assistance_model import generate_family_data, predict_family_status, FEATURE_COLUMNS
+        rows = _quiet(lambda: generate_family_data(n_rows, seed=7))()[FEATURE_COLUMNS]
+        family_data = rows.iloc[0].to_dict() if n_rows == 1 else rows
+        return _quiet(lambda: predict_family_status(family_data)), None
+    return setup
+
+
+for _rows in (1, 100, 10000):
+    benchmark('predict_family_status', f"predict_family_status[{_rows}]")(_predict_setup(_rows))
+
+
+def _save_verified_setup(existing_records):
+    def setup():
+        from family_assistance_model import generate_family_data, define_assistance_need, save_verified_data, FEATURE_COLUMNS
+        from verified_data_store import connect, append_verified_records
+
+        store_dir = tempfile.mkdtemp(prefix='bench_store_')
+        store_path = os.path.join(store_dir, 'saved_family_data.db')
+        # Create the store without importing the legacy CSV, then fill it
+        connect(store_path, legacy_csv_path=None).close()
+        existing = _quiet(lambda: define_assistance_need(generate_family_data(existing_records, seed=11)))()
+        # Distinct incomes, so none of the generated records is rejected as a duplicate
+        existing['monthly_income'] = np.arange(existing_records) + 100
+        existing['verification_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        append_verified_records(existing, store_path)
+
+        counter = iter(range(10 ** 9))
+
+        def save_one():
+            # A distinct income every call, so no save is skipped as a duplicate
+            record = {column: 1 for column in FEATURE_COLUMNS}
+            record['monthly_income'] = 1e7 + next(counter)
+            return save_verified_data(record, True, save_path=store_path)
+
+        return _quiet(save_one), lambda: shutil.rmtree(store_dir, ignore_errors=True)
+    return setup
+
+
+for _records in (1000, 10000, 100000):
+    benchmark('save_verified_data', f"save_verified_data[{_records} existing]")(_save_verified_setup(_records))
+
+
+# ---------------------------------------------------------------------------
+# House image preprocessing
+# ---------------------------------------------------------------------------
+
+PHONE_RESOLUTIONS = [(1280, 960), (1920, 1440), (3024, 4032), (4000, 3000)]
+
+
+def _phone_photo(width, height, seed=0):
+    """A JPEG about as costly to decode as a real photo: gradients plus noise."""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 25, size=(height, width, 3)).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(gradient + noise, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _preprocess_setup(width, height):
+    def setup():
+        from house_image_preprocessing import preprocess_image
+        image_bytes = _phone_photo(width, height)
+        return lambda: preprocess_image(image_bytes), None
+    return setup
+
+
+for _width, _height in PHONE_RESOLUTIONS:
+    benchmark('preprocess_image', f"preprocess_image[{_width}x{_height}]")(_preprocess_setup(_width, _height))
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__
+    }
+
+
+def run(name_filter=None):
+    results = []
+    for group, name, setup, rounds in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        fn, cleanup = setup()
+        try:
+            stats = time_function(fn, rounds)
+        finally:
+            if cleanup is not None:
+                cleanup()
+        results.append({'group': group, 'name': name, **stats})
+        print(f"{name:<42} median {stats['median'] * 1000:>11.3f} ms   "
+              f"min {stats['min'] * 1000:>11.3f} ms   iqr {stats['iqr'] * 1000:>9.3f} ms   "
+              f"({stats['rounds']} rounds x {stats['iterations']})")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print median changes against the baseline; returns the names of regressed benchmarks."""
+    baseline_results = {result['name']: result for result in baseline['benchmarks']}
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('saved_at')} (tolerance {tolerance:.0%}):")
+    for result in results:
+        before = baseline_results.get(result['name'])
+        if before is None:
+            print(f"  new        {result['name']}")
+            continue
+        change = result['median'] / before['median'] - 1
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(result['name'])
+        print(f"  {'REGRESSION' if regressed else 'ok        '} {result['name']:<42} "
+              f"{before['median'] * 1000:.3f} -> {result['median'] * 1000:.3f} ms ({change:+.1%})")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the ML hot paths')
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, help='Save results as the baseline')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='Compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative median slowdown counted as a regression')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for option in ('json', 'save_baseline', 'compare'):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+    # The model and data files are found by relative path
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    results = run(args.filter)
+    report = {'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine_info(), 'benchmarks': results}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Training Dataset Snapshots
+
+Materializes the combined training data built by prepare_family_data (synthetic
+rows + verified records + asnaf recipients) as .npy files, in a directory named
+after a hash of everything that went into it: generation seed, sample count,
+data-source switches and the state of each source. When a retrain or evaluation
+asks for the same inputs again, the feature matrix is memory-mapped straight from
+disk instead of being regenerated, re-read and re-concatenated.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIR = 'dataset_snapshots'
+
+# Oldest snapshots beyond this count are deleted when a new one is written
+MAX_SNAPSHOTS = 5
+
+# Bump when the layout or the data preparation logic changes, to invalidate old snapshots
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def snapshot_key(inputs):
+    """Content address for a dataset: SHA-256 of its (JSON-serializable) inputs."""
+    payload = json.dumps({'format_version': SNAPSHOT_FORMAT_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _snapshot_path(key, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, key)
+
+
+def load_snapshot(key, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Return (X, y, df, data_sources) for a stored snapshot, or None if there is none.
+    X and y are backed by read-only memory maps of the snapshot files.
+    """
+    path = _snapshot_path(key, snapshot_dir)
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        features = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        target = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+        family_ids = np.load(os.path.join(path, 'family_id.npy'), mmap_mode='r')
+    except Exception as e:
+        print(f"Warning: could not read dataset snapshot {key[:12]} ({str(e)})")
+        return None
+
+    # Mark as recently used, for pruning
+    os.utime(path)
+
+    X = pd.DataFrame(features, columns=meta['feature_columns'], copy=False)
+    y = pd.Series(target, name='deserves_help', copy=False)
+    df = X.assign(family_id=family_ids, deserves_help=y)
+    data_sources = dict(meta['data_sources'], snapshot=key)
+    return X, y, df, data_sources
+
+
+def save_snapshot(key, X, y, df, data_sources, snapshot_dir=SNAPSHOT_DIR):
+    """Write a snapshot for key (atomically: built in a temp dir, then renamed into place)."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = _snapshot_path(key, snapshot_dir)
+    if os.path.exists(path):
+        return path
+
+    tmp_path = tempfile.mkdtemp(prefix='.tmp_', dir=snapshot_dir)
+    try:
+        np.save(os.path.join(tmp_path, 'X.npy'), X.to_numpy(dtype=np.float64))
+        np.save(os.path.join(tmp_path, 'y.npy'), np.asarray(y, dtype=np.int64))
+        np.save(os.path.join(tmp_path, 'family_id.npy'), df['family_id'].astype(str).to_numpy(dtype=str))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'feature_columns': list(X.columns), 'data_sources': data_sources}, f, indent=4)
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process published the same snapshot first; theirs is identical
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(path):
+            raise
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    prune_snapshots(snapshot_dir)
+    return path
+
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, keep=MAX_SNAPSHOTS):
+    """Delete the least recently used snapshots beyond keep."""
+    if not os.path.isdir(snapshot_dir):
+        return
+    snapshots = [
+        os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir)
+        if not name.startswith('.tmp_') and os.path.isdir(os.path.join(snapshot_dir, name))
+    ]
+    snapshots.sort(key=os.path.getmtime, reverse=True)
+    for path in snapshots[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,141 @@
+"""
+Exact-Answer Lookup Table for the Family Assistance Classifier
+
+A tree ensemble only ever compares each feature against a finite set of split
+thresholds, so every input falls into one cell of the grid formed by those
+thresholds, and every input in the same cell follows the same path through
+every tree. Four of our features are 0/1 flags and family_members is a small
+integer, so the grid is small: it is dominated by the monthly_income split
+points. This module precomputes the forest's probabilities for each cell once,
+turning a prediction into a per-feature binary search plus one array lookup.
+"""
+
+import os
+
+import numpy as np
+
+# Refuse to build tables larger than this many cells
+MAX_TABLE_CELLS = 20_000_000
+
+# Number of grid cells scored per call while building the table
+BUILD_CHUNK_SIZE = 65536
+
+
+class EligibilityLookupTable:
+    """Forest probabilities for every cell of the split-threshold grid."""
+
+    def __init__(self, thresholds, table, classes, model_digest=None):
+        self.thresholds = thresholds  # list of sorted float64 arrays, one per feature
+        self.table = table            # float64 [n_cells, n_classes]
+        self.classes = classes
+        self.model_digest = model_digest
+        self.shape = tuple(len(t) + 1 for t in thresholds)
+
+    def cell_indices(self, X):
+        """Flat cell index of each row of X."""
+        # Trees test float32(x) <= threshold, so bucket the float32 values:
+        # the number of thresholds strictly below x identifies its cell
+        X = np.asarray(X, dtype=np.float32)
+        buckets = tuple(
+            np.searchsorted(t, X[:, f], side='left')
+            for f, t in enumerate(self.thresholds)
+        )
+        return np.ravel_multi_index(buckets, self.shape)
+
+    def predict_proba(self, X):
+        """Same probabilities as the forest the table was built from."""
+        return self.table[self.cell_indices(X)]
+
+    def predict(self, X):
+        """Class labels, as the argmax of predict_proba."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _split_thresholds(forest, n_features):
+    """Sorted unique split thresholds per feature of a compiled forest."""
+    is_split = forest.left != np.arange(len(forest.left))
+    return [
+        np.unique(forest.threshold[is_split & (forest.feature == f)])
+        for f in range(n_features)
+    ]
+
+
+def _bucket_representatives(thresholds):
+    """
+    One float32 value inside each bucket: the largest float32 <= each threshold,
+    plus the smallest float32 above the last one.
+    """
+    k = len(thresholds)
+    representatives = np.zeros(k + 1, dtype=np.float32)
+    if k == 0:
+        return representatives
+
+    below = thresholds.astype(np.float32)
+    too_high = below.astype(np.float64) > thresholds
+    below[too_high] = np.nextafter(below[too_high], np.float32(-np.inf))
+    representatives[:k] = below
+
+    above = np.float32(thresholds[-1])
+    if float(above) <= thresholds[-1]:
+        above = np.nextafter(above, np.float32(np.inf))
+    representatives[k] = above
+
+    # Two thresholds closer than one float32 step would leave a bucket without a value
+    if not np.array_equal(np.searchsorted(thresholds, representatives, side='left'), np.arange(k + 1)):
+        raise ValueError("Split thresholds are too close together to enumerate in float32")
+    return representatives
+
+
+def build_lookup_table(forest, n_features, max_cells=MAX_TABLE_CELLS):
+    """
+    Enumerate the threshold grid of a compiled forest and score one representative
+    input per cell. Returns None if the grid would exceed max_cells.
+    """
+    thresholds = _split_thresholds(forest, n_features)
+    shape = tuple(len(t) + 1 for t in thresholds)
+    n_cells = int(np.prod(shape, dtype=np.int64))
+    if n_cells > max_cells:
+        print(f"Lookup table would need {n_cells} cells (limit {max_cells}), skipping")
+        return None
+
+    representatives = [_bucket_representatives(t) for t in thresholds]
+    table = np.empty((n_cells, len(forest.classes)), dtype=np.float64)
+    for start in range(0, n_cells, BUILD_CHUNK_SIZE):
+        stop = min(start + BUILD_CHUNK_SIZE, n_cells)
+        buckets = np.unravel_index(np.arange(start, stop), shape)
+        X_cells = np.column_stack([representatives[f][buckets[f]] for f in range(n_features)])
+        table[start:stop] = forest.predict_proba(X_cells)
+
+    print(f"Built lookup table with {n_cells} cells, grid shape {shape}")
+    return EligibilityLookupTable(thresholds, table, forest.classes, forest.model_digest)
+
+
+def lookup_table_path(model_path):
+    """Where the lookup table of a model artifact lives."""
+    return os.path.splitext(model_path)[0] + '_lookup.npz'
+
+
+def save_lookup_table(lookup, path):
+    """Write the table to an .npz file (atomically, via a temp file + rename)."""
+    # Imported here: model_registry imports this module
+    from model_registry import publish_file
+    publish_file(path, lambda f: np.savez(
+        f,
+        thresholds=np.concatenate(lookup.thresholds),
+        threshold_counts=np.array([len(t) for t in lookup.thresholds], dtype=np.int64),
+        table=lookup.table,
+        classes=lookup.classes,
+        model_digest=np.array(lookup.model_digest or '')
+    ))
+
+
+def load_lookup_table(path):
+    """Load an EligibilityLookupTable written by save_lookup_table."""
+    with np.load(path, allow_pickle=False) as data:
+        split_points = np.cumsum(data['threshold_counts'])[:-1]
+        return EligibilityLookupTable(
+            thresholds=np.split(data['thresholds'], split_points),
+            table=data['table'],
+            classes=data['classes'],
+            model_digest=str(data['model_digest']) or None
+        )
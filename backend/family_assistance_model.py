@@ -2,69 +2,122 @@
 # filepath: c:\\Users\\User\\yolo\\family_assistance_model.py
 import pandas as pd
 import numpy as np
-import random
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+from sklearn.utils.class_weight import compute_class_weight
 import joblib
 import os
 import json
 from datetime import datetime
 import time
+from operator import itemgetter
+from model_registry import (
+    get_model_bundle, publish_artifact, publish_file, publish_json, publish_manifest, append_to_json_list, file_digest
+)
+from forest_engine import (
+    PARITY_TOLERANCE, check_parity, compile_forest, compiled_forest_path, probe_matrix, save_compiled_forest
+)
+from eligibility_lookup import build_lookup_table, lookup_table_path, save_lookup_table
+from verified_data_store import DEFAULT_STORE_PATH, append_verified_records, load_verified_data, max_record_id
+from dataset_snapshots import load_snapshot, save_snapshot, snapshot_key
 
-# 1 & 3: Define Features (Implicitly) and Generate Dummy Data with Ranges
-def generate_family_data(n_samples=5000):
-    """Generate dummy data for families with specified ranges."""
-    np.random.seed(42)
-    data = []
-    
+# Model input features, in training order
+FEATURE_COLUMNS = [
+    "monthly_income", 
+    "family_members", 
+    "has_stable_housing", 
+    "access_to_clean_water", 
+    "access_to_electricity", 
+    "has_significant_health_issues"
+]
+
+# Binary (0/1) indicator features
+FLAG_COLUMNS = [
+    "has_stable_housing", 
+    "access_to_clean_water", 
+    "access_to_electricity", 
+    "has_significant_health_issues"
+]
+
+# Defaults used for missing values at prediction time
+FEATURE_FILL_VALUES = {
+    'monthly_income': 0,
+    'family_members': 1,
+    'has_stable_housing': 0,
+    'access_to_clean_water': 0,
+    'access_to_electricity': 0,
+    'has_significant_health_issues': 0
+}
+
+# Rows generated per chunk when fabricating large synthetic datasets
+GENERATION_CHUNK_SIZE = 100000
+
+def _generate_family_chunk(rng, n_samples, id_offset=0):
+    """Generate one chunk of dummy families, column by column, from a single numpy Generator."""
     # Define realistic ranges and distributions
+    n_low = int(n_samples * 0.6)
+    n_middle = int(n_samples * 0.3)
+    n_high = n_samples - n_low - n_middle
     income_options = np.concatenate([
-        np.random.normal(loc=500, scale=150, size=int(n_samples * 0.6)), # Lower income majority
-        np.random.normal(loc=1200, scale=300, size=int(n_samples * 0.3)), # Middle income
-        np.random.normal(loc=2500, scale=500, size=int(n_samples * 0.1))  # Higher income minority
+        rng.normal(loc=500, scale=150, size=n_low),   # Lower income majority
+        rng.normal(loc=1200, scale=300, size=n_middle), # Middle income
+        rng.normal(loc=2500, scale=500, size=n_high)  # Higher income minority
     ])
-    np.random.shuffle(income_options)
+    rng.shuffle(income_options)
     
-    for i in range(n_samples):
-        # --- Feature Generation ---
-        # Monthly Income (MYR)
-        monthly_income = max(100, round(income_options[i])) # Ensure minimum income
-        
-        # Family Members
-        family_members = np.random.randint(1, 9) # Range 1 to 8 members
-        
-        # Housing Stability (0: Unstable, 1: Stable)
-        # More likely unstable if income is very low
-        housing_prob = 0.2 + (monthly_income / 3000) * 0.7 
-        has_stable_housing = 1 if random.random() < min(0.9, housing_prob) else 0
-        
-        # Access to Clean Water (0: No, 1: Yes)
-        water_prob = 0.3 + (monthly_income / 2500) * 0.6
-        access_to_clean_water = 1 if random.random() < min(0.95, water_prob) else 0
-        
-        # Access to Electricity (0: No, 1: Yes)
-        electricity_prob = 0.4 + (monthly_income / 2000) * 0.55
-        access_to_electricity = 1 if random.random() < min(0.98, electricity_prob) else 0
-        
-        # REMOVED: Children School Attendance Rate 
-
-        # Health Issues (0: Few/None, 1: Significant)
-        health_prob = 0.4 - (monthly_income / 5000) * 0.3 - access_to_clean_water * 0.1
-        has_significant_health_issues = 1 if random.random() < max(0.05, health_prob) else 0
-
-        record = {
-            "monthly_income": monthly_income,
-            "family_members": family_members,
-            "has_stable_housing": has_stable_housing,
-            "access_to_clean_water": access_to_clean_water,
-            "access_to_electricity": access_to_electricity,
-            "has_significant_health_issues": has_significant_health_issues,
-            "family_id": f"FAM_{i:04d}"
-        }
-        data.append(record)
-        
-    return pd.DataFrame(data)
+    # Monthly Income (MYR)
+    monthly_income = np.maximum(100, np.round(income_options)).astype(np.int64) # Ensure minimum income
+    
+    # Family Members
+    family_members = rng.integers(1, 9, size=n_samples) # Range 1 to 8 members
+    
+    # Housing Stability (0: Unstable, 1: Stable)
+    # More likely unstable if income is very low
+    housing_prob = 0.2 + (monthly_income / 3000) * 0.7
+    has_stable_housing = (rng.random(n_samples) < np.minimum(0.9, housing_prob)).astype(np.int64)
+    
+    # Access to Clean Water (0: No, 1: Yes)
+    water_prob = 0.3 + (monthly_income / 2500) * 0.6
+    access_to_clean_water = (rng.random(n_samples) < np.minimum(0.95, water_prob)).astype(np.int64)
+    
+    # Access to Electricity (0: No, 1: Yes)
+    electricity_prob = 0.4 + (monthly_income / 2000) * 0.55
+    access_to_electricity = (rng.random(n_samples) < np.minimum(0.98, electricity_prob)).astype(np.int64)
+    
+    # REMOVED: Children School Attendance Rate 
+    
+    # Health Issues (0: Few/None, 1: Significant)
+    health_prob = 0.4 - (monthly_income / 5000) * 0.3 - access_to_clean_water * 0.1
+    has_significant_health_issues = (rng.random(n_samples) < np.maximum(0.05, health_prob)).astype(np.int64)
+    
+    family_ids = np.char.zfill(np.arange(id_offset, id_offset + n_samples).astype(str), 4)
+    
+    return pd.DataFrame({
+        "monthly_income": monthly_income,
+        "family_members": family_members,
+        "has_stable_housing": has_stable_housing,
+        "access_to_clean_water": access_to_clean_water,
+        "access_to_electricity": access_to_electricity,
+        "has_significant_health_issues": has_significant_health_issues,
+        "family_id": np.char.add("FAM_", family_ids)
+    })
+
+def iter_family_data_chunks(n_samples, chunk_size=GENERATION_CHUNK_SIZE, seed=42):
+    """Yield dummy family data as DataFrames of at most chunk_size rows, reproducibly for a given seed."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_size):
+        yield _generate_family_chunk(rng, min(chunk_size, n_samples - start), id_offset=start)
+
+# 1 & 3: Define Features (Implicitly) and Generate Dummy Data with Ranges
+def generate_family_data(n_samples=5000, seed=42, chunk_size=GENERATION_CHUNK_SIZE):
+    """Generate dummy data for families with specified ranges."""
+    chunks = list(iter_family_data_chunks(n_samples, chunk_size=chunk_size, seed=seed))
+    if not chunks:
+        return _generate_family_chunk(np.random.default_rng(seed), 0)
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
 
 # 4. Create Condition for Donation/Help (Adjusted for Asnaf focus)
 def define_assistance_need(df):
@@ -184,25 +237,46 @@ def load_asnaf_recipients_data(file_path='../client/src/data/asnafRecipients.jso
         print(f"Error loading asnaf recipients data: {str(e)}")
         return pd.DataFrame()
 
-def prepare_family_data(n_dummy_samples=1000, load_saved_data=True, load_asnaf_data=True):
-    """Generate, define need, and prepare data for modeling."""
+def prepare_family_data(n_dummy_samples=1000, load_saved_data=True, load_asnaf_data=True, seed=None):
+    """
+    Generate, define need, and prepare data for modeling.
+    With an explicit seed the result is deterministic, so it is stored as a dataset
+    snapshot and later calls with the same seed and unchanged data sources reuse it
+    (memory-mapped) instead of rebuilding it.
+    """
+    # Pin the newest verified record id first, so we know exactly what is included
+    verified_watermark = max_record_id() if load_saved_data else 0
+    
+    snapshot = None
+    if seed is not None:
+        snapshot = snapshot_key({
+            'n_dummy_samples': n_dummy_samples,
+            'seed': seed,
+            'load_saved_data': load_saved_data,
+            'verified_watermark': verified_watermark,
+            'load_asnaf_data': load_asnaf_data,
+            'asnaf_digest': _asnaf_recipients_digest() if load_asnaf_data else None
+        })
+        cached = load_snapshot(snapshot)
+        if cached is not None:
+            print(f"Reusing dataset snapshot {snapshot[:12]} ({len(cached[0])} samples)")
+            return cached
+    
     print(f"Generating {n_dummy_samples} dummy family records...")
     
-    # Check if we already have saved data to determine how many new samples to generate
+    # Load the verified real data once, up front
     saved_data_count = 0
+    saved_df = None
     if load_saved_data:
-        saved_data_path = 'saved_family_data.csv'
-        if os.path.exists(saved_data_path):
-            saved_df = pd.read_csv(saved_data_path)
-            saved_data_count = len(saved_df)
-            print(f"Found {saved_data_count} existing saved records")
+        saved_df = load_verified_data(up_to_id=verified_watermark)
+        saved_data_count = len(saved_df)
+        print(f"Found {saved_data_count} existing saved records")
     
-    # Generate new dummy data with a different random seed based on current time
+    # Without an explicit seed, use a different random seed based on current time
     # This ensures we get different dummy data each time
-    current_seed = int(time.time()) % 10000
-    np.random.seed(current_seed)
+    current_seed = seed if seed is not None else int(time.time()) % 10000
     print(f"Using random seed: {current_seed} for new dummy data generation")
-    df = generate_family_data(n_dummy_samples)
+    df = generate_family_data(n_dummy_samples, seed=current_seed)
 
     print("Defining assistance need based on Asnaf-focused conditions...")
     df = define_assistance_need(df)
@@ -235,20 +309,17 @@ def prepare_family_data(n_dummy_samples=1000, load_saved_data=True, load_asnaf_d
     
     df = pd.concat([df, explicit_examples], ignore_index=True)
     
-    # Load previously saved real data if available and requested
-    if load_saved_data:
-        saved_data_path = 'saved_family_data.csv'
-        if os.path.exists(saved_data_path):
-            print(f"Loading saved real data from {saved_data_path}")
-            saved_df = pd.read_csv(saved_data_path)
-            # Ensure the saved data has the same columns
-            if set(df.columns).issubset(set(saved_df.columns)):
-                # Keep only the columns that are in the current dataframe
-                saved_df = saved_df[df.columns]
-                df = pd.concat([df, saved_df], ignore_index=True)
-                print(f"Added {len(saved_df)} real data samples to training data")
-            else:
-                print("Warning: Saved data has different columns, skipping")
+    # Add previously saved real data if available and requested
+    if saved_df is not None and saved_data_count > 0:
+        print("Adding saved real data from the verified data store")
+        # Ensure the saved data has the same columns
+        if set(df.columns).issubset(set(saved_df.columns)):
+            # Keep only the columns that are in the current dataframe
+            saved_df = saved_df[df.columns]
+            df = pd.concat([df, saved_df], ignore_index=True)
+            print(f"Added {len(saved_df)} real data samples to training data")
+        else:
+            print("Warning: Saved data has different columns, skipping")
     
     # Load asnaf recipients data if requested
     asnaf_count = 0
@@ -287,33 +358,169 @@ def prepare_family_data(n_dummy_samples=1000, load_saved_data=True, load_asnaf_d
     data_sources = {
         'synthetic_samples': n_dummy_samples,
         'saved_data_samples': saved_data_count,
+        'verified_watermark': int(verified_watermark),
         'asnaf_data_samples': asnaf_count,
         'generation_seed': current_seed,
         'generation_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
-    # Save this information to a tracking file
+    # Save this information to a tracking file (locked, so concurrent trainers keep every entry)
+    append_to_json_list(data_sources, 'data_generation_history.json')
+    
+    if snapshot is not None:
+        save_snapshot(snapshot, X, y, df, data_sources)
+        data_sources = dict(data_sources, snapshot=snapshot)
+    
+    return X, y, df, data_sources
+
+
+# Model artifacts written by training
+MODEL_FILENAME = 'family_assistance_classifier.joblib'
+FEATURE_COLUMNS_FILENAME = 'feature_columns.joblib'
+
+# Incremental retraining: training matrix of the last full build, plus settings
+TRAINING_CACHE_FILENAME = 'training_cache.npz'
+BASE_TREES = 150                # Trees in a fully rebuilt forest
+INCREMENTAL_TREES = 25          # Trees added per incremental update
+FULL_REBUILD_EVERY = 10         # Rebuild from scratch after this many incremental updates
+# Rebuild from scratch once the forest would grow past this; with the default tree counts
+# it is the size reached after FULL_REBUILD_EVERY updates, so the two limits agree
+MAX_INCREMENTAL_TREES = BASE_TREES + FULL_REBUILD_EVERY * INCREMENTAL_TREES
+
+def _report_progress(progress_callback, stage, progress):
+    """Forward a training stage to the caller's progress callback, if any."""
+    if progress_callback is not None:
+        progress_callback(stage, progress)
+
+def _evaluate_model(model, X_test, y_test, feature_columns):
+    """Print the evaluation report and return (accuracy, feature_importance)."""
+    y_pred = model.predict(X_test)
+    
+    accuracy = accuracy_score(y_test, y_pred)
+    report = classification_report(y_test, y_pred)
+    conf_matrix = confusion_matrix(y_test, y_pred)
+    
+    print(f"\nModel Accuracy: {accuracy:.4f}")
+    print("\nClassification Report:")
+    print(report)
+    print("\nConfusion Matrix:")
+    print(conf_matrix)
+    
+    # Feature Importance
+    feature_importance = {}
     try:
-        with open('data_generation_history.json', 'r') as f:
-            history = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        history = []
+        feature_importance = dict(zip(feature_columns, model.feature_importances_))
+        print("\nTop Features Influencing Decision:")
+        for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
+            print(f"- {feature}: {importance:.4f}")
+    except AttributeError:
+        print("\nCould not retrieve feature importances.") # Should not happen with RF
     
-    history.append(data_sources)
+    return accuracy, feature_importance
+
+def _publish_model(model, feature_columns, X_test, model_metadata):
+    """Publish the model, its derived inference artifacts and its metadata."""
+    # Save the model (atomically; running APIs hot-swap to it once the manifest is published below)
+    model_filename = MODEL_FILENAME
+    publish_artifact(model, model_filename)
+    print(f"\nModel saved as '{model_filename}'")
     
-    with open('data_generation_history.json', 'w') as f:
-        json.dump(history, f, indent=4)
+    # Save feature columns for future reference
+    feature_columns_filename = FEATURE_COLUMNS_FILENAME
+    publish_artifact(feature_columns, feature_columns_filename)
+    print(f"Feature columns saved as '{feature_columns_filename}'")
     
-    return X, y, df, data_sources
+    # Export the forest as flat node arrays for the compiled inference engine,
+    # but only if it reproduces sklearn's probabilities on the held-out data
+    model_digest = file_digest(model_filename)
+    forest_filename = None
+    lookup_filename = None
+    compiled = compile_forest(model)
+    max_diff = check_parity(model, compiled, X_test)
+    if max_diff <= PARITY_TOLERANCE:
+        compiled.model_digest = model_digest
+        forest_filename = compiled_forest_path(model_filename)
+        save_compiled_forest(compiled, forest_filename)
+        print(f"Compiled forest saved as '{forest_filename}' (max difference {max_diff:.2e})")
+        
+        # Rebuild the exact-answer lookup table for the new model
+        lookup = build_lookup_table(compiled, len(feature_columns))
+        if lookup is not None:
+            lookup_check = pd.concat([X_test, pd.DataFrame(probe_matrix(compiled, len(feature_columns)), columns=feature_columns)])
+            lookup_diff = check_parity(model, lookup, lookup_check)
+            if lookup_diff <= PARITY_TOLERANCE:
+                lookup_filename = lookup_table_path(model_filename)
+                save_lookup_table(lookup, lookup_filename)
+                print(f"Lookup table saved as '{lookup_filename}' (max difference {lookup_diff:.2e})")
+            else:
+                print(f"Warning: lookup table differs from sklearn by {lookup_diff:.2e}, not exported")
+    else:
+        print(f"Warning: compiled forest differs from sklearn by {max_diff:.2e}, not exported")
+    
+    # Written last: running APIs reload once, when the manifest changes
+    publish_manifest(model_filename, model_digest, compiled_forest=forest_filename, lookup_table=lookup_filename)
+    
+    # Keep track of model history
+    append_to_json_list(model_metadata, 'model_history.json')
+    
+    # Save current model metadata
+    publish_json(model_metadata, 'model_metadata.json')
+    print(f"Model metadata saved as 'model_metadata.json'")
+
+def _asnaf_recipients_digest():
+    """Digest of the asnaf recipients file the trainer reads (None if it is missing)."""
+    for path in ('../client/src/data/asnafRecipients.json', 'client/src/data/asnafRecipients.json'):
+        if os.path.exists(path):
+            return file_digest(path)
+    return None
 
+def _save_training_cache(X_train, y_train, X_test, y_test, verified_watermark, asnaf_digest, updates_since_rebuild):
+    """Keep the training matrix so incremental retrains only need to append new rows."""
+    publish_file(TRAINING_CACHE_FILENAME, lambda f: np.savez(
+        f,
+        X_train=X_train.to_numpy(dtype=np.float64),
+        y_train=np.asarray(y_train, dtype=np.int64),
+        X_test=X_test.to_numpy(dtype=np.float64),
+        y_test=np.asarray(y_test, dtype=np.int64),
+        feature_columns=np.array(list(X_train.columns)),
+        verified_watermark=np.array(int(verified_watermark)),
+        asnaf_digest=np.array(asnaf_digest or ''),
+        updates_since_rebuild=np.array(int(updates_since_rebuild))
+    ))
+
+def _load_training_cache():
+    """The cached training matrix as a dict, or None if there is no usable cache."""
+    if not os.path.exists(TRAINING_CACHE_FILENAME):
+        return None
+    try:
+        with np.load(TRAINING_CACHE_FILENAME, allow_pickle=False) as data:
+            feature_columns = data['feature_columns'].tolist()
+            return {
+                'X_train': pd.DataFrame(data['X_train'], columns=feature_columns),
+                'y_train': pd.Series(data['y_train'], name='deserves_help'),
+                'X_test': pd.DataFrame(data['X_test'], columns=feature_columns),
+                'y_test': pd.Series(data['y_test'], name='deserves_help'),
+                'verified_watermark': int(data['verified_watermark']),
+                'asnaf_digest': str(data['asnaf_digest']) or None,
+                'updates_since_rebuild': int(data['updates_since_rebuild'])
+            }
+    except Exception as e:
+        print(f"Warning: could not read training cache ({str(e)})")
+        return None
 
 # 5. Generate Random Forest Model (Classification)
-def train_family_classifier(n_dummy_samples=5000, load_saved_data=True, load_asnaf_data=True):
-    """Train a Random Forest Classifier model."""
+def train_family_classifier(n_dummy_samples=5000, load_saved_data=True, load_asnaf_data=True, progress_callback=None, seed=None):
+    """
+    Train a Random Forest Classifier model.
+    progress_callback, if given, is called as progress_callback(stage, fraction_done).
+    seed fixes the synthetic data (and enables dataset snapshot reuse, see prepare_family_data).
+    """
+    _report_progress(progress_callback, 'preparing data', 0.05)
     X, y, full_df, data_sources = prepare_family_data(
         n_dummy_samples=n_dummy_samples, 
         load_saved_data=load_saved_data,
-        load_asnaf_data=load_asnaf_data
+        load_asnaf_data=load_asnaf_data,
+        seed=seed
     )
     
     # Split data
@@ -325,7 +532,7 @@ def train_family_classifier(n_dummy_samples=5000, load_saved_data=True, load_asn
     # Initialize and train the Random Forest Classifier
     # Adjust parameters as needed (e.g., class_weight for imbalanced data)
     model = RandomForestClassifier(
-        n_estimators=150,       # Number of trees
+        n_estimators=BASE_TREES, # Number of trees
         max_depth=12,           # Max depth of trees
         min_samples_split=10,   # Min samples to split a node
         min_samples_leaf=5,     # Min samples in a leaf node
@@ -334,78 +541,231 @@ def train_family_classifier(n_dummy_samples=5000, load_saved_data=True, load_asn
         n_jobs=-1               # Use all available CPU cores
     )
     
+    _report_progress(progress_callback, 'training', 0.3)
     print("\nTraining the RandomForestClassifier...")
     model.fit(X_train, y_train)
     print("Training complete.")
     
     # Evaluate the model
+    _report_progress(progress_callback, 'evaluating', 0.7)
     print("\nEvaluating model performance...")
-    y_pred = model.predict(X_test)
+    accuracy, feature_importance = _evaluate_model(model, X_test, y_test, X.columns)
     
-    accuracy = accuracy_score(y_test, y_pred)
-    report = classification_report(y_test, y_pred)
-    conf_matrix = confusion_matrix(y_test, y_pred)
+    # Save model metadata
+    model_metadata = {
+        'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'training_mode': 'full',
+        'accuracy': float(accuracy),
+        'samples_count': len(full_df),
+        'n_estimators': model.n_estimators,
+        'feature_importance': {k: float(v) for k, v in feature_importance.items()},
+        'data_sources': data_sources
+    }
     
-    print(f"\nModel Accuracy: {accuracy:.4f}")
-    print("\nClassification Report:")
-    print(report)
-    print("\nConfusion Matrix:")
-    print(conf_matrix)
+    _report_progress(progress_callback, 'publishing', 0.8)
+    _publish_model(model, X.columns, X_test, model_metadata)
     
-    # Feature Importance
-    try:
-        feature_importance = dict(zip(X.columns, model.feature_importances_))
-        print("\nTop Features Influencing Decision:")
-        for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
-            print(f"- {feature}: {importance:.4f}")
-    except AttributeError:
-        print("\nCould not retrieve feature importances.") # Should not happen with RF
+    # Remember what this build was trained on, for later incremental updates
+    if load_saved_data and load_asnaf_data:
+        _save_training_cache(
+            X_train, y_train, X_test, y_test,
+            verified_watermark=data_sources['verified_watermark'],
+            asnaf_digest=_asnaf_recipients_digest(),
+            updates_since_rebuild=0
+        )
+    
+    _report_progress(progress_callback, 'done', 1.0)
+    return model, X.columns
 
-    # Save the model
-    model_filename = 'family_assistance_classifier.joblib'
-    joblib.dump(model, model_filename)
-    print(f"\nModel saved as '{model_filename}'")
+def update_family_classifier_incrementally(n_dummy_samples=5000, extra_trees=INCREMENTAL_TREES, progress_callback=None, seed=None):
+    """
+    Update the current model with verified records saved since the last build,
+    without regenerating the synthetic data or refitting the existing trees:
+    the new rows are appended to the cached training matrix and extra_trees
+    new trees are grown on it (warm start).
+    Falls back to a full train_family_classifier run when there is no cache, the
+    asnaf recipients data changed, the forest would grow past MAX_INCREMENTAL_TREES,
+    or FULL_REBUILD_EVERY incremental updates have been made since the last full build.
+    """
+    _report_progress(progress_callback, 'preparing data', 0.05)
+    cache = _load_training_cache()
+    
+    rebuild_reason = None
+    model = None
+    if cache is None:
+        rebuild_reason = "no training cache"
+    elif not os.path.exists(MODEL_FILENAME):
+        rebuild_reason = "no existing model"
+    elif cache['asnaf_digest'] != _asnaf_recipients_digest():
+        rebuild_reason = "asnaf recipients data changed"
+    elif cache['updates_since_rebuild'] >= FULL_REBUILD_EVERY:
+        rebuild_reason = f"{cache['updates_since_rebuild']} incremental updates since the last full build"
+    else:
+        model = joblib.load(MODEL_FILENAME)
+        if model.n_estimators + extra_trees > MAX_INCREMENTAL_TREES:
+            rebuild_reason = f"forest would exceed {MAX_INCREMENTAL_TREES} trees"
+    
+    if rebuild_reason is not None:
+        print(f"Full rebuild instead of incremental update: {rebuild_reason}")
+        return train_family_classifier(n_dummy_samples=n_dummy_samples, progress_callback=progress_callback, seed=seed)
+    
+    # Only the records appended since the cached build
+    verified_watermark = max_record_id()
+    new_df = load_verified_data(after_id=cache['verified_watermark'], up_to_id=verified_watermark)
+    if new_df.empty:
+        print("No new verified records since the last build; model unchanged")
+        _report_progress(progress_callback, 'done', 1.0)
+        return model, model.feature_names_in_
+    
+    feature_columns = cache['X_train'].columns
+    new_df = new_df[list(feature_columns) + ['deserves_help']].fillna(FEATURE_FILL_VALUES)
+    X_train = pd.concat([cache['X_train'], new_df[feature_columns].astype(np.float64)], ignore_index=True)
+    y_train = pd.concat([cache['y_train'], new_df['deserves_help'].astype(np.int64)], ignore_index=True)
+    print(f"Appending {len(new_df)} new verified records ({len(X_train)} training samples in total)")
+    
+    # Grow extra trees on the extended data; the existing trees are kept as they are.
+    # 'balanced' class weights are computed from the full extended training set and
+    # passed explicitly, as sklearn recommends for warm_start
+    _report_progress(progress_callback, 'training', 0.3)
+    class_weight = model.class_weight
+    if class_weight == 'balanced':
+        classes = np.unique(y_train)
+        weights = compute_class_weight('balanced', classes=classes, y=y_train)
+        model.set_params(class_weight=dict(zip(classes.tolist(), weights)))
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False, class_weight=class_weight)
+    print(f"Forest grown to {model.n_estimators} trees")
     
-    # Save feature columns for future reference
-    feature_columns_filename = 'feature_columns.joblib'
-    joblib.dump(X.columns, feature_columns_filename)
-    print(f"Feature columns saved as '{feature_columns_filename}'")
+    _report_progress(progress_callback, 'evaluating', 0.7)
+    print("\nEvaluating model performance...")
+    accuracy, feature_importance = _evaluate_model(model, cache['X_test'], cache['y_test'], feature_columns)
     
-    # Save model metadata
+    updates_since_rebuild = cache['updates_since_rebuild'] + 1
     model_metadata = {
         'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'training_mode': 'incremental',
         'accuracy': float(accuracy),
-        'samples_count': len(full_df),
+        'samples_count': len(X_train) + len(cache['X_test']),
+        'n_estimators': model.n_estimators,
         'feature_importance': {k: float(v) for k, v in feature_importance.items()},
-        'data_sources': data_sources
+        'data_sources': {
+            'new_verified_samples': len(new_df),
+            'verified_watermark': int(verified_watermark),
+            'incremental_updates_since_rebuild': updates_since_rebuild
+        }
     }
     
-    # Keep track of model history
+    _report_progress(progress_callback, 'publishing', 0.8)
+    _publish_model(model, feature_columns, cache['X_test'], model_metadata)
+    _save_training_cache(
+        X_train, y_train, cache['X_test'], cache['y_test'],
+        verified_watermark=verified_watermark,
+        asnaf_digest=cache['asnaf_digest'],
+        updates_since_rebuild=updates_since_rebuild
+    )
+    
+    _report_progress(progress_callback, 'done', 1.0)
+    return model, feature_columns
+
+def _resolve_feature_columns(bundle, feature_columns=None):
+    """Pick the feature column order: explicit argument, then the saved columns, then the defaults."""
+    if feature_columns is None:
+        # Use the feature columns saved alongside the model
+        if bundle.feature_columns is not None:
+            feature_columns = bundle.feature_columns
+        else:
+            print("Warning: Feature columns not provided and not found in saved file.")
+            # Default to expected columns
+            feature_columns = FEATURE_COLUMNS
+    
+    # Ensure feature_columns is a list of strings
+    if isinstance(feature_columns, pd.Index):
+        return feature_columns.tolist()
+    return list(feature_columns)
+
+def records_to_feature_matrix(records, feature_columns=FEATURE_COLUMNS):
+    """
+    Validate and cast a list of record dicts into a float64 feature matrix in one pass.
+    Columns follow feature_columns; the binary flags are truncated to integers the same
+    way int() did in the per-record API validation.
+    Raises ValueError if a field is missing or null (or NaN), or a value cannot be
+    cast to a number.
+    """
+    if len(records) == 0:
+        return np.empty((0, len(feature_columns)), dtype=np.float64)
+    
+    # Pull the fields of every record as one tuple each, without per-field Python loops
+    getter = itemgetter(*feature_columns)
     try:
-        with open('model_history.json', 'r') as f:
-            model_history = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        model_history = []
+        rows = list(map(getter, records))
+    except KeyError as e:
+        raise ValueError(f"Missing required field: {e.args[0]} in one of the records")
+    except TypeError:
+        raise ValueError("Each record must be a JSON object")
     
-    model_history.append(model_metadata)
+    try:
+        X = np.array(rows, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid numeric value in records: {str(e)}")
+    
+    # The cast turns null into NaN, which scoring would silently impute: reject it instead
+    missing = np.isnan(X)
+    if missing.any():
+        _, col = np.argwhere(missing)[0]
+        raise ValueError(f"Missing value for field: {feature_columns[col]} in one of the records")
+    
+    flag_indices = [i for i, col in enumerate(feature_columns) if col in FLAG_COLUMNS]
+    X[:, flag_indices] = np.trunc(X[:, flag_indices])
+    return X
+
+def _predict_feature_matrix(bundle, X, feature_columns_list):
+    """Score a float feature matrix (columns in feature_columns_list order) and build the result dicts."""
+    if len(X) == 0:
+        return []
     
-    with open('model_history.json', 'w') as f:
-        json.dump(model_history, f, indent=4)
+    # Handle potential missing values in new data
+    fill_values = np.array([FEATURE_FILL_VALUES.get(col, 0) for col in feature_columns_list], dtype=np.float64)
+    missing = np.isnan(X)
+    if missing.any():
+        X = np.where(missing, fill_values, X)
+    
+    # A single predict_proba; the label is the argmax, exactly as RandomForestClassifier.predict does
+    if bundle.lookup is not None:
+        prediction_proba = bundle.lookup.predict_proba(X)
+    elif bundle.compiled is not None:
+        prediction_proba = bundle.compiled.predict_proba(X)
+    else:
+        prediction_proba = bundle.model.predict_proba(pd.DataFrame(X, columns=feature_columns_list, copy=False))
+    classes = np.asarray(bundle.model.classes_)
+    prediction = classes[np.argmax(prediction_proba, axis=1)]
     
-    # Save current model metadata
-    with open('model_metadata.json', 'w') as f:
-        json.dump(model_metadata, f, indent=4)
-    print(f"Model metadata saved as 'model_metadata.json'")
+    positive_class = np.flatnonzero(classes == 1)
+    if positive_class.size:
+        probability_help = prediction_proba[:, positive_class[0]] # Probability of class 1 (deserves help)
+    else:
+        probability_help = np.zeros(len(X))
     
-    return model, X.columns
+    statuses = np.where(prediction == 1, "Deserves Help", "Does Not Currently Qualify").tolist()
+    # Same text as f"{p:.2%}", formatted for the whole column at once
+    probabilities = np.char.mod('%.2f%%', probability_help * 100).tolist()
+    
+    return [
+        {
+            "prediction": status,
+            "probability_deserves_help": probability,
+            "input_data": dict(zip(feature_columns_list, row))
+        }
+        for status, probability, row in zip(statuses, probabilities, X.tolist())
+    ]
 
 def predict_family_status(family_data, model_path='family_assistance_classifier.joblib', feature_columns=None):
     """Predict if a new family needs assistance using the trained model."""
-    if not os.path.exists(model_path):
+    # The registry keeps the model resident and only reloads it when the file changes
+    bundle = get_model_bundle(model_path)
+    if bundle is None:
         print(f"Error: Model file not found at {model_path}")
         return None
-        
-    model = joblib.load(model_path)
     
     # Ensure input is a DataFrame and has the correct columns
     if isinstance(family_data, dict): # Handle single dictionary input
@@ -418,26 +778,7 @@ def predict_family_status(family_data, model_path='family_assistance_classifier.
         print("Error: Invalid input type for family_data. Expected dict, list of dicts, or DataFrame.")
         return None
 
-    if feature_columns is None:
-        # Try to load feature columns from saved file
-        feature_columns_path = 'feature_columns.joblib'
-        if os.path.exists(feature_columns_path):
-            feature_columns = joblib.load(feature_columns_path)
-            print(f"Loaded feature columns from {feature_columns_path}")
-        else:
-            print("Warning: Feature columns not provided and not found in saved file.")
-            # Default to expected columns
-            feature_columns = [
-                "monthly_income", "family_members", "has_stable_housing", 
-                "access_to_clean_water", "access_to_electricity", 
-                "has_significant_health_issues"
-            ]
-    
-    # Ensure feature_columns is a list of strings
-    if isinstance(feature_columns, pd.Index):
-        feature_columns_list = feature_columns.tolist()
-    else:
-        feature_columns_list = list(feature_columns) # Ensure it's a list
+    feature_columns_list = _resolve_feature_columns(bundle, feature_columns)
     
     # Check if all required columns are present
     missing_columns = [col for col in feature_columns_list if col not in family_df.columns]
@@ -445,41 +786,69 @@ def predict_family_status(family_data, model_path='family_assistance_classifier.
         print(f"Error: Missing columns in input data: {missing_columns}")
         return None
     
-    family_df = family_df[feature_columns_list] # Ensure correct order and columns
+    # Ensure correct order and columns
+    X = family_df[feature_columns_list].to_numpy(dtype=np.float64)
+    return _predict_feature_matrix(bundle, X, feature_columns_list)
 
-    # Handle potential missing values in new data
-    family_df = family_df.fillna({
-        'monthly_income': 0,
-        'family_members': 1,
-        'has_stable_housing': 0,
-        'access_to_clean_water': 0,
-        'access_to_electricity': 0,
-        'has_significant_health_issues': 0
-    })
+def predict_family_records(records, model_path='family_assistance_classifier.joblib', feature_columns=None):
+    """
+    Columnar batch prediction for a list of raw record dicts (e.g. a parsed JSON body).
+    Validation, casting and scoring each happen once for the whole batch.
+    Raises ValueError for invalid records; returns None if the model is missing.
+    """
+    bundle = get_model_bundle(model_path)
+    if bundle is None:
+        print(f"Error: Model file not found at {model_path}")
+        return None
+    
+    feature_columns_list = _resolve_feature_columns(bundle, feature_columns)
+    X = records_to_feature_matrix(records, feature_columns_list)
+    return _predict_feature_matrix(bundle, X, feature_columns_list)
 
-    prediction = model.predict(family_df)
-    prediction_proba = model.predict_proba(family_df) # Probability for each class [0, 1]
+def predict_family_records_lenient(records, model_path='family_assistance_classifier.joblib', feature_columns=None):
+    """
+    Like predict_family_records, but an invalid record does not fail the batch.
+    Returns one entry per record, in order: a result dict, or {"error": message} for
+    a record that failed validation. Each record is only validated on its own (a cheap
+    cast); the valid ones are still scored with a single model call.
+    Returns None if the model is missing.
+    """
+    bundle = get_model_bundle(model_path)
+    if bundle is None:
+        print(f"Error: Model file not found at {model_path}")
+        return None
     
-    results = []
-    for i, pred in enumerate(prediction):
-        status = "Deserves Help" if pred == 1 else "Does Not Currently Qualify"
-        probability_help = prediction_proba[i][1] # Probability of class 1 (deserves help)
-        results.append({
-            "prediction": status,
-            "probability_deserves_help": f"{probability_help:.2%}",
-            "input_data": family_df.iloc[i].to_dict()
-        })
-        
-    return results
+    feature_columns_list = _resolve_feature_columns(bundle, feature_columns)
+    try:
+        X = records_to_feature_matrix(records, feature_columns_list)
+        return _predict_feature_matrix(bundle, X, feature_columns_list)
+    except ValueError:
+        pass # At least one invalid record: find which, and score the rest
+    
+    outputs = [None] * len(records)
+    valid_indices = []
+    valid_rows = []
+    for i, record in enumerate(records):
+        try:
+            valid_rows.append(records_to_feature_matrix([record], feature_columns_list)[0])
+            valid_indices.append(i)
+        except ValueError as e:
+            outputs[i] = {"error": str(e)}
+    
+    if valid_rows:
+        results = _predict_feature_matrix(bundle, np.vstack(valid_rows), feature_columns_list)
+        for i, result in zip(valid_indices, results):
+            outputs[i] = result
+    return outputs
 
-def save_verified_data(family_data, actual_eligibility, save_path='saved_family_data.csv'):
+def save_verified_data(family_data, actual_eligibility, save_path=DEFAULT_STORE_PATH):
     """
     Save verified family data to improve the model over time.
     
     Parameters:
     - family_data: Dict or DataFrame containing family features
     - actual_eligibility: Boolean or int (1/0) indicating if family actually deserves help
-    - save_path: Path to save the data
+    - save_path: Path of the verified data store (SQLite database)
     """
     # Convert to DataFrame if it's a dict
     if isinstance(family_data, dict):
@@ -502,61 +871,38 @@ def save_verified_data(family_data, actual_eligibility, save_path='saved_family_
     if 'family_id' not in family_df.columns:
         family_df['family_id'] = f"FAM_REAL_{datetime.now().strftime('%Y%m%d%H%M%S')}"
     
-    # Check if file exists to append or create new
-    if os.path.exists(save_path):
-        # Load existing data
-        existing_df = pd.read_csv(save_path)
-        
-        # Check for duplicates based on key features (to avoid adding the same example data multiple times)
-        # We'll consider records with the same monthly_income, family_members, and housing status as duplicates
-        is_duplicate = False
-        for _, row in family_df.iterrows():
-            duplicate_mask = (
-                (existing_df['monthly_income'] == row['monthly_income']) & 
-                (existing_df['family_members'] == row['family_members']) & 
-                (existing_df['has_stable_housing'] == row['has_stable_housing']) &
-                (existing_df['deserves_help'] == row['deserves_help'])
-            )
-            if duplicate_mask.any():
-                print(f"Skipping duplicate record with monthly_income={row['monthly_income']}, family_members={row['family_members']}")
-                is_duplicate = True
-                break
-        
-        if is_duplicate:
-            return False
-        
-        # Ensure columns match by adding missing columns with NaN values
-        for col in existing_df.columns:
-            if col not in family_df.columns:
-                family_df[col] = np.nan
-        
-        for col in family_df.columns:
-            if col not in existing_df.columns:
-                existing_df[col] = np.nan
-        
-        # Combine and save
-        combined_df = pd.concat([existing_df, family_df], ignore_index=True)
-        combined_df.to_csv(save_path, index=False)
-        print(f"Added new verified data to {save_path}")
-    else:
-        # Create new file
-        family_df.to_csv(save_path, index=False)
-        print(f"Created new verified data file at {save_path}")
+    # Append to the store; duplicates (same income, family size, housing and label)
+    # are detected through the store's index rather than by re-reading every record
+    if not append_verified_records(family_df, save_path):
+        return False
     
+    print(f"Added new verified data to {save_path}")
     return True
 
-def retrain_model_with_new_data(n_dummy_samples=5000):
+def retrain_model_with_new_data(n_dummy_samples=5000, progress_callback=None, incremental=False, seed=None):
     """
     Retrain the model incorporating all saved real data and asnaf recipients data.
+    With incremental=True, only verified records saved since the last build are
+    added, by growing extra trees (see update_family_classifier_incrementally).
     Returns True if retraining was successful.
     """
     try:
-        print("Retraining model with all available data...")
-        model, features = train_family_classifier(
-            n_dummy_samples=n_dummy_samples, 
-            load_saved_data=True,
-            load_asnaf_data=True
-        )
+        if incremental:
+            print("Updating model with newly verified data...")
+            model, features = update_family_classifier_incrementally(
+                n_dummy_samples=n_dummy_samples,
+                progress_callback=progress_callback,
+                seed=seed
+            )
+        else:
+            print("Retraining model with all available data...")
+            model, features = train_family_classifier(
+                n_dummy_samples=n_dummy_samples, 
+                load_saved_data=True,
+                load_asnaf_data=True,
+                progress_callback=progress_callback,
+                seed=seed
+            )
         print("Model successfully retrained with new data!")
         return True
     except Exception as e:
@@ -0,0 +1,178 @@
+"""
+Compiled Random Forest Inference Engine
+
+Flattens a trained scikit-learn RandomForestClassifier into a few compact NumPy
+node arrays (feature, threshold, children, leaf class probabilities) and scores
+a whole batch across all trees at once with vectorized traversal. This avoids
+sklearn's per-tree Python dispatch and joblib thread start-up, which dominate
+the cost of small (single-record) predictions.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Maximum absolute difference from model.predict_proba accepted as "identical"
+PARITY_TOLERANCE = 1e-9
+
+# sklearn marks leaves with this child index
+TREE_LEAF = -1
+
+
+class CompiledForest:
+    """A random forest flattened into contiguous node arrays."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, model_digest=None):
+        self.feature = feature        # int32 [n_nodes] feature tested at each node
+        self.threshold = threshold    # float64 [n_nodes] go left if x <= threshold
+        self.left = left              # int32 [n_nodes] global index of left child (leaves point to themselves)
+        self.right = right            # int32 [n_nodes] global index of right child (leaves point to themselves)
+        self.value = value            # float64 [n_nodes, n_classes] class probabilities at each node
+        self.roots = roots            # int32 [n_trees] global index of each tree's root
+        self.max_depth = int(max_depth)
+        self.classes = classes
+        self.model_digest = model_digest
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def predict_proba(self, X, chunk_size=4096):
+        """Average class probabilities over all trees, like RandomForestClassifier.predict_proba."""
+        # sklearn compares float32 inputs against float64 thresholds; do exactly the same
+        X = np.asarray(X, dtype=np.float32)
+        n_rows = len(X)
+        proba = np.empty((n_rows, self.value.shape[1]), dtype=np.float64)
+
+        for start in range(0, n_rows, chunk_size):
+            X_chunk = X[start:start + chunk_size]
+            rows = np.arange(len(X_chunk))[:, None]
+            # One cursor per (row, tree); leaves loop back to themselves, so every
+            # cursor is on its leaf after max_depth steps without any masking
+            node = np.repeat(self.roots[None, :], len(X_chunk), axis=0)
+            for _ in range(self.max_depth):
+                go_left = X_chunk[rows, self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            proba[start:start + len(X_chunk)] = self.value[node].sum(axis=1) / self.n_trees
+
+        return proba
+
+    def predict(self, X):
+        """Class labels, as the argmax of predict_proba."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compile_forest(model):
+    """Flatten a fitted RandomForestClassifier into a CompiledForest."""
+    if not hasattr(model, 'estimators_'):
+        raise ValueError("Model is not a fitted random forest")
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes, dtype=np.int32) + offset
+        is_leaf = tree.children_left == TREE_LEAF
+
+        # Leaves: a test that always goes left, and a left child that is the leaf itself
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+        # Same per-node normalisation as DecisionTreeClassifier.predict_proba
+        node_value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = node_value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(node_value / normalizer)
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=max_depth,
+        classes=np.asarray(model.classes_)
+    )
+
+
+def probe_matrix(forest, n_features, n_rows=256, seed=0):
+    """
+    Build inputs that sit exactly on, just below and just above the forest's split
+    thresholds, which is where a compiled forest would disagree with sklearn.
+    """
+    rng = np.random.default_rng(seed)
+    is_split = forest.left != np.arange(len(forest.left))
+    X = np.zeros((n_rows, n_features), dtype=np.float64)
+    for f in range(n_features):
+        split_thresholds = forest.threshold[is_split & (forest.feature == f)]
+        if split_thresholds.size == 0:
+            continue
+        candidates = np.concatenate([
+            split_thresholds,
+            np.nextafter(split_thresholds.astype(np.float32), np.float32(-np.inf)).astype(np.float64),
+            np.nextafter(split_thresholds.astype(np.float32), np.float32(np.inf)).astype(np.float64)
+        ])
+        X[:, f] = rng.choice(candidates, size=n_rows)
+    return X
+
+
+def check_parity(model, forest, X):
+    """Return the maximum absolute difference between forest and model probabilities on X."""
+    if not isinstance(X, pd.DataFrame) and hasattr(model, 'feature_names_in_'):
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    if len(X) == 0:
+        return 0.0
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    return float(np.max(np.abs(expected - actual)))
+
+
+def compiled_forest_path(model_path):
+    """Where the compiled export of a model artifact lives."""
+    return os.path.splitext(model_path)[0] + '_forest.npz'
+
+
+def save_compiled_forest(forest, path):
+    """Write the node arrays to an .npz file (atomically, via a temp file + rename)."""
+    # Imported here: model_registry imports this module
+    from model_registry import publish_file
+    publish_file(path, lambda f: np.savez(
+        f,
+        feature=forest.feature,
+        threshold=forest.threshold,
+        left=forest.left,
+        right=forest.right,
+        value=forest.value,
+        roots=forest.roots,
+        max_depth=np.array(forest.max_depth),
+        classes=forest.classes,
+        model_digest=np.array(forest.model_digest or '')
+    ))
+
+
+def load_compiled_forest(path):
+    """Load a CompiledForest written by save_compiled_forest."""
+    with np.load(path, allow_pickle=False) as data:
+        return CompiledForest(
+            feature=data['feature'],
+            threshold=data['threshold'],
+            left=data['left'],
+            right=data['right'],
+            value=data['value'],
+            roots=data['roots'],
+            max_depth=int(data['max_depth']),
+            classes=data['classes'],
+            model_digest=str(data['model_digest']) or None
+        )
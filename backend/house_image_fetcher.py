@@ -0,0 +1,165 @@
+"""
+Image Fetching for the Housing API
+
+Downloads house images (mostly Firebase Storage URLs) for /analyze-house-url.
+All fetches go through one pooled requests.Session, so repeat requests to the
+same host reuse a kept-alive TLS connection instead of handshaking each time.
+Every fetch is bounded: connect and read timeouts, an overall deadline, and a
+maximum body size that is enforced while streaming (a huge or endless response
+is cut off without being read into memory), a cap on redirects, and responses
+that are not images (e.g. an HTML error page) are rejected. fetch_many()
+downloads several URLs concurrently for multi-image requests.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults, overridable through the environment
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get('HOUSE_FETCH_CONNECT_TIMEOUT', '3.05'))
+DEFAULT_READ_TIMEOUT = float(os.environ.get('HOUSE_FETCH_READ_TIMEOUT', '10'))
+DEFAULT_TOTAL_TIMEOUT = float(os.environ.get('HOUSE_FETCH_TOTAL_TIMEOUT', '30'))
+DEFAULT_MAX_BYTES = int(os.environ.get('HOUSE_FETCH_MAX_BYTES', str(10 * 1024 * 1024)))
+DEFAULT_POOL_SIZE = int(os.environ.get('HOUSE_FETCH_POOL_SIZE', '16'))
+DEFAULT_MAX_WORKERS = int(os.environ.get('HOUSE_FETCH_MAX_WORKERS', '8'))
+DEFAULT_MAX_REDIRECTS = int(os.environ.get('HOUSE_FETCH_MAX_REDIRECTS', '5'))
+
+# Content types accepted besides image/*: storage servers that don't know the type
+GENERIC_CONTENT_TYPES = ('application/octet-stream', 'binary/octet-stream')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ImageFetchError(Exception):
+    """An image URL could not be downloaded."""
+
+    def __init__(self, message, url=None):
+        super().__init__(message)
+        self.url = url
+
+
+class ImageRejectedError(ImageFetchError):
+    """
+    The URL, or the response it returned, is not an acceptable image (an unsupported
+    URL, a non-image content type, too large): a problem with the request rather
+    than a failure of the upstream server.
+    """
+
+
+class ImageTooLargeError(ImageRejectedError):
+    """The image at a URL is larger than the fetcher's max_bytes."""
+
+
+class FetchedImage:
+    """The body of a downloaded image plus the response headers callers care about."""
+
+    def __init__(self, url, content, content_type=None, etag=None, not_modified=False):
+        self.url = url
+        self.content = content  # None when not_modified
+        self.content_type = content_type
+        self.etag = etag
+        self.not_modified = not_modified  # the server answered 304 to an If-None-Match request
+
+
+class ImageFetcher:
+    """Bounded image downloads over a shared keep-alive connection pool."""
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 total_timeout=DEFAULT_TOTAL_TIMEOUT, max_bytes=DEFAULT_MAX_BYTES,
+                 pool_size=DEFAULT_POOL_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                 max_redirects=DEFAULT_MAX_REDIRECTS):
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.max_workers = max(1, int(max_workers))
+        self.max_redirects = max_redirects
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+        self._pid = None
+
+    def _ensure_resources(self):
+        """Create the session and thread pool on first use, and again in a forked child process."""
+        if self._session is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                return
+            # Pooled sockets and threads inherited over fork can't be shared with the parent
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.max_redirects = self.max_redirects
+            self._session = session
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='house-image-fetch')
+            self._pid = os.getpid()
+
+    def fetch(self, url, if_none_match=None):
+        """
+        Download one image. Raises ImageRejectedError (or its ImageTooLargeError) if the
+        URL or its response is not an acceptable image, ImageFetchError if the download fails.
+        With if_none_match (an ETag), a 304 Not Modified reply returns a FetchedImage
+        with not_modified set and no content.
+        """
+        if not isinstance(url, str) or urlparse(url).scheme not in ('http', 'https'):
+            raise ImageRejectedError(f"Unsupported image URL: {url!r}", url)
+        self._ensure_resources()
+
+        deadline = time.monotonic() + self.total_timeout
+        try:
+            headers = {'If-None-Match': if_none_match} if if_none_match else None
+            with self._session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                if response.status_code == 304 and if_none_match:
+                    return FetchedImage(url, None, etag=response.headers.get('ETag', if_none_match), not_modified=True)
+                response.raise_for_status()
+
+                content_type = response.headers.get('Content-Type')
+                media_type = (content_type or '').split(';')[0].strip().lower()
+                if media_type and not media_type.startswith('image/') and media_type not in GENERIC_CONTENT_TYPES:
+                    raise ImageRejectedError(f"URL did not return an image (content type {media_type})", url)
+
+                content_length = response.headers.get('Content-Length')
+                if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+                    raise ImageTooLargeError(
+                        f"Image is {content_length} bytes, the limit is {self.max_bytes}", url
+                    )
+
+                body = bytearray()
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    body.extend(chunk)
+                    if len(body) > self.max_bytes:
+                        raise ImageTooLargeError(f"Image exceeds the {self.max_bytes} byte limit", url)
+                    # The read timeout is per socket read; a slow trickle needs an overall bound too
+                    if time.monotonic() > deadline:
+                        raise ImageFetchError(f"Image download took longer than {self.total_timeout}s", url)
+
+                return FetchedImage(
+                    url,
+                    bytes(body),
+                    content_type=content_type,
+                    etag=response.headers.get('ETag')
+                )
+        except requests.exceptions.RequestException as e:
+            raise ImageFetchError(f"Failed to fetch image from URL: {str(e)}", url) from e
+
+    def fetch_many(self, urls):
+        """
+        Download several images concurrently. Returns one entry per URL, in order:
+        a FetchedImage, or the ImageFetchError raised for that URL.
+        """
+        self._ensure_resources()
+
+        def fetch_or_error(url):
+            try:
+                return self.fetch(url)
+            except ImageFetchError as e:
+                return e
+
+        return list(self._executor.map(fetch_or_error, urls))
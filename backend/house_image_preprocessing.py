@@ -0,0 +1,48 @@
+"""
+Image Preprocessing for the Housing API
+
+Turns uploaded image bytes into the model's input: RGB, 224x224, uint8. Most
+uploads are multi-megapixel phone JPEGs, so:
+- JPEGs are decoded with PIL's draft mode, which lets libjpeg scale down during
+  the DCT (by 1/2, 1/4 or 1/8) instead of decoding every pixel and resizing after,
+- every image is converted to RGB once, so PNGs with alpha, palette images and
+  grayscale photos all reach the model with three channels,
+- pixels are written straight into a preallocated uint8 batch buffer. Scaling
+  to [0, 1] happens inside the serving model (see house_model_serving.py), so no
+  float copies of the image are made here.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = 224
+
+
+def decode_image(image_bytes, size=IMG_SIZE):
+    """Decode image bytes into a size x size RGB PIL image."""
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEG only (a no-op for other formats): decode at the smallest DCT scale that is still >= size
+    image.draft('RGB', (size, size))
+    image = image.convert('RGB')
+    if image.size != (size, size):
+        image = image.resize((size, size))
+    return image
+
+
+def new_batch(n_images, size=IMG_SIZE):
+    """An uninitialised uint8 batch buffer for n_images images."""
+    return np.empty((n_images, size, size, 3), dtype=np.uint8)
+
+
+def decode_into(batch, index, image_bytes):
+    """Decode image_bytes into row index of a batch buffer from new_batch()."""
+    batch[index] = np.asarray(decode_image(image_bytes, size=batch.shape[1]))
+
+
+def preprocess_image(image_bytes, size=IMG_SIZE):
+    """A single image as a (1, size, size, 3) uint8 batch."""
+    batch = new_batch(1, size)
+    decode_into(batch, 0, image_bytes)
+    return batch
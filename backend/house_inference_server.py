@@ -0,0 +1,140 @@
+"""
+Shared Inference Process for the Housing API
+
+TensorFlow can't be loaded before gunicorn forks its workers (its runtime is not
+fork-safe), and loading it in every worker means one copy of the runtime and
+the weights per worker. Instead, serve_housing_api.py starts this process once,
+next to gunicorn: it loads and warms up the model, with TensorFlow's thread
+pools sized to the whole machine, and answers prediction requests from every
+worker over a local Unix socket. The workers never import TensorFlow; their
+serving model is a RemoteServingModel that sends uint8 image batches here and
+gets (probabilities, embeddings) back. Batches from all workers go through one
+MicroBatcher, so they are also coalesced across workers.
+
+The socket path and its auth key are passed to both sides through
+HOUSE_INFERENCE_SOCKET / HOUSE_INFERENCE_AUTHKEY (hex).
+"""
+
+import os
+import time
+import threading
+from multiprocessing.connection import Client, Listener
+
+# Seconds a worker waits at startup for the inference process to load the model
+CONNECT_TIMEOUT = float(os.environ.get('HOUSE_INFERENCE_CONNECT_TIMEOUT', '600'))
+# Seconds a worker thread waits to open its own connection once the process is up
+RECONNECT_TIMEOUT = 10.0
+
+
+def _authkey():
+    return bytes.fromhex(os.environ.get('HOUSE_INFERENCE_AUTHKEY', ''))
+
+
+def _serve_connection(conn, predict, info):
+    """Answer one worker connection: each message is a uint8 batch, each reply ('ok', outputs) or ('error', message)."""
+    with conn:
+        try:
+            conn.send(info)
+            while True:
+                images = conn.recv()
+                try:
+                    reply = ('ok', predict(images))
+                except Exception as e:
+                    reply = ('error', str(e))
+                conn.send(reply)
+        except (EOFError, OSError):
+            return  # The worker went away
+
+
+def serve_predictions(address, predict, info, authkey=None, ready=None):
+    """
+    Accept worker connections on the Unix socket at address until the process is
+    killed, answering each with predict(images) -> (probabilities, embeddings).
+    info (the serving backend and model version) is sent to each new connection.
+    ready, if given, is set once the socket accepts connections.
+    """
+    if os.path.exists(address):
+        os.remove(address)
+    with Listener(address, family='AF_UNIX', authkey=authkey if authkey is not None else _authkey()) as listener:
+        if ready is not None:
+            ready.set()
+        while True:
+            try:
+                conn = listener.accept()
+            except (EOFError, OSError) as e:
+                print(f"Warning: rejected an inference connection ({str(e)})")
+                continue
+            threading.Thread(
+                target=_serve_connection, args=(conn, predict, info), name='house-inference-connection', daemon=True
+            ).start()
+
+
+def run_inference_server():
+    """Process entry point (started by serve_housing_api.py): load the model, then serve it to the workers."""
+    address = os.environ['HOUSE_INFERENCE_SOCKET']
+    # This process is the one that loads the model, so it must not connect to itself
+    del os.environ['HOUSE_INFERENCE_SOCKET']
+    import asnaf_housing_api
+
+    asnaf_housing_api.warm_up_model()
+    if not asnaf_housing_api.model_ready.is_set():
+        raise SystemExit(f"Inference process could not load the model: {asnaf_housing_api.startup_state['error']}")
+    info = {
+        'backend': asnaf_housing_api.serving_model.backend,
+        'model_version': asnaf_housing_api.current_model_version(),
+        'embeddings': asnaf_housing_api.serving_model.predict_with_embeddings is not None
+    }
+    print(f"Inference process serving the {info['backend']} model on {address} (pid {os.getpid()})")
+    serve_predictions(address, asnaf_housing_api.batcher.predict, info)
+
+
+class RemoteServingModel:
+    """
+    A worker's serving model in shared mode: same interface as
+    house_model_serving.ServingModel, backed by the inference process.
+    """
+
+    def __init__(self, address, authkey=None, connect_timeout=CONNECT_TIMEOUT):
+        self.address = address
+        self.authkey = authkey if authkey is not None else _authkey()
+        self._local = threading.local()
+        # The first connection waits for the inference process to finish loading the model
+        info = self._connection(connect_timeout)[1]
+        self.backend = f"shared-{info['backend']}"
+        self.model_version = info['model_version']
+        self.model = None
+        self.predict_with_embeddings = self._predict if info['embeddings'] else None
+
+    def _connection(self, timeout):
+        """This thread's (connection, info); connections can't be shared between threads."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn, self._local.info
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                info = conn.recv()
+                break
+            except (FileNotFoundError, ConnectionRefusedError, EOFError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Inference process at {self.address} is not available")
+                time.sleep(0.2)
+        self._local.conn, self._local.info = conn, info
+        return conn, info
+
+    def _predict(self, images):
+        conn = self._connection(RECONNECT_TIMEOUT)[0]
+        try:
+            conn.send(images)
+            status, value = conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            conn.close()
+            raise RuntimeError("Lost the connection to the inference process")
+        if status != 'ok':
+            raise RuntimeError(f"Inference process error: {value}")
+        return value
+
+    def predict_batch(self, images):
+        return self._predict(images)[0]
@@ -0,0 +1,217 @@
+"""
+Serving Function for the Rural House Classifier
+
+Keras' model.predict sets up a data adapter, callbacks and a progress loop on
+every call, which costs far more than the convolutions for a handful of images.
+This module exports rural_classifier.h5 once to a SavedModel whose serving
+function is traced with a fixed input signature (any batch of 224x224 RGB
+uint8 images, scaled to [0, 1] inside the graph), and serves predictions by
+calling that concrete function directly. The export is redone automatically when the .h5 file changes, and
+the plain Keras model is used as a fallback if exporting or loading fails.
+With HOUSE_MODEL_VARIANT=int8 the INT8-quantized TFLite model produced by the
+training script is served instead.
+
+Run this file to export ahead of time (e.g. at build time):
+    python house_model_serving.py [path/to/rural_classifier.h5]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+from model_registry import file_digest
+
+IMG_SIZE = 224
+
+# Set HOUSE_SERVING_BACKEND=keras to serve through the .h5 model directly
+SERVING_BACKEND = os.environ.get('HOUSE_SERVING_BACKEND', 'savedmodel')
+
+# Set HOUSE_MODEL_VARIANT=int8 to serve the quantized TFLite model built by
+# rural_house_classifier_fixed.py (rural_classifier_int8.tflite)
+MODEL_VARIANT = os.environ.get('HOUSE_MODEL_VARIANT', 'float')
+
+# Threads used by the TFLite interpreter (defaults to TensorFlow's choice)
+TFLITE_NUM_THREADS = int(os.environ['HOUSE_TFLITE_THREADS']) if os.environ.get('HOUSE_TFLITE_THREADS') else None
+
+# TensorFlow thread pools per process (defaults to TensorFlow's choice: all cores)
+TF_INTRA_OP_THREADS = int(os.environ['HOUSE_TF_INTRA_OP_THREADS']) if os.environ.get('HOUSE_TF_INTRA_OP_THREADS') else None
+TF_INTER_OP_THREADS = int(os.environ['HOUSE_TF_INTER_OP_THREADS']) if os.environ.get('HOUSE_TF_INTER_OP_THREADS') else None
+
+# Written into the export directory; identifies the .h5 file it was exported from
+SOURCE_DIGEST_FILE = 'source_sha256.txt'
+
+# Bump when the serving function changes, to force a re-export
+SERVING_SIGNATURE_VERSION = 3
+
+
+class ServingModel:
+    """A batch prediction function plus a note of how it is implemented."""
+
+    def __init__(self, predict_batch, backend, model=None, predict_with_embeddings=None):
+        self.predict_batch = predict_batch  # uint8 (N, 224, 224, 3) -> (N, n_classes) numpy array
+        self.backend = backend
+        self.model = model  # the underlying loaded model; also keeps its variables alive
+        # uint8 images -> (probabilities, penultimate-layer embeddings); None if the backend can't provide them
+        self.predict_with_embeddings = predict_with_embeddings
+
+
+def configure_tf_threads(intra_op_threads=TF_INTRA_OP_THREADS, inter_op_threads=TF_INTER_OP_THREADS):
+    """
+    Size TensorFlow's thread pools. Only takes effect before TensorFlow runs its
+    first op, so call it before loading the model.
+    """
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"Warning: TensorFlow thread settings not applied ({str(e)})")
+
+
+def saved_model_dir(model_path):
+    """Where the SavedModel export of a .h5 model lives."""
+    return os.path.splitext(model_path)[0] + '_savedmodel'
+
+
+def _export_stamp(model_path):
+    return f"{file_digest(model_path)} v{SERVING_SIGNATURE_VERSION}"
+
+
+def _export_is_current(model_path, export_dir):
+    digest_path = os.path.join(export_dir, SOURCE_DIGEST_FILE)
+    if not os.path.exists(digest_path):
+        return False
+    with open(digest_path, 'r') as f:
+        return f.read().strip() == _export_stamp(model_path)
+
+
+def _scale_images(images):
+    """uint8 pixels -> the float32 [0, 1] input the model was trained on."""
+    return np.asarray(images, dtype=np.float32) * np.float32(1.0 / 255.0)
+
+
+def _with_embeddings(keras_model):
+    """The same model, also returning the output of its penultimate layer."""
+    return tf.keras.Model(keras_model.inputs, [keras_model.output, keras_model.layers[-2].output])
+
+
+def export_saved_model(keras_model, model_path, export_dir=None):
+    """Export keras_model as a SavedModel with a fixed-signature serving function."""
+    export_dir = export_dir or saved_model_dir(model_path)
+    outputs_model = _with_embeddings(keras_model)
+
+    @tf.function(input_signature=[tf.TensorSpec([None, IMG_SIZE, IMG_SIZE, 3], tf.uint8, name='images')])
+    def serve(images):
+        # Normalization is part of the graph, so callers pass raw pixels
+        scaled = tf.cast(images, tf.float32) * (1.0 / 255.0)
+        probabilities, embeddings = outputs_model(scaled, training=False)
+        return {'probabilities': probabilities, 'embeddings': embeddings}
+
+    # Build next to the target, then swap it in, so a reader never sees a partial export
+    parent_dir = os.path.dirname(os.path.abspath(export_dir))
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp_savedmodel_', dir=parent_dir)
+    try:
+        tf.saved_model.save(keras_model, tmp_dir, signatures={'serving_default': serve})
+        with open(os.path.join(tmp_dir, SOURCE_DIGEST_FILE), 'w') as f:
+            f.write(_export_stamp(model_path))
+        if os.path.exists(export_dir):
+            shutil.rmtree(export_dir)
+        os.rename(tmp_dir, export_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    print(f"Exported serving SavedModel to {export_dir}")
+    return export_dir
+
+
+def quantized_model_path(model_path):
+    """Where the INT8 TFLite variant of a .h5 model lives."""
+    return os.path.splitext(model_path)[0] + '_int8.tflite'
+
+
+def _tflite_serving_model(tflite_path, num_threads=TFLITE_NUM_THREADS):
+    """Serve a TFLite model; the interpreter is resized to each batch size it sees."""
+    interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+    input_details = interpreter.get_input_details()[0]
+    output_index = interpreter.get_output_details()[0]['index']
+    state = {'batch_size': None}
+    # An interpreter must not be used from two threads at once
+    lock = threading.Lock()
+
+    def predict_batch(images):
+        images = _scale_images(images)
+        with lock:
+            if state['batch_size'] != len(images):
+                interpreter.resize_tensor_input(input_details['index'], images.shape)
+                interpreter.allocate_tensors()
+                state['batch_size'] = len(images)
+            interpreter.set_tensor(input_details['index'], images)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index).copy()
+
+    return ServingModel(predict_batch, 'tflite-int8', interpreter)
+
+
+def _keras_serving_model(keras_model):
+    outputs_model = _with_embeddings(keras_model)
+
+    def predict_with_embeddings(images):
+        probabilities, embeddings = outputs_model.predict(_scale_images(images), verbose=0)
+        return probabilities, embeddings
+
+    return ServingModel(
+        lambda images: keras_model.predict(_scale_images(images), verbose=0), 'keras-h5', keras_model,
+        predict_with_embeddings=predict_with_embeddings
+    )
+
+
+def load_serving_model(model_path, backend=SERVING_BACKEND, variant=MODEL_VARIANT):
+    """
+    Load the classifier for serving: the INT8 TFLite model if variant is 'int8',
+    otherwise the traced SavedModel function (exported from model_path first if
+    needed), or the Keras .h5 model if that is requested or fails.
+    """
+    if variant == 'int8':
+        tflite_path = quantized_model_path(model_path)
+        if os.path.exists(tflite_path):
+            return _tflite_serving_model(tflite_path)
+        print(f"Warning: quantized model not found at {tflite_path}, serving the float model")
+
+    if backend == 'keras':
+        return _keras_serving_model(load_model(model_path))
+
+    keras_model = None
+    export_dir = saved_model_dir(model_path)
+    try:
+        if not _export_is_current(model_path, export_dir):
+            keras_model = load_model(model_path)
+            export_saved_model(keras_model, model_path, export_dir)
+
+        loaded = tf.saved_model.load(export_dir)
+        serve = loaded.signatures['serving_default']
+
+        def predict_batch(images):
+            return serve(images=tf.convert_to_tensor(images, dtype=tf.uint8))['probabilities'].numpy()
+
+        def predict_with_embeddings(images):
+            outputs = serve(images=tf.convert_to_tensor(images, dtype=tf.uint8))
+            return outputs['probabilities'].numpy(), outputs['embeddings'].numpy()
+
+        return ServingModel(predict_batch, 'savedmodel', loaded, predict_with_embeddings=predict_with_embeddings)
+    except Exception as e:
+        print(f"Warning: SavedModel serving unavailable ({str(e)}), falling back to the .h5 model")
+        return _keras_serving_model(keras_model or load_model(model_path))
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'rural_classifier.h5'
+    )
+    export_saved_model(load_model(path), path)
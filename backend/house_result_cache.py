@@ -0,0 +1,172 @@
+"""
+Result Cache for House Image Classification
+
+Officers often re-submit the same photo, and the frontend re-posts the same
+image URL whenever an assessment page is reopened. This cache keeps
+classification results so those repeats skip downloading, decoding and running
+the model:
+- uploaded images are keyed by the SHA-256 of their bytes,
+- image URLs are keyed by URL + ETag, so a conditional request that comes back
+  304 Not Modified is answered without downloading the image again.
+
+Entries live in an in-memory LRU and, optionally, in a directory of JSON files
+that survives restarts and is shared by worker processes. Every entry belongs
+to a model version (supplied by the caller: the stat signature of the model files
+the server loaded); when the version changes, both tiers are dropped automatically.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Defaults, overridable through the environment
+DEFAULT_MAX_ENTRIES = int(os.environ.get('HOUSE_CACHE_MAX_ENTRIES', '1024'))
+# Set HOUSE_CACHE_DIR to enable the on-disk tier
+DEFAULT_CACHE_DIR = os.environ.get('HOUSE_CACHE_DIR') or None
+
+
+def model_version(*paths):
+    """Version tag for the model files at paths: changes whenever any of them is rewritten."""
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{st.st_mtime_ns}-{st.st_size}")
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def image_key(image_bytes):
+    """Cache key for an uploaded image."""
+    return 'sha256:' + hashlib.sha256(image_bytes).hexdigest()
+
+
+def url_key(url, etag):
+    """Cache key for the image at url, as identified by its ETag."""
+    return 'url:' + hashlib.sha256(f"{url}\n{etag}".encode('utf-8')).hexdigest()
+
+
+def _etag_key(url):
+    return 'etag:' + hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of JSON-serializable results, tied to the current model version."""
+
+    def __init__(self, version_fn, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR):
+        """version_fn() returns the current model version tag; it is called on every lookup."""
+        self.version_fn = version_fn
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self):
+        """Drop everything cached for an older model; returns the current version."""
+        try:
+            version = self.version_fn()
+        except OSError:
+            version = None
+        with self._lock:
+            changed = version != self._version
+            if changed:
+                self._entries.clear()
+                self._version = version
+        if changed and version is not None and self.cache_dir:
+            self._prune_disk(version)
+        return version
+
+    def _disk_path(self, version, key):
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, version, name + '.json')
+
+    def _prune_disk(self, version):
+        """Remove on-disk entries written for other model versions."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name != version and not name.startswith('.tmp_'):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def get(self, key):
+        """The cached result for key, or None."""
+        version = self._check_version()
+        if version is None:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(version, key), 'r') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Cache a JSON-serializable value under key for the current model version."""
+        version = self._check_version()
+        if version is None:
+            return
+        self._remember(key, value)
+
+        if self.cache_dir:
+            path = self._disk_path(version, key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path))
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Warning: could not write result cache entry ({str(e)})")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_url_etag(self, url):
+        """ETag of the last cached response for url, if any."""
+        return self.get(_etag_key(url))
+
+    def get_url_result(self, url, etag):
+        """The cached result for url's content with ETag etag, or None."""
+        return self.get(url_key(url, etag)) if etag else None
+
+    def put_url_result(self, url, etag, value):
+        """Cache the result for url's current content (ETag etag)."""
+        if not etag:
+            return
+        self.put(url_key(url, etag), value)
+        self.put(_etag_key(url), etag)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'model_version': self._version,
+                'disk_tier': bool(self.cache_dir)
+            }
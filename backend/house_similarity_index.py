@@ -0,0 +1,302 @@
+"""
+Similar-House Index
+
+Approximate nearest-neighbour search over house image embeddings (the output of
+the classifier's penultimate layer), used to spot the same photo or the same
+house submitted under several applications and to show the most similar
+labelled training images as evidence.
+
+The index is an inverted file (IVF) in plain NumPy:
+- embeddings are L2-normalised, so the dot product is the cosine similarity,
+- a spherical k-means splits the space into n_lists cells; each vector is
+  stored in the list of its nearest centroid,
+- a query scans only the nprobe cells whose centroids are closest to it,
+  so search cost grows with n / n_lists * nprobe instead of n.
+Vectors can be added at any time. Small indexes (before there is enough data
+to train the centroids) are searched exhaustively, and the centroids are
+retrained as the index grows. Training runs on a background thread over a
+snapshot of the vectors and is swapped in when done, so adds and searches never
+wait for k-means. The index is saved as an .npz file plus JSON metadata, written
+atomically from a snapshot taken under the lock.
+"""
+
+import os
+import json
+import threading
+from array import array
+
+import numpy as np
+
+from model_registry import publish_file, publish_json
+
+# Vectors needed before the IVF centroids are trained; smaller indexes are searched exhaustively
+MIN_TRAIN_SIZE = 2048
+# Centroids are retrained when the index has grown this much since they were trained
+RETRAIN_GROWTH = 4
+# Cells probed per query
+DEFAULT_NPROBE = int(os.environ.get('HOUSE_SIMILARITY_NPROBE', '8'))
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_SAMPLE = 50000
+CHUNK_SIZE = 65536
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _nearest_centroids(vectors, centroids):
+    """Index of the most similar centroid for each vector (chunked to bound memory)."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        assignments[start:stop] = np.argmax(vectors[start:stop] @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster unit vectors by cosine similarity; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_MAX_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_MAX_SAMPLE, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Empty clusters are reseeded from random vectors
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class SimilarityIndex:
+    """IVF cosine-similarity index with string ids and per-vector metadata."""
+
+    def __init__(self, dim=None, nprobe=DEFAULT_NPROBE):
+        self.dim = dim
+        self.nprobe = nprobe
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self.ids = []
+        self.metadata = []
+        self._id_rows = {}
+        self.centroids = None
+        self._trained_size = 0
+        self._lists = []  # per centroid: array('q') of row numbers
+        self.info = {}  # free-form index-level metadata (e.g. the model version)
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._training_thread = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item_id):
+        return item_id in self._id_rows
+
+    def _reserve(self, n_new):
+        """Grow the vector buffer geometrically so inserts are amortised O(1)."""
+        needed = self._size + n_new
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+
+    def _needs_training(self):
+        """Call with the lock held."""
+        if self._training_thread is not None:
+            return False
+        if self.centroids is None:
+            return self._size >= MIN_TRAIN_SIZE
+        return self._size >= RETRAIN_GROWTH * self._trained_size
+
+    def _start_training(self):
+        """Start (re)building the centroids on a background thread. Call with the lock held."""
+        self._training_thread = threading.Thread(target=self._train, name='similarity-index-train', daemon=True)
+        self._training_thread.start()
+
+    def _train(self):
+        """(Re)build the centroids and inverted lists from a snapshot of the stored vectors, then swap them in."""
+        trained = False
+        try:
+            with self._lock:
+                trained_size = self._size
+                # Rows below _size are never rewritten (growth copies to a new buffer), so a view is a stable snapshot
+                vectors = self._vectors[:trained_size]
+            n_lists = int(np.clip(np.sqrt(trained_size), 16, 4096))
+            centroids = spherical_kmeans(vectors, n_lists)
+            lists = [array('q') for _ in range(n_lists)]
+            for row, list_id in enumerate(_nearest_centroids(vectors, centroids).tolist()):
+                lists[list_id].append(row)
+
+            with self._lock:
+                # Vectors added while training ran are assigned to the new centroids
+                new_rows = np.arange(trained_size, self._size)
+                if len(new_rows):
+                    for row, list_id in zip(new_rows.tolist(), _nearest_centroids(self._vectors[new_rows], centroids).tolist()):
+                        lists[list_id].append(row)
+                self.centroids = centroids
+                self._lists = lists
+                self._trained_size = trained_size
+            trained = True
+        except Exception as e:
+            print(f"Warning: similarity index training failed ({str(e)})")
+        finally:
+            with self._lock:
+                self._training_thread = None
+                # The index may have grown past the next threshold while this ran
+                if trained and self._needs_training():
+                    self._start_training()
+
+    def wait_for_training(self, timeout=None):
+        """Block until any background training has finished (e.g. before saving a freshly built index)."""
+        while True:
+            with self._lock:
+                thread = self._training_thread
+            if thread is None:
+                return
+            thread.join(timeout)
+            if timeout is not None:
+                return
+
+    def add(self, vectors, ids, metadata=None):
+        """
+        Add vectors with their ids (and optional metadata dicts). Ids already in the
+        index are skipped. Returns the number of vectors added.
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            # Skip ids already stored, and repeats within this batch
+            keep = []
+            seen = set()
+            for i, item_id in enumerate(ids):
+                if item_id in self._id_rows or item_id in seen:
+                    continue
+                seen.add(item_id)
+                keep.append(i)
+            if not keep:
+                return 0
+
+            self._reserve(len(keep))
+            first_row = self._size
+            self._vectors[first_row:first_row + len(keep)] = vectors[keep]
+            for offset, i in enumerate(keep):
+                self.ids.append(ids[i])
+                self.metadata.append(metadata[i])
+                self._id_rows[ids[i]] = first_row + offset
+            self._size += len(keep)
+
+            if self.centroids is not None:
+                new_rows = np.arange(first_row, self._size)
+                for row, list_id in zip(new_rows.tolist(), _nearest_centroids(self._vectors[new_rows], self.centroids).tolist()):
+                    self._lists[list_id].append(row)
+            if self._needs_training():
+                self._start_training()
+            return len(keep)
+
+    def _candidate_rows(self, query, nprobe):
+        if self.centroids is None:
+            return None  # exhaustive search
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]
+        lists = [np.frombuffer(self._lists[list_id], dtype=np.int64) for list_id in probes if len(self._lists[list_id])]
+        return np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+
+    def search(self, vector, k=5, nprobe=None, exclude_ids=()):
+        """
+        The k most similar stored vectors to vector, best first, as a list of
+        {'id', 'similarity', 'metadata'} dicts. Ids in exclude_ids are left out.
+        """
+        query = _normalize(np.atleast_2d(vector))[0]
+        with self._lock:
+            if self._size == 0:
+                return []
+            rows = self._candidate_rows(query, nprobe or self.nprobe)
+            if rows is None:
+                scores = self._vectors[:self._size] @ query
+                rows = np.arange(self._size)
+            else:
+                scores = self._vectors[rows] @ query
+
+            wanted = min(len(rows), k + len(exclude_ids))
+            if wanted == 0:
+                return []
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            top = top[np.argsort(-scores[top])]
+
+            matches = []
+            for position in top:
+                row = int(rows[position])
+                if self.ids[row] in exclude_ids:
+                    continue
+                matches.append({
+                    'id': self.ids[row],
+                    'similarity': float(scores[position]),
+                    'metadata': self.metadata[row]
+                })
+                if len(matches) == k:
+                    break
+            return matches
+
+    def save(self, path):
+        """Write the index to path (.npz) and path + '.json' (metadata), each atomically."""
+        # Concurrent saves are serialised so an older snapshot can't land last
+        with self._save_lock:
+            # Snapshot under the lock (views and shallow copies only), write outside it
+            with self._lock:
+                vectors = self._vectors[:self._size]
+                ids = list(self.ids)
+                metadata = list(self.metadata)
+                info = dict(self.info)
+                centroids = self.centroids if self.centroids is not None else np.empty((0, self.dim or 0), np.float32)
+                trained_size = self._trained_size
+
+            publish_json({'info': info, 'metadata': metadata}, path + '.json')
+            publish_file(path, lambda f: np.savez(
+                f,
+                vectors=vectors,
+                ids=np.array(ids, dtype=str),
+                centroids=centroids,
+                trained_size=np.int64(trained_size)
+            ))
+
+    @classmethod
+    def load(cls, path, nprobe=DEFAULT_NPROBE):
+        """Read an index written by save()."""
+        with np.load(path) as data:
+            vectors = data['vectors']
+            ids = data['ids'].tolist()
+            centroids = data['centroids']
+            trained_size = int(data['trained_size'])
+        with open(path + '.json', 'r') as f:
+            meta = json.load(f)
+
+        index = cls(dim=vectors.shape[1] if vectors.size else None, nprobe=nprobe)
+        index.info = meta.get('info', {})
+        if len(ids) != len(meta['metadata']):
+            raise ValueError(f"Index files at {path} are out of sync")
+        if ids:
+            index._vectors = vectors.astype(np.float32, copy=True)
+            index._size = len(ids)
+            index.ids = ids
+            index.metadata = meta['metadata']
+            index._id_rows = {item_id: row for row, item_id in enumerate(ids)}
+            if len(centroids):
+                index.centroids = centroids
+                index._trained_size = trained_size
+                index._lists = [array('q') for _ in range(len(centroids))]
+                for row, list_id in enumerate(_nearest_centroids(index._vectors, centroids).tolist()):
+                    index._lists[list_id].append(row)
+            with index._lock:
+                if index._needs_training():
+                    index._start_training()
+        return index
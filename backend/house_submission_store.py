@@ -0,0 +1,186 @@
+"""
+House Image Submission Store
+
+Append-only record of the house images submitted to the housing API, shared by
+every worker process, so the similar-house index can include submissions made
+through any worker and keep them across restarts and model changes. Backed by
+SQLite in WAL mode, like the verified family data store:
+- each submission keeps its preprocessed pixels (the model's 224x224 uint8
+  input, zlib-compressed), so it can be re-embedded when the model changes,
+- embeddings are stored per model version; a worker serving a new model
+  re-embeds the submissions that have none for its version,
+- workers pull submissions appended by other workers by row id,
+- only the newest HOUSE_SUBMISSION_RETENTION submissions are kept; older ones
+  (and their embeddings) are pruned as new ones are recorded.
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+
+import numpy as np
+
+DEFAULT_STORE_PATH = os.environ.get(
+    'HOUSE_SUBMISSION_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'house_submissions.db')
+)
+# Newest submissions kept in the store (and so in every worker's similarity index)
+DEFAULT_RETENTION = int(os.environ.get('HOUSE_SUBMISSION_RETENTION', '100000'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS house_submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    image_key TEXT UNIQUE NOT NULL,
+    pixels BLOB NOT NULL,
+    pixels_shape TEXT NOT NULL,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS house_submission_embeddings (
+    submission_id INTEGER NOT NULL REFERENCES house_submissions (id),
+    model_version TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    PRIMARY KEY (submission_id, model_version)
+);
+"""
+
+
+def connect(store_path=None):
+    """Open the store (DEFAULT_STORE_PATH unless given), creating the schema on first use."""
+    # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(store_path or DEFAULT_STORE_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _embedding_blob(embedding):
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def append_submissions(keys, pixels, embeddings, metadata, model_version, store_path=None):
+    """
+    Record submitted images: image keys, their preprocessed uint8 pixels, their
+    embeddings under model_version and metadata dicts. Images already recorded
+    (same key) are skipped. Returns the number of new submissions.
+    """
+    conn = connect(store_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for key, image, embedding, item in zip(keys, pixels, embeddings, metadata):
+                image = np.ascontiguousarray(image, dtype=np.uint8)
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO house_submissions (image_key, pixels, pixels_shape, metadata) VALUES (?, ?, ?, ?)",
+                    (key, zlib.compress(image.tobytes(), 1), json.dumps(image.shape), json.dumps(item, default=str))
+                )
+                if cursor.rowcount == 0:
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO house_submission_embeddings (submission_id, model_version, embedding) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, model_version, _embedding_blob(embedding))
+                )
+                added += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return added
+
+
+def prune_submissions(retention=None, store_path=None):
+    """
+    Delete all but the newest retention (default DEFAULT_RETENTION) submissions
+    and their embeddings. Returns the number deleted.
+    """
+    retention = DEFAULT_RETENTION if retention is None else retention
+    conn = connect(store_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Id of the newest submission that falls outside the retention window
+            row = conn.execute(
+                "SELECT id FROM house_submissions ORDER BY id DESC LIMIT 1 OFFSET ?", (retention,)
+            ).fetchone()
+            deleted = 0
+            if row is not None:
+                conn.execute("DELETE FROM house_submission_embeddings WHERE submission_id <= ?", (row[0],))
+                deleted = conn.execute("DELETE FROM house_submissions WHERE id <= ?", (row[0],)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return deleted
+
+
+def max_submission_id(store_path=None):
+    """Id of the newest submission, or 0 if there are none."""
+    conn = connect(store_path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM house_submissions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def load_embeddings(model_version, after_id=0, up_to_id=None, store_path=None):
+    """
+    Submissions with id in (after_id, up_to_id] that have an embedding for
+    model_version, as (keys, float32 embeddings [n, dim], metadata dicts).
+    """
+    conn = connect(store_path)
+    try:
+        rows = conn.execute(
+            "SELECT s.image_key, e.embedding, s.metadata FROM house_submissions s "
+            "JOIN house_submission_embeddings e ON e.submission_id = s.id AND e.model_version = ? "
+            "WHERE s.id > ? AND s.id <= ? ORDER BY s.id",
+            (model_version, after_id, up_to_id if up_to_id is not None else 2 ** 62)
+        ).fetchall()
+    finally:
+        conn.close()
+    keys = [row[0] for row in rows]
+    embeddings = np.array([np.frombuffer(row[1], dtype=np.float32) for row in rows], dtype=np.float32)
+    metadata = [json.loads(row[2]) if row[2] else {} for row in rows]
+    return keys, embeddings, metadata
+
+
+def submissions_without_embedding(model_version, limit=256, store_path=None):
+    """Up to limit submissions with no embedding for model_version, as (ids, uint8 pixel arrays)."""
+    conn = connect(store_path)
+    try:
+        rows = conn.execute(
+            "SELECT s.id, s.pixels, s.pixels_shape FROM house_submissions s "
+            "LEFT JOIN house_submission_embeddings e ON e.submission_id = s.id AND e.model_version = ? "
+            "WHERE e.submission_id IS NULL ORDER BY s.id LIMIT ?",
+            (model_version, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    ids = [row[0] for row in rows]
+    pixels = [
+        np.frombuffer(zlib.decompress(row[1]), dtype=np.uint8).reshape(json.loads(row[2]))
+        for row in rows
+    ]
+    return ids, pixels
+
+
+def save_embeddings(model_version, ids, embeddings, store_path=None):
+    """Store embeddings of existing submissions under model_version (already stored ones are kept)."""
+    conn = connect(store_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO house_submission_embeddings (submission_id, model_version, embedding) VALUES (?, ?, ?)",
+                [(submission_id, model_version, _embedding_blob(embedding)) for submission_id, embedding in zip(ids, embeddings)]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
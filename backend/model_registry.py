@@ -0,0 +1,290 @@
+"""
+Family Assistance Model Registry
+
+Keeps the trained family assistance classifier and its feature columns resident
+in the process, so each prediction no longer unpickles the forest from disk.
+Loaded bundles are keyed by the model file path and re-validated on every
+lookup; when a retrain publishes a new artifact the next lookup loads it and
+swaps the bundle in atomically.
+
+Training publishes the model, its feature columns and the derived inference
+artifacts one by one, then writes a manifest (<model>_manifest.json) last. When
+a manifest exists, its mtime/size is the only thing checked, so a retrain
+triggers exactly one reload, after every artifact has landed. Models published
+without a manifest are re-validated against the model and feature column files.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+import joblib
+
+from forest_engine import (
+    PARITY_TOLERANCE, check_parity, compile_forest, compiled_forest_path,
+    load_compiled_forest, probe_matrix
+)
+from eligibility_lookup import load_lookup_table, lookup_table_path
+
+DEFAULT_MODEL_PATH = 'family_assistance_classifier.joblib'
+DEFAULT_FEATURE_COLUMNS_PATH = 'feature_columns.joblib'
+
+# Loaded bundles, keyed by absolute model path
+_bundles = {}
+_load_lock = threading.Lock()
+
+
+class ModelBundle:
+    """A loaded classifier together with everything derived from its artifact."""
+
+    def __init__(self, model, feature_columns, model_path, signature, model_digest, compiled=None, lookup=None):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.model_path = model_path
+        self.signature = signature
+        self.model_digest = model_digest
+        # forest_engine.CompiledForest, or None to fall back to model.predict_proba
+        self.compiled = compiled
+        # eligibility_lookup.EligibilityLookupTable, used ahead of the compiled forest when present
+        self.lookup = lookup
+        self.loaded_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _file_signature(path):
+    """Cheap change detector for an artifact: (mtime in ns, size), or None if missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _validate_feature_columns(model, feature_columns):
+    """
+    Check the saved feature columns against the names the model was fitted on.
+    The compiled forest and lookup table index features by position, so the
+    columns must be in the model's order: a reordered list is replaced by the
+    model's own order, and a list with different names is rejected.
+    """
+    model_columns = getattr(model, 'feature_names_in_', None)
+    if model_columns is None or feature_columns is None:
+        return feature_columns
+    model_columns = [str(col) for col in model_columns]
+    columns = [str(col) for col in feature_columns]
+    if columns == model_columns:
+        return feature_columns
+    if sorted(columns) != sorted(model_columns):
+        raise ValueError(f"Saved feature columns {columns} do not match the model's features {model_columns}")
+    print(f"Warning: saved feature columns are not in the model's order, using {model_columns}")
+    return model_columns
+
+
+def manifest_path(model_path):
+    """Where the manifest of a published model lives."""
+    return os.path.splitext(model_path)[0] + '_manifest.json'
+
+
+def publish_manifest(model_path, model_digest, compiled_forest=None, lookup_table=None):
+    """
+    Write the manifest of a model artifact. Called after every other artifact of
+    the model has been published: the manifest landing is what running processes
+    reload on. compiled_forest / lookup_table are the exported file paths, or None.
+    """
+    publish_json({
+        'model': os.path.basename(model_path),
+        'model_digest': model_digest,
+        'compiled_forest': os.path.basename(compiled_forest) if compiled_forest else None,
+        'lookup_table': os.path.basename(lookup_table) if lookup_table else None,
+        'published_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }, manifest_path(model_path))
+
+
+def _read_manifest(model_path):
+    try:
+        with open(manifest_path(model_path), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _load_compiled_forest(model, model_path, model_digest, manifest=None):
+    """
+    Get the compiled form of the model: the exported .npz if it was written for
+    this exact artifact. A model whose manifest says no forest was exported uses
+    sklearn; one published without a manifest is compiled here and verified
+    against sklearn. Returns None (sklearn fallback) if the model can't be
+    compiled faithfully.
+    """
+    try:
+        forest_path = compiled_forest_path(model_path)
+        if os.path.exists(forest_path):
+            forest = load_compiled_forest(forest_path)
+            if forest.model_digest == model_digest:
+                return forest
+
+        if manifest is not None and manifest.get('model_digest') == model_digest:
+            # Training already checked this model and chose not to export a forest
+            print("Compiled forest not exported for this model, using sklearn inference")
+            return None
+
+        forest = compile_forest(model)
+        forest.model_digest = model_digest
+        max_diff = check_parity(model, forest, probe_matrix(forest, model.n_features_in_))
+        if max_diff > PARITY_TOLERANCE:
+            print(f"Warning: compiled forest differs from sklearn by {max_diff:.2e}, using sklearn inference")
+            return None
+        return forest
+    except Exception as e:
+        print(f"Warning: compiled inference unavailable ({str(e)}), using sklearn inference")
+        return None
+
+
+def _load_lookup_table(model_path, model_digest):
+    """Load the precomputed lookup table if one was built for this exact artifact."""
+    try:
+        table_path = lookup_table_path(model_path)
+        if os.path.exists(table_path):
+            lookup = load_lookup_table(table_path)
+            if lookup.model_digest == model_digest:
+                return lookup
+    except Exception as e:
+        print(f"Warning: could not load lookup table ({str(e)})")
+    return None
+
+
+def get_model_bundle(model_path=DEFAULT_MODEL_PATH, feature_columns_path=DEFAULT_FEATURE_COLUMNS_PATH):
+    """
+    Return the resident bundle for model_path, loading it only if it is not
+    loaded yet or the artifact on disk has changed since it was loaded.
+    Returns None if the model file does not exist.
+    """
+    key = os.path.abspath(model_path)
+    if not os.path.exists(model_path):
+        return None
+    manifest_signature = _file_signature(manifest_path(model_path))
+    if manifest_signature is not None:
+        signature = ('manifest', manifest_signature)
+    else:
+        signature = (_file_signature(model_path), _file_signature(feature_columns_path))
+
+    bundle = _bundles.get(key)
+    if bundle is not None and bundle.signature == signature:
+        return bundle
+
+    with _load_lock:
+        # Another thread may have loaded the same artifact while we waited
+        bundle = _bundles.get(key)
+        if bundle is not None and bundle.signature == signature:
+            return bundle
+
+        print(f"Loading model from {model_path} into the registry...")
+        model = joblib.load(model_path)
+        feature_columns = None
+        if os.path.exists(feature_columns_path):
+            feature_columns = joblib.load(feature_columns_path)
+        feature_columns = _validate_feature_columns(model, feature_columns)
+
+        manifest = _read_manifest(model_path)
+        model_digest = file_digest(model_path)
+        bundle = ModelBundle(
+            model=model,
+            feature_columns=feature_columns,
+            model_path=key,
+            signature=signature,
+            model_digest=model_digest,
+            compiled=_load_compiled_forest(model, model_path, model_digest, manifest),
+            lookup=_load_lookup_table(model_path, model_digest)
+        )
+        # Single dict assignment, so readers see either the old or the new bundle
+        _bundles[key] = bundle
+        print(f"Model registry now serving {model_path} (sha256 {bundle.model_digest[:12]})")
+        return bundle
+
+
+def invalidate(model_path=None):
+    """Drop a resident bundle (or all of them) so the next lookup reloads from disk."""
+    with _load_lock:
+        if model_path is None:
+            _bundles.clear()
+        else:
+            _bundles.pop(os.path.abspath(model_path), None)
+
+
+def publish_file(path, write):
+    """
+    Write a file atomically: write(f) fills a temporary binary file in the same
+    directory, which is then renamed over path. Readers never observe a
+    half-written file. Shared by every artifact writer (joblib, JSON, .npz).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix=os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def publish_artifact(obj, path):
+    """
+    Write a joblib artifact atomically (see publish_file); the new mtime makes
+    the registry pick it up.
+    """
+    publish_file(path, lambda f: joblib.dump(obj, f))
+
+
+def publish_json(data, path):
+    """Write a JSON file atomically, like publish_artifact."""
+    publish_file(path, lambda f: f.write(json.dumps(data, indent=4).encode('utf-8')))
+
+
+def append_to_json_list(item, path, lock_timeout=60):
+    """
+    Append item to the JSON list in path (created if missing), atomically and
+    safely across processes: the read-modify-write runs under a lock file, so two
+    trainers publishing at once can't drop each other's entries.
+    """
+    lock_path = path + '.lock'
+    deadline = time.time() + lock_timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            break
+        except FileExistsError:
+            # A lock older than lock_timeout was left behind by a crashed process
+            try:
+                if time.time() - os.path.getmtime(lock_path) > lock_timeout:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+    try:
+        try:
+            with open(path, 'r') as f:
+                items = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            items = []
+        items.append(item)
+        publish_json(items, path)
+    finally:
+        os.remove(lock_path)
@@ -0,0 +1,241 @@
+"""
+Background Retraining Jobs
+
+Runs retrain_model_with_new_data in a separate worker process so API requests
+never block on data generation and RandomForest fitting. Only one retrain runs
+at a time: submitting while a job is queued or running returns that job instead
+of starting another (single-flight). Progress reported by the trainer is relayed
+back from the worker and exposed through get_job().
+
+Job records live in a small SQLite database (retrain_jobs.db, WAL mode, like the
+verified data store), so every API worker process sees the same jobs and the
+single-flight check holds across processes. The API process that accepted a job
+monitors it and refreshes its heartbeat; an unfinished job whose heartbeat stops
+(its API process died) is marked failed instead of blocking new retrains.
+
+The trainer publishes its artifacts with atomic renames, so the serving model
+registry switches to the new model on its next request once the job finishes.
+"""
+
+import json
+import uuid
+import queue
+import sqlite3
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime, timedelta
+
+DEFAULT_JOBS_PATH = 'retrain_jobs.db'
+
+# 'spawn' gives the worker a clean interpreter (no copied Flask/threads state)
+_mp_context = multiprocessing.get_context('spawn')
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 50
+
+# Seconds between heartbeats of a monitored job, and without one before it counts as abandoned
+HEARTBEAT_SECONDS = 10
+STALE_JOB_SECONDS = 60
+
+_JOB_COLUMNS = ['job_id', 'status', 'stage', 'progress', 'params', 'submitted_at',
+                'started_at', 'finished_at', 'error']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS retrain_jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL,
+    params TEXT,
+    submitted_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    error TEXT,
+    heartbeat_at TEXT
+);
+"""
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _connect(jobs_path=DEFAULT_JOBS_PATH):
+    # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(jobs_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row_to_job(row):
+    job = dict(zip(_JOB_COLUMNS, row))
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    return job
+
+
+def _select_jobs(conn, where='', args=()):
+    rows = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM retrain_jobs {where} ORDER BY seq", args).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def _fail_stale_jobs(conn):
+    """Mark unfinished jobs whose monitor stopped sending heartbeats as failed."""
+    cutoff = (datetime.now() - timedelta(seconds=STALE_JOB_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    conn.execute(
+        "UPDATE retrain_jobs SET status = 'failed', finished_at = ?, "
+        "error = 'The API process running this job stopped before it finished' "
+        "WHERE status IN ('queued', 'running') AND heartbeat_at < ?",
+        (_now(), cutoff)
+    )
+
+
+def _update_job(job_id, jobs_path=DEFAULT_JOBS_PATH, **changes):
+    changes['heartbeat_at'] = _now()
+    conn = _connect(jobs_path)
+    try:
+        conn.execute(
+            f"UPDATE retrain_jobs SET {', '.join(f'{col} = ?' for col in changes)} WHERE job_id = ?",
+            list(changes.values()) + [job_id]
+        )
+    finally:
+        conn.close()
+
+
+def _prune_finished_jobs(jobs_path=DEFAULT_JOBS_PATH):
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+    conn = _connect(jobs_path)
+    try:
+        conn.execute(
+            "DELETE FROM retrain_jobs WHERE status IN ('succeeded', 'failed') AND seq NOT IN ("
+            "SELECT seq FROM retrain_jobs WHERE status IN ('succeeded', 'failed') ORDER BY seq DESC LIMIT ?)",
+            (MAX_FINISHED_JOBS,)
+        )
+    finally:
+        conn.close()
+
+
+def _run_retrain_job(job_params, progress_queue):
+    """Worker process entry point."""
+    # Imported here so the API process doesn't need sklearn loaded to queue a job
+    from family_assistance_model import retrain_model_with_new_data
+
+    def report(stage, progress):
+        progress_queue.put(('progress', stage, progress))
+
+    try:
+        progress_queue.put(('started', None, None))
+        success = retrain_model_with_new_data(progress_callback=report, **job_params)
+        progress_queue.put(('finished', success, None))
+    except Exception:
+        progress_queue.put(('finished', False, traceback.format_exc()))
+
+
+def _monitor_job(job_id, process, progress_queue, jobs_path):
+    """Relay progress messages from the worker process into the job table."""
+    finished = False
+    last_heartbeat = datetime.now()
+    while not finished:
+        try:
+            kind, value, detail = progress_queue.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                _update_job(job_id, jobs_path, status='failed', finished_at=_now(),
+                            error=f"Worker process exited unexpectedly (exit code {process.exitcode})")
+                break
+            if (datetime.now() - last_heartbeat).total_seconds() >= HEARTBEAT_SECONDS:
+                _update_job(job_id, jobs_path)
+                last_heartbeat = datetime.now()
+            continue
+
+        last_heartbeat = datetime.now()
+        if kind == 'started':
+            _update_job(job_id, jobs_path, status='running', started_at=_now())
+        elif kind == 'progress':
+            _update_job(job_id, jobs_path, stage=value, progress=detail)
+        elif kind == 'finished':
+            finished = True
+            if value:
+                _update_job(job_id, jobs_path, status='succeeded', stage='done', progress=1.0, finished_at=_now())
+            else:
+                _update_job(job_id, jobs_path, status='failed', finished_at=_now(),
+                            error=detail or "Retraining failed, see the worker log for details")
+
+    process.join()
+    _prune_finished_jobs(jobs_path)
+
+
+def submit_retrain_job(jobs_path=DEFAULT_JOBS_PATH, **job_params):
+    """
+    Start a retraining job in a worker process, unless one is already queued or running
+    (in this or any other API process).
+    Returns (job, created): a snapshot of the job's status and whether it was newly started.
+    """
+    conn = _connect(jobs_path)
+    try:
+        # The write lock makes the active-job check and the insert atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _fail_stale_jobs(conn)
+            active = _select_jobs(conn, "WHERE status IN ('queued', 'running')")
+            if active:
+                conn.execute("COMMIT")
+                return active[-1], False
+
+            job_id = uuid.uuid4().hex
+            now = _now()
+            conn.execute(
+                "INSERT INTO retrain_jobs (job_id, status, progress, params, submitted_at, heartbeat_at) "
+                "VALUES (?, 'queued', 0.0, ?, ?, ?)",
+                (job_id, json.dumps(job_params), now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = _select_jobs(conn, "WHERE job_id = ?", (job_id,))[0]
+    finally:
+        conn.close()
+
+    progress_queue = _mp_context.Queue()
+    process = _mp_context.Process(
+        target=_run_retrain_job,
+        args=(job_params, progress_queue),
+        name=f"retrain-{job_id[:8]}",
+        daemon=True
+    )
+    try:
+        process.start()
+    except Exception as e:
+        _update_job(job_id, jobs_path, status='failed', finished_at=_now(), error=f"Could not start worker: {str(e)}")
+        raise
+    threading.Thread(
+        target=_monitor_job,
+        args=(job_id, process, progress_queue, jobs_path),
+        name=f"retrain-monitor-{job_id[:8]}",
+        daemon=True
+    ).start()
+    return job, True
+
+
+def get_job(job_id, jobs_path=DEFAULT_JOBS_PATH):
+    """Status snapshot of a job, or None if unknown."""
+    conn = _connect(jobs_path)
+    try:
+        _fail_stale_jobs(conn)
+        jobs = _select_jobs(conn, "WHERE job_id = ?", (job_id,))
+    finally:
+        conn.close()
+    return jobs[0] if jobs else None
+
+
+def list_jobs(jobs_path=DEFAULT_JOBS_PATH):
+    """Status snapshots of all known jobs, oldest first."""
+    conn = _connect(jobs_path)
+    try:
+        _fail_stale_jobs(conn)
+        return _select_jobs(conn)
+    finally:
+        conn.close()
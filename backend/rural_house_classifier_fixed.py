@@ -6,10 +6,10 @@ Baik, Sederhana, and Dhaif using TensorFlow/Keras with transfer learning.
 """
 
 import os
+import hashlib
 import numpy as np
 import matplotlib.pyplot as plt
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
 from tensorflow.keras.models import Model
@@ -28,62 +28,163 @@ EPOCHS = 20
 LEARNING_RATE = 0.001
 DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Rural House Dataset')
 MODEL_SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rural_classifier.h5')
+QUANTIZED_MODEL_SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rural_classifier_int8.tflite')
+CALIBRATION_SAMPLES = 100  # Training images used to calibrate INT8 activation ranges
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+# Decoded, resized images are cached between epochs: 'memory', 'disk' (TFDATA_CACHE_DIR) or 'none'
+TFDATA_CACHE = os.environ.get('HOUSE_TFDATA_CACHE', 'memory')
+TFDATA_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tfdata_cache')
+# Phase one trains only the classification head; with 'embeddings' the frozen backbone runs
+# once per image (and augmented variant) and the head trains on the cached embeddings.
+# 'end-to-end' runs the full model every epoch, as before.
+HEAD_TRAINING_MODE = os.environ.get('HOUSE_HEAD_TRAINING', 'embeddings')
+EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'embedding_cache')
+EMBEDDING_VARIANTS = int(os.environ.get('HOUSE_EMBEDDING_VARIANTS', '4'))  # Augmented copies per training image
 
-def create_data_generators():
-    """Create data generators for training, validation, and testing."""
-    print("Creating data generators...")
-    
-    # Data augmentation for training set
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        fill_mode='nearest'
+def list_image_files(split_dir, class_names=None):
+    """
+    Image paths and integer labels under split_dir/<class>/, ordered like
+    flow_from_directory (classes and files sorted by name).
+    class_names restricts (and orders) the classes; by default every subdirectory is a class.
+    """
+    if class_names is None:
+        class_names = sorted(
+            name for name in os.listdir(split_dir) if os.path.isdir(os.path.join(split_dir, name))
+        )
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(split_dir, class_name)
+        for file_name in sorted(os.listdir(class_dir)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, file_name))
+                labels.append(label)
+    return paths, np.array(labels, dtype=np.int64), list(class_names)
+
+def decode_and_resize(path):
+    """Read, decode and resize one image to IMG_SIZE x IMG_SIZE RGB uint8 (nearest, as flow_from_directory)."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, [IMG_SIZE, IMG_SIZE], method='nearest')
+    image.set_shape([IMG_SIZE, IMG_SIZE, 3])
+    return image
+
+def _split_digest(paths):
+    """Digest of a split's file list and modification times, so cached data is invalidated when it changes."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{path}|{os.path.getmtime(path)}|{IMG_SIZE}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def _cache_file(split_name, paths):
+    return os.path.join(TFDATA_CACHE_DIR, f"{split_name}_{_split_digest(paths)}")
+
+def create_augmentation():
+    """
+    Random augmentation matching the old ImageDataGenerator settings, as Keras layers
+    that run vectorized on whole batches.
+    """
+    augmentation_layers = [
+        tf.keras.layers.RandomRotation(20 / 360, fill_mode='nearest'),
+        tf.keras.layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+        tf.keras.layers.RandomZoom(0.2, fill_mode='nearest'),
+        tf.keras.layers.RandomFlip('horizontal')
+    ]
+    # Shear is only available as a layer in newer Keras releases
+    if hasattr(tf.keras.layers, 'RandomShear'):
+        augmentation_layers.append(tf.keras.layers.RandomShear(x_factor=0.2, y_factor=0.2, fill_mode='nearest'))
+    else:
+        print("Note: RandomShear is not available in this Keras version, training without shear augmentation")
+    return tf.keras.Sequential(augmentation_layers, name='augmentation')
+
+def make_dataset(split_name, paths, labels, num_classes, training=False, shuffle=None):
+    """
+    tf.data pipeline for one split: parallel decode -> cache of resized uint8 images ->
+    (shuffle) -> batch -> rescale 1/255 (+ augmentation) -> prefetch.
+    training turns on augmentation and, unless shuffle says otherwise, shuffling.
+    """
+    if shuffle is None:
+        shuffle = training
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(
+        lambda path, label: (decode_and_resize(path), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE
     )
     
-    # Only rescaling for validation and test sets
-    test_val_datagen = ImageDataGenerator(rescale=1./255)
+    # Decoded images are cached, so JPEGs are decoded once instead of every epoch
+    if TFDATA_CACHE == 'memory':
+        dataset = dataset.cache()
+    elif TFDATA_CACHE == 'disk':
+        os.makedirs(TFDATA_CACHE_DIR, exist_ok=True)
+        dataset = dataset.cache(_cache_file(split_name, paths))
+    
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    dataset = dataset.batch(BATCH_SIZE)
+    
+    if training:
+        augmentation = create_augmentation()
+        dataset = dataset.map(
+            lambda images, labels: (augmentation(tf.cast(images, tf.float32) / 255.0, training=True), labels),
+            num_parallel_calls=AUTOTUNE
+        )
+    else:
+        dataset = dataset.map(
+            lambda images, labels: (tf.cast(images, tf.float32) / 255.0, labels),
+            num_parallel_calls=AUTOTUNE
+        )
+    return dataset.prefetch(AUTOTUNE)
+
+def report_pipeline_throughput(dataset, name, n_images):
+    """Run one pass over a dataset (which also fills its cache) and print images/sec."""
+    start = time.time()
+    for _ in dataset:
+        pass
+    elapsed = time.time() - start
+    print(f"{name} input pipeline: {n_images} images in {elapsed:.2f}s ({n_images / max(elapsed, 1e-9):.1f} images/sec)")
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Prints training images/sec at the end of each epoch."""
+    
+    def __init__(self, n_images):
+        super().__init__()
+        self.n_images = n_images
+        self.epoch_start = None
     
-    # Load images from directories
-    train_generator = train_datagen.flow_from_directory(
-        os.path.join(DATASET_PATH, 'train'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=True
-    )
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.time()
     
-    validation_generator = test_val_datagen.flow_from_directory(
-        os.path.join(DATASET_PATH, 'valid'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        shuffle=False
-    )
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.time() - self.epoch_start
+        print(f"Epoch {epoch + 1}: {self.n_images / max(elapsed, 1e-9):.1f} training images/sec")
+
+def create_datasets():
+    """Create tf.data pipelines for training, validation, and testing."""
+    print("Creating tf.data pipelines...")
     
-    # Get class mapping from train set
-    class_indices = train_generator.class_indices
-    class_names = list(class_indices.keys())
+    train_paths, train_labels, class_names = list_image_files(os.path.join(DATASET_PATH, 'train'))
     print(f"Classes found: {class_names}")
-    print(f"Class mapping: {class_indices}")
-    
+    print(f"Class mapping: {dict((name, index) for index, name in enumerate(class_names))}")
+    valid_paths, valid_labels, _ = list_image_files(os.path.join(DATASET_PATH, 'valid'), class_names)
     # Only use valid classes from the test set (matching the training classes)
-    test_generator = test_val_datagen.flow_from_directory(
-        os.path.join(DATASET_PATH, 'test'),
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        classes=class_names,  # Only use classes that match training data
-        shuffle=False
-    )
-    
-    print("Test directory classes filtered to match training classes")
-    
-    return train_generator, validation_generator, test_generator, class_names
+    test_paths, test_labels, _ = list_image_files(os.path.join(DATASET_PATH, 'test'), class_names)
+    print(f"Found {len(train_paths)} training, {len(valid_paths)} validation and {len(test_paths)} test images")
+    
+    num_classes = len(class_names)
+    train_dataset = make_dataset('train', train_paths, train_labels, num_classes, training=True)
+    validation_dataset = make_dataset('valid', valid_paths, valid_labels, num_classes)
+    test_dataset = make_dataset('test', test_paths, test_labels, num_classes)
+    
+    # One pass over each split decodes and caches it, and shows whether the input pipeline keeps up
+    report_pipeline_throughput(train_dataset, 'Training', len(train_paths))
+    report_pipeline_throughput(validation_dataset, 'Validation', len(valid_paths))
+    report_pipeline_throughput(test_dataset, 'Test', len(test_paths))
+    
+    splits = {
+        'train': (train_paths, train_labels),
+        'valid': (valid_paths, valid_labels),
+        'test': (test_paths, test_labels)
+    }
+    return train_dataset, validation_dataset, test_dataset, class_names, splits
 
 def create_model(num_classes):
     """Create and compile the model architecture."""
@@ -124,6 +225,104 @@ def create_model(num_classes):
     
     return model, base_model
 
+def compute_embeddings(feature_extractor, split_name, paths, labels, num_classes, variants=0):
+    """
+    Pooled backbone embeddings for a split: one row per image for the clean images,
+    then one more block of rows per augmented variant. Stored in a memory-mapped
+    .npy file that is reused while the split's files and the variant count are unchanged.
+    Returns (embeddings, labels), with labels repeated to match the rows.
+    """
+    n_images = len(paths)
+    cache_path = os.path.join(
+        EMBEDDING_CACHE_DIR, f"{split_name}_{_split_digest(paths)}_{variants}v.npy"
+    )
+    row_labels = np.tile(labels, variants + 1)
+    if os.path.exists(cache_path):
+        print(f"Reusing cached {split_name} embeddings from {cache_path}")
+        return np.load(cache_path, mmap_mode='r'), row_labels
+    
+    os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + '.tmp.npy'
+    embedding_dim = feature_extractor.output_shape[-1]
+    embeddings = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.float32, shape=((variants + 1) * n_images, embedding_dim)
+    )
+    
+    start = time.time()
+    for variant in range(variants + 1):
+        # Variant 0 is the clean images; the others each draw fresh random augmentations
+        dataset = make_dataset(split_name, paths, labels, num_classes, training=variant > 0, shuffle=False)
+        row = variant * n_images
+        for images, _ in dataset:
+            batch_embeddings = feature_extractor(images, training=False).numpy()
+            embeddings[row:row + len(batch_embeddings)] = batch_embeddings
+            row += len(batch_embeddings)
+    embeddings.flush()
+    del embeddings
+    os.replace(tmp_path, cache_path)
+    
+    elapsed = time.time() - start
+    n_rows = (variants + 1) * n_images
+    print(f"Computed {n_rows} {split_name} embeddings in {elapsed:.2f}s ({n_rows / max(elapsed, 1e-9):.1f} images/sec)")
+    return np.load(cache_path, mmap_mode='r'), row_labels
+
+def create_head_model(embedding_dim, num_classes):
+    """The classification head of create_model() on its own, taking pooled embeddings as input."""
+    inputs = tf.keras.Input(shape=(embedding_dim,))
+    x = Dense(256, activation='relu')(inputs)
+    x = Dropout(0.3)(x)
+    x = Dense(128, activation='relu')(x)
+    x = Dropout(0.2)(x)
+    outputs = Dense(num_classes, activation='softmax')(x)
+    head = Model(inputs=inputs, outputs=outputs)
+    head.compile(
+        optimizer=Adam(learning_rate=LEARNING_RATE),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return head
+
+def train_head_on_embeddings(model, base_model, splits, num_classes):
+    """
+    Phase one without re-running the frozen backbone every epoch: embed every image
+    once, train the head on the embeddings, then copy its weights into the full model.
+    """
+    print("Training the classification head on cached backbone embeddings...")
+    feature_extractor = Model(
+        inputs=base_model.input,
+        outputs=GlobalAveragePooling2D()(base_model.output)
+    )
+    
+    train_paths, train_labels = splits['train']
+    valid_paths, valid_labels = splits['valid']
+    train_embeddings, train_rows = compute_embeddings(
+        feature_extractor, 'train', train_paths, train_labels, num_classes, variants=EMBEDDING_VARIANTS
+    )
+    valid_embeddings, valid_rows = compute_embeddings(
+        feature_extractor, 'valid', valid_paths, valid_labels, num_classes
+    )
+    
+    head = create_head_model(train_embeddings.shape[1], num_classes)
+    start = time.time()
+    history = head.fit(
+        np.asarray(train_embeddings),
+        tf.keras.utils.to_categorical(train_rows, num_classes),
+        batch_size=BATCH_SIZE,
+        epochs=EPOCHS,
+        shuffle=True,
+        validation_data=(np.asarray(valid_embeddings), tf.keras.utils.to_categorical(valid_rows, num_classes)),
+        verbose=1
+    )
+    print(f"Head training took {time.time() - start:.2f}s")
+    
+    # The head's Dense layers correspond one to one, in order, with the full model's
+    model_dense_layers = [layer for layer in model.layers if isinstance(layer, Dense)]
+    head_dense_layers = [layer for layer in head.layers if isinstance(layer, Dense)]
+    for model_layer, head_layer in zip(model_dense_layers, head_dense_layers):
+        model_layer.set_weights(head_layer.get_weights())
+    
+    return history
+
 def plot_confusion_matrix(y_true, y_pred, class_names):
     """Generate and save confusion matrix visualization."""
     # Compute confusion matrix
@@ -147,7 +346,7 @@ def plot_confusion_matrix(y_true, y_pred, class_names):
     print("\nClassification Report:")
     print(report)
 
-def fine_tune_model(model, base_model, train_generator, validation_generator):
+def fine_tune_model(model, base_model, train_dataset, validation_dataset, n_train_images):
     """Fine-tune the model by unfreezing some layers of the base model."""
     print("Fine-tuning the model...")
     
@@ -164,58 +363,112 @@ def fine_tune_model(model, base_model, train_generator, validation_generator):
     
     # Fine-tune the model
     fine_tune_history = model.fit(
-        train_generator,
+        train_dataset,
         epochs=10,
-        validation_data=validation_generator,
+        validation_data=validation_dataset,
+        callbacks=[ThroughputCallback(n_train_images)],
         verbose=1
     )
     
     return fine_tune_history
 
+def load_image_for_tflite(image_path):
+    """Load one image exactly as the test pipeline does (nearest resize, rescale 1/255)."""
+    return decode_and_resize(image_path).numpy().astype(np.float32) / 255.0
+
+def quantize_model(model, train_paths):
+    """
+    Convert the trained model to a fully INT8-quantized TFLite model.
+    Activation ranges are calibrated on a sample of the training images; the model
+    keeps float32 input/output so callers feed the same images as the float model.
+    """
+    print("Quantizing the model to INT8...")
+    rng = np.random.default_rng(42)
+    calibration_paths = rng.choice(
+        train_paths,
+        size=min(CALIBRATION_SAMPLES, len(train_paths)),
+        replace=False
+    )
+    
+    def representative_dataset():
+        for image_path in calibration_paths:
+            yield [np.expand_dims(load_image_for_tflite(image_path), axis=0).astype(np.float32)]
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    tflite_model = converter.convert()
+    
+    with open(QUANTIZED_MODEL_SAVE_PATH, 'wb') as f:
+        f.write(tflite_model)
+    print(f"Quantized model saved to {QUANTIZED_MODEL_SAVE_PATH}")
+    return QUANTIZED_MODEL_SAVE_PATH
+
+def evaluate_tflite_model(tflite_path, test_paths, test_labels):
+    """Accuracy of a TFLite model on the test split."""
+    interpreter = tf.lite.Interpreter(model_path=tflite_path)
+    interpreter.allocate_tensors()
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    
+    correct = 0
+    for image_path, true_class in zip(test_paths, test_labels):
+        interpreter.set_tensor(input_index, np.expand_dims(load_image_for_tflite(image_path), axis=0).astype(np.float32))
+        interpreter.invoke()
+        predicted_class = int(np.argmax(interpreter.get_tensor(output_index)[0]))
+        correct += int(predicted_class == true_class)
+    
+    return correct / max(1, len(test_paths))
+
 def main():
     """Main function to train and evaluate the model."""
     start_time = time.time()
     
-    # Create data generators
-    train_generator, validation_generator, test_generator, class_names = create_data_generators()
+    # Create input pipelines
+    train_dataset, validation_dataset, test_dataset, class_names, splits = create_datasets()
+    train_paths, _ = splits['train']
+    test_paths, test_labels = splits['test']
     
     # Create and compile the model
     model, base_model = create_model(len(class_names))
     
-    # Train the model
-    print("Training the model...")
-    history = model.fit(
-        train_generator,
-        epochs=EPOCHS,
-        validation_data=validation_generator,
-        verbose=1
-    )
+    # Train the model (phase one: classification head only, backbone frozen)
+    if HEAD_TRAINING_MODE == 'embeddings':
+        history = train_head_on_embeddings(model, base_model, splits, len(class_names))
+    else:
+        print("Training the model...")
+        history = model.fit(
+            train_dataset,
+            epochs=EPOCHS,
+            validation_data=validation_dataset,
+            callbacks=[ThroughputCallback(len(train_paths))],
+            verbose=1
+        )
     
     # Evaluate the model on validation data
     print("Evaluating on validation data...")
-    val_loss, val_accuracy = model.evaluate(validation_generator)
+    val_loss, val_accuracy = model.evaluate(validation_dataset)
     print(f"Validation accuracy: {val_accuracy:.4f}")
     print(f"Validation loss: {val_loss:.4f}")
     
     # Fine-tune the model
-    fine_tune_history = fine_tune_model(model, base_model, train_generator, validation_generator)
+    fine_tune_history = fine_tune_model(model, base_model, train_dataset, validation_dataset, len(train_paths))
     
     # Evaluate the fine-tuned model on validation data
     print("Evaluating fine-tuned model on validation data...")
-    val_loss, val_accuracy = model.evaluate(validation_generator)
+    val_loss, val_accuracy = model.evaluate(validation_dataset)
     print(f"Fine-tuned validation accuracy: {val_accuracy:.4f}")
     print(f"Fine-tuned validation loss: {val_loss:.4f}")
     
     # Generate predictions on test data for confusion matrix
     print("Generating predictions for confusion matrix...")
-    test_steps = len(test_generator)
-    test_generator.reset()
     
-    # Get true labels
-    y_true = test_generator.classes
+    # Get true labels (the test pipeline is not shuffled, so predictions come back in this order)
+    y_true = test_labels
     
     # Generate predictions
-    y_pred_probabilities = model.predict(test_generator, steps=test_steps)
+    y_pred_probabilities = model.predict(test_dataset)
     y_pred = np.argmax(y_pred_probabilities, axis=1)
     
     # Plot confusion matrix
@@ -223,7 +476,7 @@ def main():
     
     # Evaluate on test data
     print("Evaluating on test data...")
-    test_loss, test_accuracy = model.evaluate(test_generator)
+    test_loss, test_accuracy = model.evaluate(test_dataset)
     print(f"Test accuracy: {test_accuracy:.4f}")
     print(f"Test loss: {test_loss:.4f}")
     
@@ -231,6 +484,11 @@ def main():
     model.save(MODEL_SAVE_PATH)
     print(f"Model saved to {MODEL_SAVE_PATH}")
     
+    # Quantize for CPU serving and compare against the float model on the test split
+    quantized_path = quantize_model(model, train_paths)
+    quantized_accuracy = evaluate_tflite_model(quantized_path, test_paths, test_labels)
+    print(f"INT8 test accuracy: {quantized_accuracy:.4f} (float: {test_accuracy:.4f}, delta: {quantized_accuracy - test_accuracy:+.4f})")
+    
     # Print total training time
     total_time = time.time() - start_time
     print(f"Total training time: {total_time/60:.2f} minutes")
@@ -246,6 +504,15 @@ def main():
         "performance": {
             "validation_accuracy": float(val_accuracy),
             "test_accuracy": float(test_accuracy)
+        },
+        "quantized_model": {
+            "path": os.path.basename(quantized_path),
+            "format": "TFLite INT8",
+            "calibration_samples": min(CALIBRATION_SAMPLES, len(train_paths)),
+            "test_accuracy": float(quantized_accuracy),
+            "test_accuracy_delta": float(quantized_accuracy - test_accuracy),
+            "size_bytes": os.path.getsize(quantized_path),
+            "float_size_bytes": os.path.getsize(MODEL_SAVE_PATH)
         }
     }
     
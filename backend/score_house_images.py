@@ -0,0 +1,196 @@
+"""
+Bulk House Image Scoring
+
+Re-grades a whole archive of house photos (e.g. 'Rural House Dataset/test/rural_housing_images'
+or an export of Firebase Storage) with the same model and class mapping as the
+housing API, without going through HTTP:
+- images are decoded and resized by a pool of worker processes,
+- the model runs on large batches,
+- results are appended to the output as each batch finishes, so an interrupted
+  run picks up where it stopped when started again with the same output path,
+- output is CSV, or Parquet when the output path ends in .parquet.
+
+Usage:
+    python score_house_images.py INPUT [INPUT ...] --output results.csv [--batch-size 256] [--workers 8]
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+
+from house_image_preprocessing import decode_image, new_batch, IMG_SIZE
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rural_classifier.h5')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+DEFAULT_BATCH_SIZE = 256
+# Batches' worth of images decoded ahead of the model
+DECODE_WINDOW_BATCHES = 4
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Score a directory tree of house images with the rural house classifier')
+    parser.add_argument('inputs', nargs='+', help='Image files or directories (searched recursively)')
+    parser.add_argument('--output', required=True, help='Results file (.csv or .parquet)')
+    parser.add_argument('--model-path', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Decode processes (default: all cores)')
+    parser.add_argument('--restart', action='store_true', help='Ignore any earlier progress and score everything again')
+    return parser.parse_args()
+
+
+def find_images(inputs):
+    """Image paths under inputs, sorted, so reruns see the same order."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(
+                    os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            print(f"Warning: {item} does not exist, skipping")
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def _decode_file(path):
+    """Worker process: (path, uint8 pixels or None, error message or None)."""
+    try:
+        with open(path, 'rb') as f:
+            image = decode_image(f.read(), size=IMG_SIZE)
+        return path, np.asarray(image, dtype=np.uint8), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _progress_paths(output):
+    """Results are streamed to a CSV; for Parquet output that CSV is a temporary part file."""
+    parquet = output.lower().endswith('.parquet')
+    results_csv = output + '.partial.csv' if parquet else output
+    return results_csv, output + '.checkpoint.json', parquet
+
+
+def load_checkpoint(results_csv, checkpoint_path, version):
+    """Paths already scored by an earlier run with the same model, or an empty set."""
+    if not (os.path.exists(results_csv) and os.path.exists(checkpoint_path)):
+        return set()
+    with open(checkpoint_path, 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('model_version') != version:
+        print("Model changed since the last run, scoring everything again")
+        return set()
+    with open(results_csv, 'r', newline='') as f:
+        return {row['path'] for row in csv.DictReader(f)}
+
+
+def write_checkpoint(checkpoint_path, version, scored):
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'model_version': version,
+            'images_scored': scored,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }, f, indent=4)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def main():
+    args = parse_args()
+    from asnaf_housing_api import CLASS_NAMES, _model_files_version
+
+    paths = find_images(args.inputs)
+    results_csv, checkpoint_path, parquet = _progress_paths(args.output)
+
+    # The decode pool is started before TensorFlow is loaded, so its processes don't inherit it
+    pool = multiprocessing.Pool(processes=max(1, args.workers))
+    try:
+        from house_model_serving import load_serving_model
+        serving_model = load_serving_model(args.model_path)
+        print(f"Model loaded (serving backend: {serving_model.backend})")
+        # Versioned by the backend and files actually loaded (e.g. the INT8 .tflite with
+        # HOUSE_MODEL_VARIANT=int8), the same way the housing API versions its results
+        version = _model_files_version(serving_model.backend, args.model_path)
+
+        done = set() if args.restart else load_checkpoint(results_csv, checkpoint_path, version)
+        todo = [path for path in paths if path not in done]
+        print(f"Found {len(paths)} images, {len(done)} already scored, {len(todo)} to go")
+
+        fieldnames = ['path', 'classification'] + [f"probability_{name}" for name in CLASS_NAMES] + ['error', 'model_version', 'scored_at']
+        if not done:
+            with open(results_csv, 'w', newline='') as f:
+                csv.DictWriter(f, fieldnames=fieldnames).writeheader()
+            write_checkpoint(checkpoint_path, version, 0)
+
+        start = time.time()
+        scored = len(done)
+        batch = new_batch(args.batch_size)
+        batch_paths = []
+        rows = []
+
+        def flush():
+            nonlocal scored
+            scored_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if batch_paths:
+                predictions = serving_model.predict_batch(batch[:len(batch_paths)])
+                for path, prediction in zip(batch_paths, predictions):
+                    row = {'path': path, 'classification': CLASS_NAMES[int(np.argmax(prediction))], 'error': ''}
+                    row.update({f"probability_{name}": float(prediction[i]) for i, name in enumerate(CLASS_NAMES)})
+                    rows.append(row)
+            for row in rows:
+                row['model_version'] = version
+                row['scored_at'] = scored_at
+            with open(results_csv, 'a', newline='') as f:
+                csv.DictWriter(f, fieldnames=fieldnames).writerows(rows)
+            scored += len(rows)
+            write_checkpoint(checkpoint_path, version, scored)
+            elapsed = time.time() - start
+            print(f"Scored {scored}/{len(paths)} images ({(scored - len(done)) / max(elapsed, 1e-9):.1f} images/sec)")
+            batch_paths.clear()
+            rows.clear()
+
+        # Decode a window of images ahead of the model (not the whole archive, to bound memory)
+        window = args.batch_size * DECODE_WINDOW_BATCHES
+        windows = [todo[i:i + window] for i in range(0, len(todo), window)]
+        in_flight = pool.imap(_decode_file, windows[0], chunksize=8) if windows else iter(())
+        for window_index in range(len(windows)):
+            current = in_flight
+            if window_index + 1 < len(windows):
+                in_flight = pool.imap(_decode_file, windows[window_index + 1], chunksize=8)
+            for path, pixels, error in current:
+                if error is not None:
+                    rows.append({'path': path, 'classification': '', 'error': error})
+                else:
+                    batch[len(batch_paths)] = pixels
+                    batch_paths.append(path)
+                if len(batch_paths) == args.batch_size:
+                    flush()
+        if batch_paths or rows:
+            flush()
+    finally:
+        pool.close()
+        pool.join()
+
+    if parquet:
+        import pandas as pd
+        try:
+            pd.read_csv(results_csv).to_parquet(args.output, index=False)
+        except ImportError as e:
+            print(f"Warning: Parquet output needs pyarrow or fastparquet ({str(e)}); results kept in {results_csv}")
+            return
+        os.remove(results_csv)
+        os.remove(checkpoint_path)
+        print(f"Results written to {args.output}")
+    else:
+        print(f"Results written to {results_csv}")
+
+
+if __name__ == '__main__':
+    main()
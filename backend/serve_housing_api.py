@@ -0,0 +1,187 @@
+"""
+Production Server for the Housing API
+
+Runs asnaf_housing_api with several worker processes instead of the single
+process Flask development server, without one copy of the model per worker.
+TensorFlow is never loaded in the gunicorn master (its runtime and thread pools
+are not fork-safe). Instead, this launcher starts two processes:
+- one inference process (house_inference_server.py) that loads and warms up the
+  model once, with TensorFlow's thread pools sized to all the CPU cores,
+- gunicorn, whose workers import the app after they are forked and send their
+  (micro-batched) images to the inference process over a local socket. The
+  workers never import TensorFlow.
+Each worker connects in the background once it has bound, and its model
+endpoints answer 503 (and /health reports it as not ready) until it has. If
+either process exits, the launcher stops the other one and exits too, so a
+supervisor can restart the server as a whole.
+
+With --per-worker-model, each worker loads its own copy of the model instead
+(budget memory for one model per worker) and TensorFlow's thread pools are
+split between the workers.
+
+Uses gunicorn when it is installed (pip install gunicorn); otherwise falls back to
+a single threaded werkzeug server that loads the model itself.
+
+Usage:
+    python serve_housing_api.py [--workers 4] [--threads 4] [--port 5000] [--per-worker-model]
+"""
+
+import os
+import sys
+import signal
+import shutil
+import secrets
+import argparse
+import tempfile
+import multiprocessing
+from multiprocessing.connection import wait
+
+
+def parse_args():
+    cpu_count = multiprocessing.cpu_count()
+    parser = argparse.ArgumentParser(description='Serve the housing API with multiple worker processes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=max(1, cpu_count // 2),
+                        help='Worker processes (default: half the CPU cores)')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Request threads per worker; concurrent requests share micro-batches')
+    parser.add_argument('--per-worker-model', action='store_true',
+                        help='Load a copy of the model in every worker instead of one shared inference process')
+    parser.add_argument('--intra-op-threads', type=int, default=None,
+                        help='TensorFlow intra-op threads per model copy '
+                             '(default: all cores, or cores / workers with --per-worker-model)')
+    parser.add_argument('--inter-op-threads', type=int, default=1,
+                        help='TensorFlow inter-op threads per model copy')
+    parser.add_argument('--timeout', type=int, default=120,
+                        help='Seconds before an unresponsive worker is restarted')
+    return parser.parse_args()
+
+
+def configure_model_threads(args, model_copies):
+    """Give each model copy an equal share of the cores, via the variables house_model_serving reads."""
+    intra_op_threads = args.intra_op_threads or max(1, multiprocessing.cpu_count() // max(1, model_copies))
+    os.environ.setdefault('HOUSE_TF_INTRA_OP_THREADS', str(intra_op_threads))
+    os.environ.setdefault('HOUSE_TF_INTER_OP_THREADS', str(args.inter_op_threads))
+    os.environ.setdefault('HOUSE_TFLITE_THREADS', str(intra_op_threads))
+    print(f"TensorFlow threads per model copy ({model_copies}): intra-op {os.environ['HOUSE_TF_INTRA_OP_THREADS']}, "
+          f"inter-op {os.environ['HOUSE_TF_INTER_OP_THREADS']}")
+
+
+def post_worker_init(worker):
+    """gunicorn hook: load (or connect to) and warm up the model in each worker, after it has been forked."""
+    import asnaf_housing_api
+    asnaf_housing_api.start_background_startup()
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    if 'tensorflow' in sys.modules:
+        print("Warning: TensorFlow is already imported in the master process; workers forked from it may hang")
+
+    class HousingApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Runs in each worker after the fork (no preload_app), so nothing
+            # the app module creates (threads, pools) is inherited across fork.
+            # The model itself is loaded (or connected to) by post_worker_init
+            import asnaf_housing_api
+            return asnaf_housing_api.app
+
+    HousingApplication({
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': False,
+        'timeout': args.timeout,
+        'post_worker_init': post_worker_init
+    }).run()
+
+
+def run_shared_model(args):
+    """Run the inference process and gunicorn side by side, and stop both when either exits."""
+    from house_inference_server import run_inference_server
+
+    # Both children inherit these: the socket lives in a private directory, and
+    # only holders of the key can connect
+    socket_dir = tempfile.mkdtemp(prefix='housing-inference-')
+    os.environ['HOUSE_INFERENCE_SOCKET'] = os.path.join(socket_dir, 'inference.sock')
+    os.environ['HOUSE_INFERENCE_AUTHKEY'] = secrets.token_hex(32)
+
+    # 'spawn': neither child inherits anything from this launcher but the environment
+    context = multiprocessing.get_context('spawn')
+    inference = context.Process(target=run_inference_server, name='housing-inference')
+    server = context.Process(target=run_gunicorn, args=(args,), name='housing-gunicorn')
+    processes = [inference, server]
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    exited = []
+    try:
+        inference.start()
+        server.start()
+        ready = wait([process.sentinel for process in processes])
+        exited = [process for process in processes if process.sentinel in ready]
+        for process in exited:
+            process.join()  # The sentinel fires as the process exits, possibly before it can be reaped
+    except KeyboardInterrupt:
+        stopping = True  # Ctrl-C reaches the children too; gunicorn shuts its workers down
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=30)
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+    if not stopping:
+        for process in exited:
+            print(f"{process.name} exited with code {process.exitcode}, stopped the housing API")
+        sys.exit(1)
+
+
+def run_werkzeug(args):
+    from werkzeug.serving import run_simple
+    import asnaf_housing_api
+
+    asnaf_housing_api.start_background_startup()
+    run_simple(args.host, args.port, asnaf_housing_api.app, threaded=True)
+
+
+def main():
+    args = parse_args()
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("Warning: gunicorn is not installed, serving from a single process (pip install gunicorn)")
+        configure_model_threads(args, 1)
+        run_werkzeug(args)
+        return
+    print(f"Starting housing API on {args.host}:{args.port} with {args.workers} workers x {args.threads} threads")
+    if args.per_worker_model:
+        configure_model_threads(args, args.workers)
+        run_gunicorn(args)
+    else:
+        configure_model_threads(args, 1)
+        run_shared_model(args)
+
+
+if __name__ == '__main__':
+    main()
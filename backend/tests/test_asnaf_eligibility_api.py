@@ -0,0 +1,101 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import model_registry
+from asnaf_eligibility_api import app
+from family_assistance_model import FEATURE_COLUMNS, records_to_feature_matrix
+
+RECORD = {
+    "monthly_income": 550,
+    "family_members": 4,
+    "has_stable_housing": 1,
+    "access_to_clean_water": 0,
+    "access_to_electricity": 0,
+    "has_significant_health_issues": 0
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of the API serving a small model from a scratch working directory."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        "monthly_income": rng.normal(900, 500, 500).round(),
+        "family_members": rng.integers(1, 9, 500),
+        "has_stable_housing": rng.integers(0, 2, 500),
+        "access_to_clean_water": rng.integers(0, 2, 500),
+        "access_to_electricity": rng.integers(0, 2, 500),
+        "has_significant_health_issues": rng.integers(0, 2, 500)
+    }, columns=FEATURE_COLUMNS)
+    y = (X["monthly_income"] < 700).astype(int)
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+
+    monkeypatch.chdir(tmp_path)
+    model_registry.publish_artifact(model, 'family_assistance_classifier.joblib')
+    model_registry.publish_artifact(FEATURE_COLUMNS, 'feature_columns.joblib')
+    yield app.test_client()
+    model_registry.invalidate()
+
+
+@pytest.mark.parametrize('value', [None, float('nan')])
+def test_feature_matrix_rejects_missing_values(value):
+    with pytest.raises(ValueError, match='family_members'):
+        records_to_feature_matrix([RECORD, dict(RECORD, family_members=value)])
+
+
+def test_batch_assess_rejects_null_fields(client):
+    response = client.post('/api/batch-assess', json={"records": [RECORD, dict(RECORD, monthly_income=None)]})
+    assert response.status_code == 400
+    assert 'monthly_income' in response.get_json()['error']
+
+
+def test_batch_assess_scores_valid_records(client):
+    response = client.post('/api/batch-assess', json={"records": [RECORD, RECORD]})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 2
+
+
+def _stream_rows(response):
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return lines[:-1], lines[-1]['summary']
+
+
+CSV_BODY = ",".join(FEATURE_COLUMNS) + "\n" + "".join(
+    f"{income},4,1,0,0,0\n" for income in range(300, 300 + 2500)
+)
+NDJSON_BODY = "".join(
+    json.dumps(dict(RECORD, monthly_income=income)) + "\n" for income in range(300, 300 + 2500)
+)
+
+
+@pytest.mark.parametrize('filename, body', [('records.csv', CSV_BODY), ('records.ndjson', NDJSON_BODY)], ids=['csv', 'ndjson'])
+def test_stream_scores_every_row_of_multipart_upload(client, filename, body):
+    response = client.post('/api/batch-assess-stream', data={'file': (io.BytesIO(body.encode()), filename)},
+                           content_type='multipart/form-data')
+    rows, summary = _stream_rows(response)
+    assert summary == {"rows": 2500, "errors": 0}
+    assert [row['row'] for row in rows] == list(range(1, 2501))
+    assert [row['input_data']['monthly_income'] for row in rows] == list(range(300, 2800))
+
+
+def test_stream_reports_short_and_empty_cells_in_both_formats(client):
+    header = ",".join(FEATURE_COLUMNS) + "\n"
+    csv_body = header + "550,4,1,0,0,0\n550,4\n550,,1,0,0,0\n"
+    ndjson_body = "".join(json.dumps(record) + "\n" for record in [
+        RECORD,
+        {"monthly_income": 550, "family_members": 4},
+        {key: value for key, value in RECORD.items() if key != "family_members"}
+    ])
+
+    for body, data_format in ((csv_body, 'csv'), (ndjson_body, 'ndjson')):
+        rows, summary = _stream_rows(client.post(f'/api/batch-assess-stream?format={data_format}', data=body))
+        assert summary == {"rows": 3, "errors": 2}
+        assert 'prediction' in rows[0]
+        assert 'has_stable_housing' in rows[1]['error']
+        assert 'family_members' in rows[2]['error']
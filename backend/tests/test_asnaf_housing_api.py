@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+import pytest
+
+import asnaf_housing_api
+import house_submission_store
+from house_image_fetcher import ImageFetchError, ImageRejectedError, ImageTooLargeError
+
+
+class FailingFetcher:
+    """Stands in for the API's ImageFetcher, failing every fetch with a given error."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def fetch(self, url, if_none_match=None):
+        raise self.error
+
+
+@pytest.fixture
+def client(monkeypatch):
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(asnaf_housing_api, 'model_ready', ready)
+    return asnaf_housing_api.app.test_client()
+
+
+@pytest.mark.parametrize('error, status_code', [
+    (ImageRejectedError("Unsupported image URL: 'ftp://example.com/a.png'"), 400),
+    (ImageRejectedError("URL did not return an image (content type text/html)"), 400),
+    (ImageTooLargeError("Image exceeds the 10 byte limit"), 400),
+    (ImageFetchError("Failed to fetch image from URL: connection refused"), 502),
+])
+def test_analyze_house_url_error_status(client, monkeypatch, error, status_code):
+    monkeypatch.setattr(asnaf_housing_api, 'fetcher', FailingFetcher(error))
+    response = client.post('/analyze-house-url', json={'image_url': 'http://example.com/house.png'})
+    assert response.status_code == status_code
+    assert response.get_json()['error'] == str(error)
+
+
+class EmbeddingModel:
+    """Stands in for the serving model: only whether it can produce embeddings matters here."""
+
+    backend = 'test'
+
+    def predict_with_embeddings(self, images):
+        raise AssertionError("no images should need embedding")
+
+
+@pytest.fixture
+def submissions(tmp_path, monkeypatch):
+    """An empty submission store and no similarity index yet, for a model that produces embeddings."""
+    monkeypatch.setattr(house_submission_store, 'DEFAULT_STORE_PATH', str(tmp_path / 'submissions.db'))
+    monkeypatch.setattr(asnaf_housing_api, 'DATASET_PATH', str(tmp_path / 'no-dataset'))
+    monkeypatch.setattr(asnaf_housing_api, 'SIMILARITY_INDEX_PATH', str(tmp_path / 'index.npz'))
+    monkeypatch.setattr(asnaf_housing_api, 'serving_model', EmbeddingModel())
+    monkeypatch.setattr(asnaf_housing_api, 'serving_model_version', 'test-v1')
+    monkeypatch.setattr(asnaf_housing_api, 'similarity_index', None)
+    monkeypatch.setattr(asnaf_housing_api, 'similarity_state', {
+        **asnaf_housing_api.similarity_state, 'status': 'not_loaded', 'submissions_synced_to': 0, 'last_synced': None
+    })
+
+
+def _record(keys):
+    rng = np.random.default_rng(len(keys))
+    asnaf_housing_api.record_submissions(
+        keys,
+        np.zeros((len(keys), 4, 4, 3), dtype=np.uint8),
+        rng.normal(size=(len(keys), 8)).astype(np.float32),
+        [{'source': key} for key in keys]
+    )
+
+
+def test_submissions_before_the_index_loads_are_kept(submissions):
+    _record(['early-1', 'early-2'])
+    asnaf_housing_api.flush_submissions()
+    assert house_submission_store.load_embeddings('test-v1')[0] == ['early-1', 'early-2']
+
+    asnaf_housing_api.load_similarity_index()
+    index = asnaf_housing_api.similarity_index
+    assert 'early-1' in index and 'early-2' in index
+
+    # Once loaded, the recorder also adds new submissions to the index
+    _record(['late'])
+    asnaf_housing_api.flush_submissions()
+    assert 'late' in index
+    assert house_submission_store.load_embeddings('test-v1')[0] == ['early-1', 'early-2', 'late']
+
+
+def test_index_is_reloaded_past_the_retention_limit(submissions, monkeypatch):
+    monkeypatch.setattr(house_submission_store, 'DEFAULT_RETENTION', 2)
+    asnaf_housing_api.load_similarity_index()
+    first_index = asnaf_housing_api.similarity_index
+
+    _record([f"image-{i}" for i in range(5)])
+    asnaf_housing_api.flush_submissions()
+    assert house_submission_store.load_embeddings('test-v1')[0] == ['image-3', 'image-4']
+
+    # The grown index is replaced in the background by one with only the retained submissions;
+    # the reload holds this lock from before the flush returns until it is done
+    with asnaf_housing_api._reload_lock:
+        pass
+    index = asnaf_housing_api.similarity_index
+    assert index is not first_index
+    assert sorted(index.ids) == ['image-3', 'image-4']
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from eligibility_lookup import MAX_TABLE_CELLS, build_lookup_table, load_lookup_table, save_lookup_table
+from forest_engine import PARITY_TOLERANCE, compile_forest
+
+FEATURE_COLUMNS = [
+    "monthly_income", "family_members", "has_stable_housing",
+    "access_to_clean_water", "access_to_electricity", "has_significant_health_issues"
+]
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(0)
+    # Unrounded incomes give split thresholds that are not exactly representable in float32
+    X = pd.DataFrame({
+        "monthly_income": rng.normal(900, 500, 2000).clip(100),
+        "family_members": rng.integers(1, 9, 2000),
+        "has_stable_housing": rng.integers(0, 2, 2000),
+        "access_to_clean_water": rng.integers(0, 2, 2000),
+        "access_to_electricity": rng.integers(0, 2, 2000),
+        "has_significant_health_issues": rng.integers(0, 2, 2000)
+    }, columns=FEATURE_COLUMNS)
+    y = ((X["monthly_income"] / X["family_members"] < 250) | (X["has_stable_housing"] == 0)).astype(int)
+    return RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def lookup(model):
+    return build_lookup_table(compile_forest(model), len(FEATURE_COLUMNS))
+
+
+def _assert_parity(model, lookup, X):
+    expected = model.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    assert np.max(np.abs(lookup.predict_proba(X) - expected)) <= PARITY_TOLERANCE
+
+
+def test_matches_sklearn_on_grid(model, lookup):
+    grid = np.meshgrid(np.arange(0, 4000, 12.5), np.arange(0, 10), [0, 1], [0, 1], [0, 1], [0, 1], indexing='ij')
+    X = np.column_stack([axis.ravel() for axis in grid])
+    _assert_parity(model, lookup, X)
+
+
+def test_matches_sklearn_at_and_around_thresholds(model, lookup):
+    base = np.array([900, 4, 1, 1, 1, 0], dtype=np.float64)
+    rows = []
+    for f, thresholds in enumerate(lookup.thresholds):
+        as_float32 = thresholds.astype(np.float32)
+        edges = [
+            thresholds,
+            np.nextafter(thresholds, -np.inf),
+            np.nextafter(thresholds, np.inf),
+            as_float32,
+            np.nextafter(as_float32, np.float32(-np.inf)),
+            np.nextafter(as_float32, np.float32(np.inf))
+        ]
+        for value in np.concatenate([edge.astype(np.float64) for edge in edges]):
+            row = base.copy()
+            row[f] = value
+            rows.append(row)
+    assert any(not np.all(t.astype(np.float32) == t) for t in lookup.thresholds)
+    _assert_parity(model, lookup, np.array(rows))
+
+
+def test_save_and_load_round_trip(model, lookup, tmp_path):
+    path = str(tmp_path / 'lookup.npz')
+    save_lookup_table(lookup, path)
+    loaded = load_lookup_table(path)
+    X = np.random.default_rng(1).uniform(0, 3000, size=(500, len(FEATURE_COLUMNS))).round()
+    np.testing.assert_array_equal(loaded.predict_proba(X), lookup.predict_proba(X))
+
+
+def test_refuses_tables_over_the_cell_limit(model, lookup):
+    n_cells = int(np.prod(lookup.shape))
+    assert n_cells < MAX_TABLE_CELLS
+    assert build_lookup_table(compile_forest(model), len(FEATURE_COLUMNS), max_cells=n_cells - 1) is None
+    assert build_lookup_table(compile_forest(model), len(FEATURE_COLUMNS), max_cells=n_cells) is not None
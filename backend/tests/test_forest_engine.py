@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import (
+    PARITY_TOLERANCE, compile_forest, load_compiled_forest, probe_matrix, save_compiled_forest
+)
+
+FEATURE_COLUMNS = [
+    "monthly_income", "family_members", "has_stable_housing",
+    "access_to_clean_water", "access_to_electricity", "has_significant_health_issues"
+]
+
+
+def _family_frame(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "monthly_income": np.round(rng.normal(900, 500, n_rows).clip(100)),
+        "family_members": rng.integers(1, 9, n_rows),
+        "has_stable_housing": rng.integers(0, 2, n_rows),
+        "access_to_clean_water": rng.integers(0, 2, n_rows),
+        "access_to_electricity": rng.integers(0, 2, n_rows),
+        "has_significant_health_issues": rng.integers(0, 2, n_rows)
+    }, columns=FEATURE_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def model():
+    X = _family_frame(2000, seed=0)
+    y = ((X["monthly_income"] / X["family_members"] < 250) | (X["has_stable_housing"] == 0)).astype(int)
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+def test_predict_proba_matches_sklearn(model):
+    forest = compile_forest(model)
+    X = _family_frame(5000, seed=1)
+    assert np.max(np.abs(forest.predict_proba(X.to_numpy()) - model.predict_proba(X))) <= PARITY_TOLERANCE
+    np.testing.assert_array_equal(forest.predict(X.to_numpy()), model.predict(X))
+
+
+def test_predict_proba_matches_sklearn_on_split_thresholds(model):
+    forest = compile_forest(model)
+    X = probe_matrix(forest, model.n_features_in_, n_rows=2000)
+    expected = model.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    assert np.max(np.abs(forest.predict_proba(X) - expected)) <= PARITY_TOLERANCE
+
+
+def test_save_load_round_trip(model, tmp_path):
+    forest = compile_forest(model)
+    forest.model_digest = 'abc123'
+    path = str(tmp_path / 'model_forest.npz')
+    save_compiled_forest(forest, path)
+    loaded = load_compiled_forest(path)
+
+    assert loaded.model_digest == 'abc123'
+    assert loaded.max_depth == forest.max_depth
+    np.testing.assert_array_equal(loaded.classes, forest.classes)
+    X = _family_frame(1000, seed=2)
+    assert np.max(np.abs(loaded.predict_proba(X.to_numpy()) - model.predict_proba(X))) <= PARITY_TOLERANCE
@@ -0,0 +1,147 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from house_image_fetcher import FetchedImage, ImageFetcher, ImageFetchError, ImageRejectedError, ImageTooLargeError
+
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 1024
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves the canned responses the tests fetch."""
+
+    def _send(self, status, body=b'', content_type='image/png', headers=None, content_length=True):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if content_length:
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/house.png':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304, content_type=None, headers={'ETag': '"v1"'})
+            else:
+                self._send(200, PNG_BYTES, headers={'ETag': '"v1"'})
+        elif self.path == '/octet-stream':
+            self._send(200, PNG_BYTES, content_type='application/octet-stream')
+        elif self.path == '/error-page':
+            self._send(200, b'<html>Access denied</html>', content_type='text/html; charset=utf-8')
+        elif self.path == '/large':
+            self._send(200, b'\x00' * 4096)
+        elif self.path == '/large-unannounced':
+            # No Content-Length: the cap has to be enforced while streaming
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.end_headers()
+            for _ in range(8):
+                self.wfile.write(b'\x00' * 1024)
+            self.close_connection = True
+        elif self.path == '/slow':
+            time.sleep(1.0)
+            self._send(200, PNG_BYTES)
+        elif self.path == '/redirect':
+            self._send(302, content_type=None, headers={'Location': '/house.png'})
+        elif self.path == '/redirect-loop':
+            self._send(302, content_type=None, headers={'Location': '/redirect-loop'})
+        elif self.path == '/redirect-to-file':
+            self._send(302, content_type=None, headers={'Location': 'file:///etc/passwd'})
+        else:
+            self._send(404, b'not found', content_type='text/plain')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    return ImageFetcher(connect_timeout=1, read_timeout=0.3, total_timeout=5, max_bytes=2048, max_workers=4)
+
+
+def test_fetches_image(stub_server, fetcher):
+    fetched = fetcher.fetch(f"{stub_server}/house.png")
+    assert fetched.content == PNG_BYTES
+    assert fetched.content_type == 'image/png'
+    assert fetched.etag == '"v1"'
+
+
+def test_conditional_fetch_not_modified(stub_server, fetcher):
+    fetched = fetcher.fetch(f"{stub_server}/house.png", if_none_match='"v1"')
+    assert fetched.not_modified
+    assert fetched.content is None
+
+
+def test_accepts_generic_binary_content_type(stub_server, fetcher):
+    assert fetcher.fetch(f"{stub_server}/octet-stream").content == PNG_BYTES
+
+
+def test_rejects_non_image_content_type(stub_server, fetcher):
+    with pytest.raises(ImageRejectedError, match='text/html'):
+        fetcher.fetch(f"{stub_server}/error-page")
+
+
+def test_rejects_http_errors(stub_server, fetcher):
+    with pytest.raises(ImageFetchError) as excinfo:
+        fetcher.fetch(f"{stub_server}/missing.png")
+    # An upstream failure, not a rejected request
+    assert not isinstance(excinfo.value, ImageRejectedError)
+
+
+def test_size_cap_from_content_length(stub_server, fetcher):
+    with pytest.raises(ImageTooLargeError):
+        fetcher.fetch(f"{stub_server}/large")
+
+
+def test_size_cap_while_streaming(stub_server, fetcher):
+    with pytest.raises(ImageTooLargeError):
+        fetcher.fetch(f"{stub_server}/large-unannounced")
+
+
+def test_read_timeout(stub_server, fetcher):
+    start = time.monotonic()
+    with pytest.raises(ImageFetchError):
+        fetcher.fetch(f"{stub_server}/slow")
+    assert time.monotonic() - start < 1.0
+
+
+def test_follows_redirects(stub_server, fetcher):
+    assert fetcher.fetch(f"{stub_server}/redirect").content == PNG_BYTES
+
+
+def test_redirect_loop_is_bounded(stub_server, fetcher):
+    with pytest.raises(ImageFetchError):
+        fetcher.fetch(f"{stub_server}/redirect-loop")
+
+
+def test_redirect_to_other_scheme_is_rejected(stub_server, fetcher):
+    with pytest.raises(ImageFetchError):
+        fetcher.fetch(f"{stub_server}/redirect-to-file")
+
+
+@pytest.mark.parametrize('url', ['ftp://example.com/house.png', 'house.png', None, 42, {'url': 'x'}])
+def test_rejects_unsupported_urls(fetcher, url):
+    with pytest.raises(ImageRejectedError):
+        fetcher.fetch(url)
+
+
+def test_fetch_many_returns_results_and_errors_in_order(stub_server, fetcher):
+    results = fetcher.fetch_many([f"{stub_server}/house.png", 42, f"{stub_server}/error-page"])
+    assert isinstance(results[0], FetchedImage)
+    assert isinstance(results[1], ImageFetchError)
+    assert isinstance(results[2], ImageFetchError)
@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from house_inference_server import RemoteServingModel, serve_predictions
+
+AUTHKEY = b'test-key'
+INFO = {'backend': 'savedmodel', 'model_version': 'savedmodel-abc123', 'embeddings': True}
+
+
+def fake_predict(images):
+    """Probabilities and embeddings derived from the pixels, so each row can be checked."""
+    if len(images) == 0:
+        raise ValueError("empty batch")
+    means = images.reshape(len(images), -1).mean(axis=1, dtype=np.float64)
+    return np.stack([means, -means], axis=1), np.repeat(means[:, None], 4, axis=1).astype(np.float32)
+
+
+@pytest.fixture
+def address(tmp_path):
+    address = str(tmp_path / 'inference.sock')
+    ready = threading.Event()
+    threading.Thread(target=serve_predictions, args=(address, fake_predict, INFO, AUTHKEY, ready), daemon=True).start()
+    assert ready.wait(5)
+    return address
+
+
+def _images(values):
+    return np.stack([np.full((8, 8, 3), value, dtype=np.uint8) for value in values])
+
+
+def test_remote_model_reports_the_served_model(address):
+    model = RemoteServingModel(address, AUTHKEY)
+    assert model.backend == 'shared-savedmodel'
+    assert model.model_version == 'savedmodel-abc123'
+    assert model.predict_with_embeddings is not None
+
+
+def test_remote_predictions_from_many_threads(address):
+    model = RemoteServingModel(address, AUTHKEY)
+
+    def predict(value):
+        probabilities, embeddings = model.predict_with_embeddings(_images([value, value + 1]))
+        return probabilities[:, 0].tolist(), embeddings.shape
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(predict, range(32)))
+    for value, (means, shape) in enumerate(results):
+        assert means == [value, value + 1]
+        assert shape == (2, 4)
+    np.testing.assert_array_equal(model.predict_batch(_images([7]))[:, 0], [7])
+
+
+def test_remote_errors_are_raised_in_the_worker(address):
+    model = RemoteServingModel(address, AUTHKEY)
+    with pytest.raises(RuntimeError, match='empty batch'):
+        model.predict_batch(np.zeros((0, 8, 8, 3), dtype=np.uint8))
+    # The connection stays usable
+    assert model.predict_batch(_images([3]))[0, 0] == 3
+
+
+def test_waits_for_the_inference_process_then_gives_up(tmp_path):
+    with pytest.raises(RuntimeError, match='not available'):
+        RemoteServingModel(str(tmp_path / 'missing.sock'), AUTHKEY, connect_timeout=0.5)
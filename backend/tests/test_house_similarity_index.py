@@ -0,0 +1,79 @@
+import threading
+import time
+
+import numpy as np
+
+import house_similarity_index
+from house_similarity_index import SimilarityIndex, MIN_TRAIN_SIZE
+
+
+def _vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def _ids(start, n):
+    return [f"img-{i}" for i in range(start, start + n)]
+
+
+def test_small_index_searches_exhaustively():
+    index = SimilarityIndex()
+    vectors = _vectors(100)
+    index.add(vectors, _ids(0, 100))
+    assert index.centroids is None
+    matches = index.search(vectors[42], k=3)
+    assert matches[0]['id'] == 'img-42'
+    assert abs(matches[0]['similarity'] - 1.0) < 1e-5
+
+
+def test_training_runs_in_background_and_finds_neighbours():
+    index = SimilarityIndex(nprobe=16)
+    vectors = _vectors(MIN_TRAIN_SIZE + 500)
+    index.add(vectors, _ids(0, len(vectors)))
+    index.wait_for_training()
+    assert index.centroids is not None
+    assert sum(len(cell) for cell in index._lists) == len(vectors)
+    for row in (0, 1000, len(vectors) - 1):
+        assert index.search(vectors[row], k=1)[0]['id'] == f"img-{row}"
+
+
+def test_add_and_search_do_not_wait_for_training(monkeypatch):
+    release = threading.Event()
+    real_kmeans = house_similarity_index.spherical_kmeans
+
+    def slow_kmeans(*args, **kwargs):
+        release.wait(5)
+        return real_kmeans(*args, **kwargs)
+
+    monkeypatch.setattr(house_similarity_index, 'spherical_kmeans', slow_kmeans)
+    index = SimilarityIndex()
+    vectors = _vectors(MIN_TRAIN_SIZE + 100)
+    index.add(vectors[:MIN_TRAIN_SIZE], _ids(0, MIN_TRAIN_SIZE))
+
+    # Training is blocked, yet adds and searches go through
+    start = time.monotonic()
+    index.add(vectors[MIN_TRAIN_SIZE:], _ids(MIN_TRAIN_SIZE, 100))
+    assert index.search(vectors[MIN_TRAIN_SIZE + 5], k=1)[0]['id'] == f"img-{MIN_TRAIN_SIZE + 5}"
+    assert time.monotonic() - start < 2
+
+    release.set()
+    index.wait_for_training()
+    # Vectors added during training were assigned to the new centroids
+    assert sum(len(cell) for cell in index._lists) == len(vectors)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = SimilarityIndex()
+    vectors = _vectors(MIN_TRAIN_SIZE + 10)
+    index.add(vectors, _ids(0, len(vectors)), [{'n': i} for i in range(len(vectors))])
+    index.info = {'model_version': 'v1'}
+    index.wait_for_training()
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+
+    loaded = SimilarityIndex.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.info == {'model_version': 'v1'}
+    assert loaded.centroids is not None
+    match = loaded.search(vectors[7], k=1)[0]
+    assert match['id'] == 'img-7'
+    assert match['metadata'] == {'n': 7}
@@ -0,0 +1,39 @@
+import numpy as np
+
+import house_submission_store
+
+
+def _append(keys, store_path, version='v1'):
+    pixels = np.zeros((len(keys), 4, 4, 3), dtype=np.uint8)
+    embeddings = np.ones((len(keys), 8), dtype=np.float32)
+    return house_submission_store.append_submissions(
+        keys, pixels, embeddings, [{'n': key} for key in keys], version, store_path=store_path
+    )
+
+
+def test_prune_keeps_the_newest_submissions(tmp_path):
+    store_path = str(tmp_path / 'submissions.db')
+    _append([f"image-{i}" for i in range(10)], store_path)
+
+    assert house_submission_store.prune_submissions(4, store_path=store_path) == 6
+    keys, embeddings, _ = house_submission_store.load_embeddings('v1', store_path=store_path)
+    assert keys == ['image-6', 'image-7', 'image-8', 'image-9']
+    assert embeddings.shape == (4, 8)
+
+    # Nothing left to prune, and the embeddings of pruned submissions are gone too
+    assert house_submission_store.prune_submissions(4, store_path=store_path) == 0
+    conn = house_submission_store.connect(store_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM house_submission_embeddings").fetchone()[0] == 4
+    finally:
+        conn.close()
+
+
+def test_prune_uses_the_configured_retention(tmp_path, monkeypatch):
+    monkeypatch.setattr(house_submission_store, 'DEFAULT_STORE_PATH', str(tmp_path / 'submissions.db'))
+    monkeypatch.setattr(house_submission_store, 'DEFAULT_RETENTION', 3)
+    _append([f"image-{i}" for i in range(5)], None)
+
+    assert house_submission_store.prune_submissions() == 2
+    assert house_submission_store.max_submission_id() == 5
+    assert house_submission_store.load_embeddings('v1')[0] == ['image-2', 'image-3', 'image-4']
@@ -0,0 +1,97 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import model_registry
+from forest_engine import compile_forest, compiled_forest_path, save_compiled_forest
+
+FEATURE_COLUMNS = ["monthly_income", "family_members", "has_stable_housing"]
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        "monthly_income": rng.normal(900, 500, 500).round(),
+        "family_members": rng.integers(1, 9, 500),
+        "has_stable_housing": rng.integers(0, 2, 500)
+    }, columns=FEATURE_COLUMNS)
+    y = (X["monthly_income"] < 700).astype(int)
+    return RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, y)
+
+
+@pytest.fixture
+def published(model, tmp_path):
+    """Publish model the way training does; returns (model_path, feature_columns_path)."""
+    model_path = str(tmp_path / 'model.joblib')
+    columns_path = str(tmp_path / 'columns.joblib')
+    model_registry.publish_artifact(model, model_path)
+    model_registry.publish_artifact(FEATURE_COLUMNS, columns_path)
+    digest = model_registry.file_digest(model_path)
+    forest = compile_forest(model)
+    forest.model_digest = digest
+    save_compiled_forest(forest, compiled_forest_path(model_path))
+    model_registry.publish_manifest(model_path, digest, compiled_forest=compiled_forest_path(model_path))
+    yield model_path, columns_path
+    model_registry.invalidate(model_path)
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_loads_exported_forest(published):
+    bundle = model_registry.get_model_bundle(*published)
+    assert bundle.compiled is not None
+    assert bundle.compiled.model_digest == bundle.model_digest
+
+
+def test_reloads_only_when_manifest_changes(published):
+    model_path, columns_path = published
+    bundle = model_registry.get_model_bundle(model_path, columns_path)
+
+    # Artifacts landing before the manifest don't trigger a reload
+    _bump_mtime(model_path)
+    _bump_mtime(compiled_forest_path(model_path))
+    assert model_registry.get_model_bundle(model_path, columns_path) is bundle
+
+    _bump_mtime(model_registry.manifest_path(model_path))
+    assert model_registry.get_model_bundle(model_path, columns_path) is not bundle
+
+
+def test_does_not_recompile_when_manifest_has_no_forest(published):
+    model_path, columns_path = published
+    os.remove(compiled_forest_path(model_path))
+    model_registry.publish_manifest(model_path, model_registry.file_digest(model_path))
+    assert model_registry.get_model_bundle(model_path, columns_path).compiled is None
+
+
+def test_model_without_manifest_is_compiled_on_load(model, tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    joblib.dump(model, model_path)
+    bundle = model_registry.get_model_bundle(model_path, str(tmp_path / 'missing.joblib'))
+    assert bundle.compiled is not None
+    model_registry.invalidate(model_path)
+
+
+def test_uses_model_feature_order(model, tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    columns_path = str(tmp_path / 'columns.joblib')
+    joblib.dump(model, model_path)
+    joblib.dump(list(reversed(FEATURE_COLUMNS)), columns_path)
+    assert model_registry.get_model_bundle(model_path, columns_path).feature_columns == FEATURE_COLUMNS
+    model_registry.invalidate(model_path)
+
+
+def test_rejects_unknown_feature_columns(model, tmp_path):
+    model_path = str(tmp_path / 'model.joblib')
+    columns_path = str(tmp_path / 'columns.joblib')
+    joblib.dump(model, model_path)
+    joblib.dump(FEATURE_COLUMNS[:-1] + ["household_debt"], columns_path)
+    with pytest.raises(ValueError):
+        model_registry.get_model_bundle(model_path, columns_path)
@@ -0,0 +1,182 @@
+"""
+Verified Family Data Store
+
+Append-only store for family records verified by officers, used as real
+training data by family_assistance_model. Backed by SQLite in WAL mode:
+- appends are O(1) inserts instead of rewriting a CSV file,
+- duplicate checks go through an index on the duplicate key instead of
+  scanning every saved row,
+- concurrent Flask workers are serialised by SQLite's write lock, and readers
+  (retraining) never block writers.
+An existing saved_family_data.csv is imported once, when the store is created.
+"""
+
+import os
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_PATH = 'saved_family_data.db'
+LEGACY_CSV_PATH = 'saved_family_data.csv'
+
+FEATURE_COLUMNS = [
+    "monthly_income",
+    "family_members",
+    "has_stable_housing",
+    "access_to_clean_water",
+    "access_to_electricity",
+    "has_significant_health_issues"
+]
+
+# Columns stored as real table columns; anything else goes into extra_fields as JSON
+STORE_COLUMNS = FEATURE_COLUMNS + ["deserves_help", "verification_date", "family_id"]
+
+# Records matching an existing record on all of these are treated as duplicates
+DUPLICATE_KEY = ["monthly_income", "family_members", "has_stable_housing", "deserves_help"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verified_families (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    monthly_income REAL,
+    family_members REAL,
+    has_stable_housing INTEGER,
+    access_to_clean_water INTEGER,
+    access_to_electricity INTEGER,
+    has_significant_health_issues INTEGER,
+    deserves_help INTEGER NOT NULL,
+    verification_date TEXT,
+    family_id TEXT,
+    extra_fields TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_verified_families_duplicate_key
+    ON verified_families (monthly_income, family_members, has_stable_housing, deserves_help);
+"""
+
+_INSERT_SQL = (
+    f"INSERT INTO verified_families ({', '.join(STORE_COLUMNS)}, extra_fields) "
+    f"VALUES ({', '.join('?' for _ in STORE_COLUMNS)}, ?)"
+)
+
+_DUPLICATE_SQL = (
+    "SELECT 1 FROM verified_families WHERE "
+    + " AND ".join(f"{col} = ?" for col in DUPLICATE_KEY)
+    + " LIMIT 1"
+)
+
+
+def _clean_value(value):
+    """Convert pandas/numpy values into something sqlite3 can bind (NaN -> NULL)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _record_row(record):
+    """Split a record dict into the store's column values plus a JSON blob of extra fields."""
+    values = [_clean_value(record.get(col)) for col in STORE_COLUMNS]
+    extra = {k: _clean_value(v) for k, v in record.items() if k not in STORE_COLUMNS}
+    return values + [json.dumps(extra, default=str) if extra else None]
+
+
+def _import_legacy_csv(conn, csv_path):
+    """Copy the rows of the old CSV store into a freshly created database."""
+    legacy_df = pd.read_csv(csv_path)
+    rows = [_record_row(record) for record in legacy_df.to_dict('records')]
+    conn.executemany(_INSERT_SQL, rows)
+    print(f"Imported {len(rows)} verified records from {csv_path}")
+
+
+def connect(store_path=DEFAULT_STORE_PATH, legacy_csv_path=LEGACY_CSV_PATH):
+    """Open the store, creating the schema (and importing the legacy CSV) on first use."""
+    is_new = not os.path.exists(store_path)
+    # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(store_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    if is_new and legacy_csv_path and os.path.exists(legacy_csv_path):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have created and filled the store at the same time
+            if conn.execute("SELECT COUNT(*) FROM verified_families").fetchone()[0] == 0:
+                _import_legacy_csv(conn, legacy_csv_path)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return conn
+
+
+def append_verified_records(family_df, store_path=DEFAULT_STORE_PATH):
+    """
+    Append the rows of family_df to the store.
+    Like the old CSV store, the whole batch is skipped (and False returned) if any
+    row duplicates an existing record on DUPLICATE_KEY.
+    """
+    records = family_df.to_dict('records')
+    conn = connect(store_path)
+    try:
+        # Take the write lock up front so the duplicate check and the insert are atomic
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                key = [_clean_value(record.get(col)) for col in DUPLICATE_KEY]
+                if conn.execute(_DUPLICATE_SQL, key).fetchone() is not None:
+                    print(f"Skipping duplicate record with monthly_income={record.get('monthly_income')}, family_members={record.get('family_members')}")
+                    conn.execute("ROLLBACK")
+                    return False
+            conn.executemany(_INSERT_SQL, [_record_row(record) for record in records])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return True
+
+
+def load_verified_data(store_path=DEFAULT_STORE_PATH, after_id=None, up_to_id=None):
+    """
+    Verified records as a DataFrame with STORE_COLUMNS, in insertion order.
+    after_id / up_to_id restrict the result to records with after_id < id <= up_to_id,
+    which lets incremental retraining read only what was added since its last run.
+    """
+    conditions = []
+    params = []
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(int(after_id))
+    if up_to_id is not None:
+        conditions.append("id <= ?")
+        params.append(int(up_to_id))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    conn = connect(store_path)
+    try:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(STORE_COLUMNS)} FROM verified_families{where} ORDER BY id", conn, params=params
+        )
+    finally:
+        conn.close()
+
+
+def max_record_id(store_path=DEFAULT_STORE_PATH):
+    """Id of the most recently appended record (0 if the store is empty)."""
+    conn = connect(store_path)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM verified_families").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def count_verified_records(store_path=DEFAULT_STORE_PATH):
+    """Number of verified records in the store."""
+    conn = connect(store_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM verified_families").fetchone()[0]
+    finally:
+        conn.close()
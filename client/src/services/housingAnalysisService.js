@@ -46,6 +46,43 @@ export async function analyzeHouseImage(imageUrl) {
   }
 }
 
+/**
+ * Analyzes several images of the same house in one request
+ * @param {string[]} imageUrls - The URLs of the images to analyze
+ * @returns {Promise} - A promise that resolves to the per-image results and the household-level result
+ */
+export async function analyzeHouseImages(imageUrls) {
+  try {
+    const apiUrl = 'http://localhost:5000/analyze-house-batch'
+    console.log(`Sending ${imageUrls.length} images to: ${apiUrl}`)
+
+    const apiResponse = await fetch(apiUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ image_urls: imageUrls }),
+    })
+
+    if (!apiResponse.ok) {
+      console.error(`API error status: ${apiResponse.status}`)
+      let errorBody = 'No details available'
+      try {
+        errorBody = await apiResponse.text()
+        console.error(`API error body: ${errorBody}`)
+      } catch (e) {
+        console.error('Could not read error response body:', e)
+      }
+      throw new Error(`API error: ${apiResponse.status} - ${errorBody}`)
+    }
+
+    return await apiResponse.json()
+  } catch (error) {
+    console.error('Error in analyzeHouseImages function:', error)
+    throw error
+  }
+}
+
 /**
  * Translates the housing condition class to a more user-friendly label in English
  * @param {string} classificationLabel - The class from the model ('baik', 'dhoif', or 'sederhana')